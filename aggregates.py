@@ -0,0 +1,251 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from downtime import WEEK, downtime_buckets, to_seconds, touched_weeks
+
+STORE_PATH = Path("agregaty.sqlite")
+
+# bump when a table below changes; older store files are then rebuilt
+STORE_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notifications (
+    ZawiadomienieId INTEGER PRIMARY KEY,
+    Linia INTEGER NOT NULL,
+    Start INTEGER NOT NULL,   -- epoch seconds
+    Koniec INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_notifications_line ON notifications (Linia, Start);
+
+CREATE TABLE IF NOT EXISTS downtime_shift (
+    Linia INTEGER NOT NULL,
+    Rok INTEGER NOT NULL,
+    Tydzien INTEGER NOT NULL,
+    Data TEXT NOT NULL,
+    Zmiana INTEGER NOT NULL,
+    Downtime_min REAL NOT NULL,
+    Liczba INTEGER NOT NULL,
+    PRIMARY KEY (Linia, Data, Zmiana)
+);
+CREATE INDEX IF NOT EXISTS ix_downtime_shift_week ON downtime_shift (Linia, Rok, Tydzien);
+
+CREATE TABLE IF NOT EXISTS downtime_weekly (
+    Linia INTEGER NOT NULL,
+    Rok INTEGER NOT NULL,
+    Tydzien INTEGER NOT NULL,
+    Total_downtime_min REAL NOT NULL,
+    Liczba INTEGER NOT NULL,
+    PRIMARY KEY (Linia, Rok, Tydzien)
+);
+
+CREATE TABLE IF NOT EXISTS production_weekly (
+    Linia INTEGER NOT NULL,
+    Rok INTEGER NOT NULL,
+    Tydzien INTEGER NOT NULL,
+    Line_efficiency_pct REAL,
+    QL_diff REAL,
+    PRIMARY KEY (Linia, Rok, Tydzien)
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+-- random per store file, so a recreated store never repeats an old (store_id, version)
+INSERT OR IGNORE INTO meta (key, value) VALUES ('store_id', abs(random() % 1000000000000));
+"""
+
+
+
+class AggregateStore:
+    """
+    Downtime per line and ISO week (plus day/shift detail) kept in a local
+    SQLite file and updated incrementally.
+
+    Every notification's stoppage interval is stored once; loading an export
+    only recomputes the (line, week) cells its intervals overlap - including
+    the cells a re-exported notification used to cover - so the cost of an
+    update follows the size of the export, not the length of the history.
+    Overlapping notifications of a line are counted once (downtime.py).
+    """
+
+    def __init__(self, path: Path | str = STORE_PATH):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.lock = threading.RLock()
+        # True when an outdated store was emptied; its exports must be loaded again
+        self.rebuilt = self.conn.execute("PRAGMA user_version").fetchone()[0] != STORE_VERSION
+        if self.rebuilt:
+            self.conn.executescript(
+                "DROP TABLE IF EXISTS notifications; DROP TABLE IF EXISTS downtime_shift; "
+                "DROP TABLE IF EXISTS downtime_weekly; DROP TABLE IF EXISTS production_weekly; "
+                "DROP TABLE IF EXISTS meta;"
+            )
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(f"PRAGMA user_version = {STORE_VERSION}")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def version(self) -> int:
+        """Bumped on every update; lets caches tell stale results apart."""
+        with self.lock:
+            return self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    @property
+    def store_id(self) -> int:
+        """Random id drawn when the store file is created or rebuilt."""
+        with self.lock:
+            return self.conn.execute("SELECT value FROM meta WHERE key = 'store_id'").fetchone()[0]
+
+    def _bump_version(self):
+        self.conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+
+    def update_downtime(self, fail: pd.DataFrame) -> set[tuple[int, int, int]]:
+        """
+        Merge notifications (ZawiadomienieId, Linia, Start, Koniec) and refresh
+        the aggregates of every week their intervals overlap.
+        Returns the touched (Linia, Rok, Tydzien) keys.
+        """
+        fail = fail.dropna(subset=["ZawiadomienieId", "Linia", "Start", "Koniec"])
+        rows = pd.DataFrame({
+            "ZawiadomienieId": fail["ZawiadomienieId"].astype("int64"),
+            "Linia": fail["Linia"].astype("int64"),
+            "Start": to_seconds(fail["Start"]),
+            "Koniec": to_seconds(fail["Koniec"]),
+        }).drop_duplicates(subset="ZawiadomienieId", keep="last")
+        rows = rows[rows["Koniec"] > rows["Start"]]
+        if rows.empty:
+            return set()
+
+        with self.lock, self.conn:
+            cur = self.conn.cursor()
+            cur.execute("DROP TABLE IF EXISTS temp.incoming")
+            cur.execute("CREATE TEMP TABLE incoming AS SELECT * FROM notifications WHERE 0")
+            cur.executemany("INSERT INTO incoming VALUES (?, ?, ?, ?)", rows.itertuples(index=False, name=None))
+
+            # exports overlap; rows identical to what is stored change nothing
+            cur.execute("DELETE FROM incoming WHERE ZawiadomienieId IN "
+                        "(SELECT ZawiadomienieId FROM (SELECT * FROM notifications "
+                        "INTERSECT SELECT * FROM incoming))")
+
+            # weeks covered by the new intervals and by the ones they replace
+            changed = cur.execute("""
+                SELECT Linia, Start, Koniec FROM incoming
+                UNION ALL
+                SELECT n.Linia, n.Start, n.Koniec
+                FROM notifications n JOIN incoming i ON i.ZawiadomienieId = n.ZawiadomienieId
+            """).fetchall()
+            cur.execute("INSERT OR REPLACE INTO notifications SELECT * FROM incoming")
+            cur.execute("DROP TABLE temp.incoming")
+            if not changed:
+                return set()
+
+            line, start, end = np.array(changed, dtype=np.int64).reshape(-1, 3).T
+            weeks = touched_weeks(line, start, end)
+            keys = ["Linia", "Rok", "Tydzien"]
+            shifts, weekly = self._recompute(weeks)
+            shifts = shifts.merge(weeks[keys], on=keys)
+            weekly = weekly.merge(weeks[keys], on=keys)
+            touched = set(weeks[keys].itertuples(index=False, name=None))
+
+            cur.execute("DROP TABLE IF EXISTS temp.touched")
+            cur.execute("CREATE TEMP TABLE touched (Linia INTEGER, Rok INTEGER, Tydzien INTEGER)")
+            cur.executemany("INSERT INTO touched VALUES (?, ?, ?)", sorted(touched))
+            in_touched = (
+                "EXISTS (SELECT 1 FROM touched t WHERE t.Linia = {0}.Linia "
+                "AND t.Rok = {0}.Rok AND t.Tydzien = {0}.Tydzien)"
+            )
+            cur.execute(f"DELETE FROM downtime_shift WHERE {in_touched.format('downtime_shift')}")
+            cur.execute(f"DELETE FROM downtime_weekly WHERE {in_touched.format('downtime_weekly')}")
+            cur.execute("DROP TABLE temp.touched")
+
+            shifts["Data"] = shifts["Data"].dt.strftime("%Y-%m-%d")
+            cur.executemany(
+                "INSERT INTO downtime_shift (Linia, Rok, Tydzien, Data, Zmiana, Downtime_min, Liczba) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                shifts[["Linia", "Rok", "Tydzien", "Data", "Zmiana", "Downtime_min", "Liczba"]]
+                .astype(object).itertuples(index=False, name=None),
+            )
+            cur.executemany(
+                "INSERT INTO downtime_weekly (Linia, Rok, Tydzien, Total_downtime_min, Liczba) "
+                "VALUES (?, ?, ?, ?, ?)",
+                weekly[["Linia", "Rok", "Tydzien", "Downtime_min", "Liczba"]]
+                .astype(object).itertuples(index=False, name=None),
+            )
+            self._bump_version()
+
+        return touched
+
+    def _recompute(self, weeks: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Shift and weekly downtime over the span of each line's touched weeks,
+        from every stored interval overlapping it.
+        """
+        spans = weeks.groupby("Linia", as_index=False)["Od"].agg(lo="min", hi="max")
+        spans["hi"] += WEEK
+        cur = self.conn.cursor()
+        cur.execute("DROP TABLE IF EXISTS temp.spans")
+        cur.execute("CREATE TEMP TABLE spans (Linia INTEGER PRIMARY KEY, lo INTEGER, hi INTEGER)")
+        cur.executemany("INSERT INTO spans VALUES (?, ?, ?)", spans.astype(object).itertuples(index=False, name=None))
+        found = cur.execute("""
+            SELECT n.Linia, n.Start, n.Koniec, s.lo, s.hi
+            FROM notifications n JOIN spans s ON s.Linia = n.Linia
+            WHERE n.Start < s.hi AND n.Koniec > s.lo
+        """).fetchall()
+        cur.execute("DROP TABLE temp.spans")
+        line, start, end, lo, hi = np.array(found, dtype=np.int64).reshape(-1, 5).T
+        return downtime_buckets(line, start, end, lo, hi)
+
+    def update_production(self, prod: pd.DataFrame) -> set[tuple[int, int, int]]:
+        """
+        Upsert weekly production KPIs (Rok, Tydzień, Linia, Line_efficiency_pct,
+        QL_diff); Tydzień is the export's "W01" label, Rok its ISO year.
+        Returns the touched (Linia, Rok, Tydzien) keys.
+        """
+        prod = prod.assign(Tydzien=pd.to_numeric(prod["Tydzień"].str.extract(r"(\d+)")[0], errors="coerce"))
+        prod = prod.dropna(subset=["Linia", "Rok", "Tydzien"])
+        rows = [
+            (int(linia), int(year), int(week), None if pd.isna(eff) else float(eff), None if pd.isna(ql) else float(ql))
+            for year, week, linia, eff, ql in prod[["Rok", "Tydzien", "Linia", "Line_efficiency_pct", "QL_diff"]]
+            .itertuples(index=False, name=None)
+        ]
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO production_weekly VALUES (?, ?, ?, ?, ?)", rows)
+            self._bump_version()
+        return {(linia, year, week) for linia, year, week, _, _ in rows}
+
+    def weekly_report(self, lines: list[int] | None = None) -> pd.DataFrame:
+        """Weekly downtime joined with production, one row per line and week with both sides present."""
+        sql = """
+            SELECT d.Linia, d.Rok, d.Tydzien, 'W' || printf('%02d', d.Tydzien) AS "Tydzień",
+                   d.Total_downtime_min, p.Line_efficiency_pct, p.QL_diff
+            FROM downtime_weekly d
+            JOIN production_weekly p
+              ON p.Linia = d.Linia AND p.Rok = d.Rok AND p.Tydzien = d.Tydzien
+            WHERE p.Line_efficiency_pct IS NOT NULL AND p.QL_diff IS NOT NULL
+        """
+        params: list = []
+        if lines:
+            sql += f" AND d.Linia IN ({', '.join(['?'] * len(lines))})"
+            params = [int(line) for line in lines]
+        sql += " ORDER BY d.Linia, d.Rok, d.Tydzien"
+        with self.lock:
+            return pd.read_sql_query(sql, self.conn, params=params)
+
+    def partitions(self, lines: list[int] | None = None) -> dict[int, pd.DataFrame]:
+        """The weekly report pre-split per line, for O(1) lookup in the dashboard."""
+        report = self.weekly_report(lines)
+        return {int(line): part.reset_index(drop=True) for line, part in report.groupby("Linia", sort=True)}
@@ -0,0 +1,208 @@
+import os
+import re
+import sqlite3
+from datetime import date, time as dtime
+from pathlib import Path
+
+import pandas as pd
+
+from oee import campaign_of
+from scheduler import SQL_SCRIPT
+from upsert import connection_cursor, upsert_frame
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# which database the loaders write to:
+#   mssql                 - SQL Server through pyodbc and bazadanych.CONN_STR (default)
+#   mssql:<ODBC string>   - SQL Server with an explicit connection string
+#   sqlite:<path>         - local SQLite file
+#   duckdb:<path>         - local DuckDB file
+BACKEND_ENV = "FERRERO_DB"
+
+# the range sql_script.sql fills the Data calendar with
+CALENDAR_START = date(2010, 1, 1)
+CALENDAR_END = date(2030, 12, 31)
+
+# DATENAME under SET LANGUAGE Polish
+MONTH_NAMES = ["styczeń", "luty", "marzec", "kwiecień", "maj", "czerwiec", "lipiec",
+               "sierpień", "wrzesień", "październik", "listopad", "grudzień"]
+WEEKDAY_NAMES = ["poniedziałek", "wtorek", "środa", "czwartek", "piątek", "sobota", "niedziela"]
+
+CREATE_TABLE = re.compile(r"CREATE\s+TABLE\s+\[?(\w+)\]?", re.IGNORECASE)
+# the table an index or foreign key belongs to
+ON_TABLE = re.compile(r"(?:ALTER\s+TABLE|\sON)\s+\[?(\w+)\]?", re.IGNORECASE)
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(dtime, dtime.isoformat)
+
+
+def ddl_statements(sql_path: Path = SQL_SCRIPT) -> list[str]:
+    """The CREATE TABLE / CREATE INDEX / ALTER TABLE batches of sql_script.sql, in order."""
+    script = Path(sql_path).read_text(encoding="utf-8")
+    batches = [b.strip() for b in re.split(r"^GO\s*$", script, flags=re.MULTILINE)]
+    return [b for b in batches if re.match(r"(CREATE|ALTER)\s", b, re.IGNORECASE)]
+
+
+def calendar_frame(start: date = CALENDAR_START, end: date = CALENDAR_END) -> pd.DataFrame:
+    """
+    The Data calendar as the script builds it with SET LANGUAGE Polish and
+    SET DATEFIRST 1: DATEPART(WEEK) counts Monday-based weeks from the one
+    holding 1 January, DATEPART(WEEKDAY) is 1 on Mondays.
+    """
+    days = pd.Series(pd.date_range(start, end, freq="D"))
+    jan1_weekday = pd.to_datetime(days.dt.year.astype(str) + "-01-01").dt.weekday
+    return pd.DataFrame({
+        "Data": days.dt.date,
+        "Rok": days.dt.year,
+        "Miesiac": days.dt.month,
+        "MiesiacNazwa": days.dt.month.map(lambda m: MONTH_NAMES[m - 1]),
+        "Tydzien": (days.dt.dayofyear - 1 + jan1_weekday) // 7 + 1,
+        "DzienTygodnia": days.dt.weekday + 1,
+        "DzienTygodniaNazwa": days.dt.weekday.map(lambda d: WEEKDAY_NAMES[d]),
+        "Kampania": campaign_of(days).astype(object),
+    })
+
+
+class Backend:
+    """
+    A database the FILE_PATTERNS pipeline can load into. `dialect` is the
+    name upsert.detect_dialect gives its connections, so upsert_frame picks
+    the matching merge and staging path.
+    """
+
+    dialect = ""
+
+    def connect(self):
+        raise NotImplementedError
+
+    def open(self):
+        """connect(); a local database gets the sql_script.sql tables it is missing first."""
+        conn = self.connect()
+        if self.dialect != "mssql":
+            self.create_schema(conn)
+        return conn
+
+    def translate(self, statement: str) -> str | None:
+        """sql_script.sql batch -> this database's DDL, or None to skip it."""
+        return statement
+
+    def existing_tables(self, conn) -> set[str]:
+        raise NotImplementedError
+
+    def create_schema(self, conn, sql_path: Path = SQL_SCRIPT, calendar: bool = True) -> list[str]:
+        """
+        Create the tables of sql_script.sql that do not exist yet, with their
+        indexes, and fill the Data calendar of a new database.
+        Returns the tables created.
+        """
+        existing = {t.lower() for t in self.existing_tables(conn)}
+        created = []
+        cursor = connection_cursor(conn)
+        for statement in ddl_statements(sql_path):
+            table = CREATE_TABLE.match(statement)
+            if table:
+                if table.group(1).lower() in existing:
+                    continue
+                created.append(table.group(1))
+            elif ON_TABLE.search(statement).group(1) not in created:
+                continue  # index / key of a table that was already there
+            ddl = self.translate(statement)
+            if ddl:
+                cursor.execute(ddl)
+        conn.commit()
+
+        if calendar and "Data" in created:
+            upsert_frame(calendar_frame(), conn, "Data", ["Data"], dialect=self.dialect)
+        return created
+
+
+class MssqlBackend(Backend):
+    """SQL Server through pyodbc; bulk loads use fast_executemany (upsert.insert_batch)."""
+
+    dialect = "mssql"
+
+    def __init__(self, conn_str: str):
+        self.conn_str = conn_str
+
+    def connect(self):
+        import pyodbc
+
+        return pyodbc.connect(self.conn_str)
+
+    def existing_tables(self, conn) -> set[str]:
+        cursor = conn.cursor()
+        cursor.execute("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE'")
+        return {row[0] for row in cursor.fetchall()}
+
+
+class SqliteBackend(Backend):
+    """
+    A local SQLite file. Bulk loads are executemany batches in one
+    transaction each, with WAL and synchronous=NORMAL so a commit does not
+    wait for a full fsync. Foreign keys are left out: SQLite cannot add them
+    with ALTER TABLE, and the scheduler orders the loads anyway.
+    """
+
+    dialect = "sqlite"
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+
+    def connect(self):
+        # tables are loaded on several threads; writers queue for the lock
+        conn = sqlite3.connect(self.path, timeout=300, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def translate(self, statement: str) -> str | None:
+        if statement.upper().startswith("ALTER"):
+            return None
+        return statement
+
+    def existing_tables(self, conn) -> set[str]:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+class DuckdbBackend(Backend):
+    """
+    A local DuckDB file. Bulk loads hand DuckDB the whole frame, which it
+    reads through Arrow (upsert.stage_rows). Foreign keys are left out, as
+    DuckDB cannot add them to an existing table.
+    """
+
+    dialect = "duckdb"
+
+    def __init__(self, path: Path | str):
+        if duckdb is None:
+            raise ImportError("duckdb is required for the duckdb backend")
+        self.path = Path(path)
+
+    def connect(self):
+        return duckdb.connect(str(self.path))
+
+    def translate(self, statement: str) -> str | None:
+        if statement.upper().startswith("ALTER"):
+            return None
+        # quoted, not bare: columns like Do are reserved words in DuckDB
+        return re.sub(r"\[(\w+)\]", r'"\1"', statement)
+
+    def existing_tables(self, conn) -> set[str]:
+        rows = conn.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'").fetchall()
+        return {row[0] for row in rows}
+
+
+def get_backend(spec: str | None = None, default_conn_str: str = "") -> Backend:
+    """Backend named by `spec` or the FERRERO_DB environment variable, SQL Server if neither is set."""
+    spec = spec or os.environ.get(BACKEND_ENV) or "mssql"
+    kind, _, target = spec.partition(":")
+    if kind == "mssql":
+        return MssqlBackend(target or default_conn_str)
+    if kind == "sqlite":
+        return SqliteBackend(target or "ferrero.sqlite")
+    if kind == "duckdb":
+        return DuckdbBackend(target or "ferrero.duckdb")
+    raise ValueError(f"Unknown {BACKEND_ENV} backend {kind!r} (expected mssql, sqlite or duckdb)")
@@ -1,18 +1,29 @@
 from pathlib import Path
 import pandas as pd
-import pyodbc
 import os
 from datetime import datetime
-import re
+from collections import Counter
+from typing import Iterator
+import argparse
+
+from backends import BACKEND_ENV, get_backend
+from bilans import BILANS_COLUMNS, BILANS_DTYPES, iter_bilans
+from coercion import coerce_frame
+from locations import parse_locations
+from manifest import Manifest
+from metrics import file_run, metrics, profiled, stage
+from oee import refresh_oee
+from scheduler import run_scheduled
+from upsert import BATCH_SIZE, frame_to_rows, insert_batch, key_columns, upsert_frame
 
 FILE_PATTERNS = {
     "zlecenia": {
         "folder": "zlecenia",
         "column_map": {
             "Nr zlecenia": "ZlecenieId",
-            "Rodzaj": "ZlecenieRodzaj",
-            "Data": "DataUtworzenia",
-            "Godzina": "CzasUtworzenia"
+            "Rodzaj zlecenia": "ZlecenieRodzaj",
+            "Data wprowadzenia": "DataUtworzenia",
+            "Godzina utworzenia": "CzasUtworzenia"
         },
         "target_table": "Zlecenia",
         "columns": ["ZlecenieId", "ZlecenieRodzaj", "DataUtworzenia", "CzasUtworzenia"],
@@ -28,10 +39,10 @@ FILE_PATTERNS = {
         "folder": "zawiadomienia",
         "column_map": {
             "Zawiadomienie": "ZawiadomienieId",
-            "Rodzaj": "ZawiadomienieRodzaj",
+            "Rodzaj zawiadomienia": "ZawiadomienieRodzaj",
             "Nr zlecenia": "ZlecenieId",
             "Lokalizacja": "Lokalizacja",
-            "Lokalizacja funkcjonalna": "LokalizacjaFunkcjonalnaId",
+            "Lokalizacja funkc.": "LokalizacjaFunkcjonalnaId",
             "Urządzenie": "UrzadzenieId",
             "Utworzono dnia": "DataUtworzenia",
             "Kod uszkodzenia": "UszkodzenieId",
@@ -75,13 +86,13 @@ FILE_PATTERNS = {
     "linie": {
         "folder": "lokalizacja_funkcjonalna",
         "column_map": {
-            "Lokaliz. funkc.": "LiniaId",
+            "Lokaliz. funkc.": "LokalizacjaFunkcjonalnaId",
             "Oznaczenie": "LiniaNazwa"
         },
         "target_table": "Linie",
         "columns": ["LiniaId", "LiniaNazwa"],
         "dtypes": {
-            "LiniaId": "str",
+            "LiniaId": "int",
             "LiniaNazwa": "str"
         },
         "primary_key": "LiniaId"
@@ -98,7 +109,7 @@ FILE_PATTERNS = {
         "dtypes": {
             "LokalizacjaFunkcjonalnaId": "str",
             "LokalizacjaFunkcjonalnaNazwa": "str",
-            "LiniaId": "str"
+            "LiniaId": "int"
         },
         "primary_key": "LokalizacjaFunkcjonalnaId"
     },
@@ -134,7 +145,7 @@ FILE_PATTERNS = {
         "folder": "urzadzenia",
         "column_map": {
             "Urządzenie": "UrzadzenieId",
-            "Oznaczenie obiektu technicznego": "UrzadzenieNazwa"
+            "Oznaczenie": "UrzadzenieNazwa"
         },
         "target_table": "Urzadzenia",
         "columns": ["UrzadzenieId", "UrzadzenieNazwa"],
@@ -174,112 +185,22 @@ FILE_PATTERNS = {
     },
     "bilans_produkcji": {
         "folder": "bilans",
-        "column_map": {
-            "Od": "Od",
-            "Do": "Do",
-            "Linia": "LiniaId",
-            "Rodzina": "Rodzina",
-            "QLTotalAkt": "QLTotalAkt",
-            "QLTotalPln": "QLTotalPln",
-            "%DvtProduk": "ProcentDvtProduk",
-            "ZmianaCzysty": "ZmianaCzysty",
-            "ZmianaPrg": "ZmianaPrg",
-            "ZmianaStd": "ZmianaStd",
-            "QZmianaAkt": "QZmianaAkt",
-            "QZmianaDocel": "QZmianaDocel",
-            "QZmianaStd": "QZmianaStd",
-            "QCPKAkt": "QCPKAkt",
-            "QCPKDocel": "QCPKDocel",
-            "QCPKStd": "QCPKStd",
-            "OpeLNShAkt": "OpeLNShAkt",
-            "OpeLNShDocel": "OpeLNShDocel",
-            "OpeLNShStd": "OpeLNShStd",
-            "OpeELShAkt": "OpeELShAkt",
-            "OpeELShDocel": "OpeELShDocel",
-            "OpeELShStd": "OpeELShStd",
-            "GQLAkt": "GQLAkt",
-            "GQLDocel": "GQLDocel",
-            "GQLStd": "GQLStd",
-            "%SCEff": "ProcentSCEff",
-            "%SCStd": "ProcentSCStd",
-            "%SREff": "ProcentSREff",
-            "%SRStd": "ProcentSRStd",
-            "%SFSPEff": "ProcentSFSPEff",
-            "%SFSPStd": "ProcentSFSPStd",
-            "GodzPracAkt": "GodzPracAkt",
-            "GodzPracDocel": "GodzPracDocel",
-            "GodzPracStd": "GodzPracStd",
-            "%ELiniaEff": "ProcentELiniaEff",
-            "%ELiniaObb": "ProcentELiniaObb",
-            "%ELiniaStd": "ProcentELiniaStd",
-            "%EPracEff": "ProcentEPracEff",
-            "%EPracObb": "ProcentEPracObb",
-            "%EPracStd": "ProcentEPracStd",
-            "%ZyskuEff": "ProcentZyskuEff",
-            "%ZyskuObb": "ProcentZyskuObb",
-            "%ZyskuStd": "ProcentZyskuStd"
-        },
+        # headers are matched onto BILANS_COLUMNS by bilans.iter_bilans
+        "column_map": {},
         "target_table": "BilansProdukcji",
-        "columns": [
-            "Od", "Do", "LiniaId", "Rodzina", "QLTotalAkt", "QLTotalPln", "ProcentDvtProduk",
-            "ZmianaCzysty", "ZmianaPrg", "ZmianaStd", "QZmianaAkt", "QZmianaDocel", "QZmianaStd",
-            "QCPKAkt", "QCPKDocel", "QCPKStd", "OpeLNShAkt", "OpeLNShDocel", "OpeLNShStd",
-            "OpeELShAkt", "OpeELShDocel", "OpeELShStd", "GQLAkt", "GQLDocel", "GQLStd",
-            "ProcentSCEff", "ProcentSCStd", "ProcentSREff", "ProcentSRStd",
-            "ProcentSFSPEff", "ProcentSFSPStd", "GodzPracAkt", "GodzPracDocel", "GodzPracStd",
-            "ProcentELiniaEff", "ProcentELiniaObb", "ProcentELiniaStd",
-            "ProcentEPracEff", "ProcentEPracObb", "ProcentEPracStd",
-            "ProcentZyskuEff", "ProcentZyskuObb", "ProcentZyskuStd"
-        ],
-        "dtypes": {
-            "Od": "date",
-            "Do": "date",
-            "LiniaId": "int",
-            "Rodzina": "str",
-            "QLTotalAkt": "float",
-            "QLTotalPln": "float",
-            "ProcentDvtProduk": "float",
-            "ZmianaCzysty": "float",
-            "ZmianaPrg": "float",
-            "ZmianaStd": "float",
-            "QZmianaAkt": "float",
-            "QZmianaDocel": "float",
-            "QZmianaStd": "float",
-            "QCPKAkt": "float",
-            "QCPKDocel": "float",
-            "QCPKStd": "float",
-            "OpeLNShAkt": "float",
-            "OpeLNShDocel": "float",
-            "OpeLNShStd": "float",
-            "OpeELShAkt": "float",
-            "OpeELShDocel": "float",
-            "OpeELShStd": "float",
-            "GQLAkt": "float",
-            "GQLDocel": "float",
-            "GQLStd": "float",
-            "ProcentSCEff": "float",
-            "ProcentSCStd": "float",
-            "ProcentSREff": "float",
-            "ProcentSRStd": "float",
-            "ProcentSFSPEff": "float",
-            "ProcentSFSPStd": "float",
-            "GodzPracAkt": "float",
-            "GodzPracDocel": "float",
-            "GodzPracStd": "float",
-            "ProcentELiniaEff": "float",
-            "ProcentELiniaObb": "float",
-            "ProcentELiniaStd": "float",
-            "ProcentEPracEff": "float",
-            "ProcentEPracObb": "float",
-            "ProcentEPracStd": "float",
-            "ProcentZyskuEff": "float",
-            "ProcentZyskuObb": "float",
-            "ProcentZyskuStd": "float"
-        }
+        "columns": BILANS_COLUMNS,
+        "dtypes": BILANS_DTYPES,
+        "primary_key": ["Od", "Linia", "Rodzina"]
     }
 }
 
 BASE_FOLDER = Path("G:/projekt")
+MANIFEST_PATH = BASE_FOLDER / "manifest.sqlite"
+METRICS_PATH = BASE_FOLDER / "ingest_metrics.jsonl"
+
+# SAP exports are semicolon separated UTF-8 with a BOM
+CSV_SEP = ";"
+CSV_ENCODING = "utf-8-sig"
 
 # SQL SERVER
 CONN_STR = (
@@ -290,114 +211,272 @@ CONN_STR = (
     "PWD="
 )
 
-def extract_linia_from_lokalizacja(lok: str) -> str | None:
-    parts = lok.split("-")
-    if len(parts) == 5:
-        return parts[-2]
-    return None
-
-def remove_duplicates_by_primary_key(df: pd.DataFrame, primary_key: str) -> pd.DataFrame:
-    if primary_key in df.columns:
+def remove_duplicates_by_primary_key(df: pd.DataFrame, primary_key: str | list[str]) -> pd.DataFrame:
+    keys = [primary_key] if isinstance(primary_key, str) else primary_key
+    if all(key in df.columns for key in keys):
         return df.drop_duplicates(subset=primary_key)
     return df
 
-def read_od_do(file_path: Path):
-    with open(file_path, encoding="utf-8") as f:
-        first_line = f.readline()
-
-    od_match = re.search(r"Od\s+(\d{2}\.\d{2}\.\d{4})", first_line)
-    do_match = re.search(r"Do\s+(\d{2}\.\d{2}\.\d{4})", first_line)
-
-    od_date = pd.to_datetime(od_match.group(1), dayfirst=True).date() if od_match else None
-    do_date = pd.to_datetime(do_match.group(1), dayfirst=True).date() if do_match else None
-
-    return od_date, do_date
-
-def process_csv(file_path: Path, settings: dict, conn):
-    df = pd.read_csv(file_path, dtype=str)
-
-    if settings["target_table"] == "LokalizacjaFunkcjonalna":
-        df.rename(columns=settings["column_map"], inplace=True)
-        df = df[df["LokalizacjaFunkcjonalnaId"].str.count("-") >= 4].copy()
-        df["LiniaId"] = df["LokalizacjaFunkcjonalnaId"].apply(extract_linia_from_lokalizacja)
-
-    elif settings["target_table"] == "Linie":
-        df.rename(columns=settings["column_map"], inplace=True)
-        df["LiniaId"] = df["LokalizacjaFunkcjonalnaId"].apply(extract_linia_from_lokalizacja)
-        df = df[df["LiniaId"].notna()]
-        
-        df = df.groupby("LiniaId", as_index=False)["Nazwa"].first()
-        df = df.rename(columns={"Nazwa": "LiniaNazwa"})
-
-    elif settings["target_table"] == "BilansProdukcji":
-        header_row_1 = df.iloc[2].fillna("").astype(str).str.strip()
-        header_row_2 = df.iloc[3].fillna("").astype(str).str.strip()
-        combined_headers = [
-            (a + " " + b).strip().replace(".", "").replace("/", "").replace(" ", "")
-            for a, b in zip(header_row_1, header_row_2)
-        ]
-
-        df = df.iloc[5:].copy()
-        df.columns = combined_headers
-        df.dropna(how="all", inplace=True)
-        df.reset_index(drop=True, inplace=True)
-
-        od_date, do_date = read_od_do(file_path)
-        df["Od"] = od_date
-        df["Do"] = do_date
-        df.rename(columns=settings["column_map"], inplace=True)
-    else:
-        df.rename(columns=settings["column_map"], inplace=True)
-        df = df[settings["columns"]]
-
-    for col, dtype in settings["dtypes"].items():
-        try:
-            if dtype == "int":
-                df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
-            elif dtype == "float":
-                df[col] = pd.to_numeric(df[col], errors="coerce")
-            elif dtype == "date":
-                df[col] = pd.to_datetime(df[col], errors="coerce").dt.date
-            elif dtype == "time":
-                df[col] = pd.to_datetime(df[col], errors="coerce").dt.time
-            elif dtype == "str":
-                df[col] = df[col].astype(str)
-        except Exception as e:
-            print(f"Failed to convert column {col} to {dtype}: {e}")
+def prepare_frame(df: pd.DataFrame, settings: dict) -> pd.DataFrame:
+    with stage("rename", len(df)) as counts:
+        if settings["target_table"] == "LokalizacjaFunkcjonalna":
+            df.rename(columns=settings["column_map"], inplace=True)
+            location = parse_locations(df["LokalizacjaFunkcjonalnaId"])
+            df = df[location["Poziom"] >= 5].copy()
+            df["LiniaId"] = location["Linia"]
+
+        elif settings["target_table"] == "Linie":
+            df.rename(columns=settings["column_map"], inplace=True)
+            location = parse_locations(df["LokalizacjaFunkcjonalnaId"])
+            df = pd.DataFrame({
+                "LiniaId": location["Linia"],
+                "LiniaNazwa": df["LiniaNazwa"],
+                "Poziom": location["Poziom"],
+            }).dropna(subset=["LiniaId"])
+            # the line's own row (PLPA-PR-U11-010703) names it, else its first section does
+            df = df.sort_values("Poziom", kind="stable").drop_duplicates(subset="LiniaId")[settings["columns"]]
+
+        else:
+            df.rename(columns=settings["column_map"], inplace=True)
+            df = df[settings["columns"]]
+        counts["rows_out"] = len(df)
+
+    df = coerce_frame(df, settings["dtypes"])
+
+    with stage("dedupe", len(df)) as counts:
+        primary_key = key_columns(settings)
+        keyed = df.dropna(subset=primary_key)
+        # rows without a usable key; the rest of the difference are duplicates
+        counts["rejected"] = len(df) - len(keyed)
+        df = remove_duplicates_by_primary_key(keyed, primary_key)
+        counts["rows_out"] = len(df)
+
+    return df
+
+def line_candidates(df: pd.DataFrame, settings: dict) -> pd.DataFrame:
+    """Raw rows of a chunk that may name a line: each line's highest-level (lowest Poziom) row, first one wins."""
+    code = next(source for source, target in settings["column_map"].items() if target == "LokalizacjaFunkcjonalnaId")
+    location = parse_locations(df[code])
+    ranked = location.dropna(subset=["Linia"]).sort_values("Poziom", kind="stable")
+    return df.loc[ranked.drop_duplicates(subset="Linia").index]
+
+def timed_reads(chunks: Iterator[tuple[int, pd.DataFrame]], file_path: Path) -> Iterator[tuple[int, pd.DataFrame]]:
+    """Record the "read" stage: only the time spent producing raw chunks, not the work done on them."""
+    chunks = iter(chunks)
+    while True:
+        with stage("read") as counts:
+            item = next(chunks, None)
+            if item is None:
+                # skipped rows of a resumed load are scanned all the same
+                counts["bytes"] = Path(file_path).stat().st_size
+            else:
+                counts["rows_out"] = item[0]
+        if item is None:
+            return
+        yield item
 
-    primary_key = settings["columns"][0]
-    df.dropna(subset=[primary_key], inplace=True)
+def read_chunks(file_path: Path, settings: dict, chunksize: int = BATCH_SIZE,
+                skip_rows: int = 0) -> Iterator[tuple[int, pd.DataFrame]]:
+    """
+    Stream an export in chunks of `chunksize` source rows, each already renamed,
+    converted and deduplicated. Only the columns named in column_map are parsed.
+    Yields (source rows consumed, prepared frame); `skip_rows` data rows are
+    skipped without being converted, which is how an interrupted load resumes.
+    """
+    if settings["target_table"] == "BilansProdukcji":
+        # the header band spans several rows and carries the period, so the
+        # report is streamed by its own parser
+        for source_rows, df in timed_reads(iter_bilans(file_path, chunksize, skip_rows), file_path):
+            yield source_rows, prepare_frame(df, settings)
+        return
 
-    df = remove_duplicates_by_primary_key(df, primary_key)
+    source_columns = set(settings["column_map"])
+    reader = pd.read_csv(
+        file_path,
+        sep=CSV_SEP,
+        encoding=CSV_ENCODING,
+        dtype=str,
+        usecols=lambda c: c in source_columns,
+        skiprows=range(1, skip_rows + 1),
+        chunksize=chunksize,
+    )
+    with reader:
+        chunks = timed_reads(((len(chunk), chunk) for chunk in reader), file_path)
+        if settings["target_table"] == "Linie":
+            # a line is named by its own row wherever in the file it is, so the
+            # candidates of all chunks are reduced first and the lines written once
+            source_rows, candidates = 0, []
+            for rows, chunk in chunks:
+                source_rows += rows
+                candidates.append(line_candidates(chunk, settings))
+            if candidates:
+                yield source_rows, prepare_frame(pd.concat(candidates, ignore_index=True), settings)
+            return
+        for source_rows, chunk in chunks:
+            yield source_rows, prepare_frame(chunk, settings)
 
-    cursor = conn.cursor()
-    placeholders = ", ".join(["?"] * len(settings["columns"]))
-    col_names = ", ".join(settings["columns"])
-    sql = f"INSERT INTO {settings['target_table']} ({col_names}) VALUES ({placeholders})"
+def write_frame(df: pd.DataFrame, settings: dict, conn, upsert: bool = True, bulk: bool = True) -> Counter:
+    table = settings["target_table"]
+    with stage("write", len(df)) as counts:
+        if upsert:
+            result = Counter(upsert_frame(df, conn, table, key_columns(settings), settings["columns"]))
+        else:
+            failed = insert_frame(df, settings, conn, bulk=bulk)
+            result = Counter(inserted=len(df) - len(failed), rejected=len(failed))
+        counts["rows_out"] = len(df) - result["rejected"]
+        counts["rejected"] = result["rejected"]
+    return result
 
-    for _, row in df.iterrows():
+def process_csv(file_path: Path, settings: dict, conn, upsert: bool = True, bulk: bool = True,
+                manifest: Manifest | None = None, full_reload: bool = False,
+                chunksize: int = BATCH_SIZE) -> Counter:
+    """
+    Load one export into settings["target_table"] chunk by chunk.
+    Returns the inserted / updated / unchanged / rejected row counts.
+    """
+    table = settings["target_table"]
+    start_row = 0
+    if manifest is not None:
+        fp = manifest.fingerprint(file_path)
+        if not full_reload:
+            start_row = manifest.committed_rows(fp, table)
+        manifest.start(fp, table, file_path, full_reload=full_reload)
+        if start_row:
+            print(f"Resuming {file_path.name} -> {table} from row {start_row}")
+
+    # each chunk is committed on its own, so the manifest watermark (counted
+    # in source rows) never runs ahead of what is actually in the database
+    totals = Counter()
+    rows_read = start_row
+    with file_run(file_path, table):
+        for source_rows, df in read_chunks(file_path, settings, chunksize, skip_rows=start_row):
+            totals += write_frame(df, settings, conn, upsert=upsert, bulk=bulk)
+            rows_read += source_rows
+            if manifest is not None:
+                manifest.commit_batch(fp, table, rows_read)
+
+    if manifest is not None:
+        manifest.finish(fp, table, rows_read, "rejected" if totals["rejected"] else "loaded")
+
+    print(
+        f"{file_path.name} -> {table}: "
+        f"{totals['inserted']} inserted, {totals['updated']} updated, "
+        f"{totals['unchanged']} unchanged, {totals['rejected']} rejected"
+    )
+    return totals
+
+def insert_frame(df: pd.DataFrame, settings: dict, conn, bulk: bool = True,
+                 batch_size: int = BATCH_SIZE) -> list[tuple[int, Exception]]:
+    table = settings["target_table"]
+    columns = settings["columns"]
+    placeholders = ", ".join(["?"] * len(columns))
+    col_names = ", ".join(columns)
+    sql = f"INSERT INTO {table} ({col_names}) VALUES ({placeholders})"
+
+    if not bulk:
+        cursor = conn.cursor()
+        failed = []
+        for i, (_, row) in enumerate(df.iterrows()):
+            try:
+                cursor.execute(sql, tuple(row[col] for col in columns))
+            except Exception as e:
+                print(f"Row insert failed in {table}: {e}")
+                failed.append((i, e))
+        conn.commit()
+        return failed
+
+    rows = frame_to_rows(df, columns)
+    failed = []
+    for start in range(0, len(rows), batch_size):
+        failed += insert_batch(conn, sql, rows[start:start + batch_size], start)
+
+    for i, e in failed:
+        print(f"Row insert failed in {table} (row {i}, {columns[0]}={rows[i][0]}): {e}")
+
+    return failed
+
+def load_table(key: str, settings: dict, conn, manifest: Manifest, full_reload: bool = False):
+    """
+    Load every export of one FILE_PATTERNS entry. A failing file does not
+    stop the others, but the table is reported as failed afterwards, so
+    run_scheduled skips the tables that depend on it.
+    """
+    folder = BASE_FOLDER / settings["folder"]
+    if not folder.exists():
+        return
+
+    failed = []
+    for file_path in folder.glob("*.csv"):
         try:
-            cursor.execute(sql, tuple(row[col] for col in settings["columns"]))
+            fp = manifest.fingerprint(file_path)
+            if not full_reload and manifest.is_loaded(fp, settings["target_table"]):
+                continue
+            process_csv(file_path, settings, conn, manifest=manifest, full_reload=full_reload)
         except Exception as e:
-            print(f"Row insert failed in {settings['target_table']}: {e}")
+            print(f"Error processing {file_path.name}: {e}")
+            failed.append(file_path.name)
 
-    conn.commit()
+    if failed:
+        raise RuntimeError(f"{len(failed)} file(s) failed: {', '.join(failed)}")
 
 def main():
-    conn = pyodbc.connect(CONN_STR)
+    parser = argparse.ArgumentParser(description="Load SAP CSV exports into the ferrero database")
+    parser.add_argument("--full-reload", action="store_true",
+                        help="Reload every file, including ones the manifest already marks as loaded")
+    parser.add_argument("--manifest", default=str(MANIFEST_PATH), help="Path to the ingest manifest (SQLite)")
+    parser.add_argument("--jobs", type=int, default=4,
+                        help="Tables loaded at the same time (each on its own connection)")
+    parser.add_argument("--metrics", default=str(METRICS_PATH),
+                        help="Append per-file, per-stage timings here (JSON lines); empty to turn off")
+    parser.add_argument("--prometheus", help="Also write stage totals to this Prometheus textfile")
+    parser.add_argument("--profile", choices=["cprofile", "sample"],
+                        help="Profile every table's load into --profile-dir (cprofile implies --jobs 1)")
+    parser.add_argument("--profile-dir", default="profile")
+    parser.add_argument("--db", help=f"mssql, sqlite:<path> or duckdb:<path> (default: ${BACKEND_ENV}, else mssql)")
+    parser.add_argument("--create-schema", action="store_true",
+                        help="Create missing sql_script.sql tables first (always done for sqlite/duckdb)")
+    args = parser.parse_args()
 
-    for key, settings in FILE_PATTERNS.items():
-        folder = BASE_FOLDER / settings["folder"]
-        if not folder.exists():
-            continue
+    backend = get_backend(args.db, CONN_STR)
+    if args.create_schema or backend.dialect != "mssql":
+        conn = backend.connect()
+        try:
+            created = backend.create_schema(conn)
+        finally:
+            conn.close()
+        if created:
+            print(f"Created {', '.join(created)}")
 
-        for file_path in folder.glob("*.csv"):
-            try:
-                process_csv(file_path, settings, conn)
-            except Exception as e:
-                print(f"Error processing {file_path.name}: {e}")
+    manifest = Manifest(args.manifest)
+    metrics.configure(jsonl=args.metrics)
+
+    def load(key, settings, conn):
+        with profiled(key, args.profile, args.profile_dir):
+            load_table(key, settings, conn, manifest, args.full_reload)
+
+    workers = args.jobs
+    if args.profile == "cprofile" and workers > 1:
+        # one cProfile at a time per process (Python 3.12+ refuses a second one)
+        print("--profile cprofile loads one table at a time")
+        workers = 1
+
+    status = run_scheduled(FILE_PATTERNS, load, backend.connect, workers=workers)
+    for key, result in status.items():
+        if result != "done":
+            print(f"{key}: {result}")
+
+    # new BilansProdukcji weeks get their OEE/OAE figures right away
+    if status.get("bilans_produkcji") == "done":
+        conn = backend.connect()
+        try:
+            stats = refresh_oee(conn)
+        finally:
+            conn.close()
+        print(f"WskaznikiOEE: {stats['inserted']} inserted, {stats['updated']} updated, {stats['unchanged']} unchanged")
 
-    conn.close()
+    manifest.close()
+    if args.prometheus:
+        metrics.write_prometheus(args.prometheus)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,83 @@
+"""
+Rows/s of bazadanych.insert_frame: the old per-row cursor.execute loop vs
+the batched executemany loader. SQLite in memory stands in for SQL Server.
+
+    python -m benchmarks.bulk_load --rows 50000
+"""
+import argparse
+import sqlite3
+import time
+from datetime import date, time as dtime
+
+import numpy as np
+import pandas as pd
+
+from bazadanych import FILE_PATTERNS, insert_frame
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(dtime, dtime.isoformat)
+
+
+def synthetic_zawiadomienia(n: int, bad_rows: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    days = pd.Timestamp("2024-09-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D")
+    df = pd.DataFrame({
+        "ZawiadomienieId": pd.array(np.arange(12_000_000, 12_000_000 + n), dtype="Int64"),
+        "ZawiadomienieRodzaj": rng.choice(["1P", "PM", "PT", "ZW"], n),
+        "ZlecenieId": pd.array(rng.integers(50_000_000_000, 50_000_300_000, n), dtype="Int64"),
+        "Lokalizacja": rng.choice(["UGP11", "UGP12", "UGP43"], n),
+        "LokalizacjaFunkcjonalnaId": rng.choice(["PLPA-PR-U11-010703-003", "PLPA-PR-U12-010801-002"], n),
+        "UrzadzenieId": pd.array(rng.integers(10_079_542, 10_250_000, n), dtype="Int64"),
+        "DataUtworzenia": days.date,
+        "UszkodzenieId": pd.array(rng.integers(1, 500, n), dtype="Int64"),
+        "PrzyczynaId": pd.array(rng.integers(1, 200, n), dtype="Int64"),
+        "DataPoczatkuZaklocenia": days.date,
+        "DataKoncaZaklocenia": days.date,
+        "CzasPoczatkuZaklocenia": [dtime(h, m) for h, m in zip(rng.integers(0, 24, n), rng.integers(0, 60, n))],
+        "CzasKoncaZaklocenia": [dtime(h, m) for h, m in zip(rng.integers(0, 24, n), rng.integers(0, 60, n))],
+        "Przestoj": rng.choice(["X", ""], n),
+        "CzasPrzestoju": rng.exponential(30.0, n).round(2),
+        "JednostkaCzasu": "MIN",
+    })
+    if bad_rows:
+        # duplicate primary keys -> rejected by the PRIMARY KEY constraint
+        dupes = rng.choice(n - 1, bad_rows, replace=False) + 1
+        df.loc[dupes, "ZawiadomienieId"] = df["ZawiadomienieId"].iloc[0]
+    return df
+
+
+def fresh_connection(settings: dict) -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    cols = ", ".join(
+        f"{c} PRIMARY KEY" if c == settings["primary_key"] else c
+        for c in settings["columns"]
+    )
+    conn.execute(f"CREATE TABLE {settings['target_table']} ({cols})")
+    return conn
+
+
+def run(df: pd.DataFrame, settings: dict, bulk: bool) -> tuple[float, int]:
+    conn = fresh_connection(settings)
+    start = time.perf_counter()
+    failed = insert_frame(df, settings, conn, bulk=bulk)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed, len(failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark row-by-row vs bulk insert")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--bad-rows", type=int, default=10, help="Rows that violate the primary key")
+    args = parser.parse_args()
+
+    settings = FILE_PATTERNS["zawiadomienia"]
+    df = synthetic_zawiadomienia(args.rows, args.bad_rows)
+
+    for label, bulk in [("row-by-row", False), ("bulk", True)]:
+        elapsed, failed = run(df, settings, bulk)
+        print(f"{label:>10}: {len(df) / elapsed:12,.0f} rows/s  ({elapsed:.2f} s, {failed} rejected)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Micro-benchmark of coercion.coerce_series against the conversions it
+replaced: format-less pd.to_datetime (per-element inference) and the
+row-wise .apply(lambda ...) decimal-comma fix.
+
+    python -m benchmarks.coercion --rows 200000
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import timed
+from coercion import coerce_series
+
+
+def sample(n: int) -> dict[str, pd.Series]:
+    rng = np.random.default_rng(0)
+    days = pd.Timestamp("2024-09-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D")
+    seconds = rng.integers(0, 86_400, n)
+    values = rng.exponential(500.0, n)
+    return {
+        "date": pd.Series(days.strftime("%d.%m.%Y")),
+        "time": pd.Series([f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in seconds]),
+        "float": pd.Series([f"{v:,.2f}".replace(",", " ").replace(".", ",") for v in values]),
+    }
+
+
+def old_way(kind: str, s: pd.Series) -> pd.Series:
+    if kind == "date":
+        return pd.to_datetime(s, errors="coerce").dt.date
+    if kind == "time":
+        return pd.to_datetime(s, errors="coerce").dt.time
+    return pd.to_numeric(s.apply(lambda x: str(x).replace(" ", "").replace(",", ".")), errors="coerce")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark column coercion")
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    import warnings
+    warnings.simplefilter("ignore", UserWarning)
+
+    for kind, s in sample(args.rows).items():
+        old = timed(old_way, kind, s)
+        new = timed(coerce_series, s, kind)
+        print(f"{kind:>6}: old {old:7.3f} s   new {new:7.3f} s   x{old / new:6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""Helpers shared by the micro-benchmarks."""
+import time
+
+
+def timed(fn, *args, repeat: int = 3) -> float:
+    """Best wall time of `repeat` calls of fn(*args), in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
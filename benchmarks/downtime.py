@@ -0,0 +1,43 @@
+"""
+Interval downtime engine (downtime.downtime_buckets): merge overlapping
+stoppages per line and split them into shift / day / week buckets, on
+synthetic notifications - one year, 150 lines, stoppages of an hour on
+average with a long tail.
+
+    python -m benchmarks.downtime --rows 300000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from downtime import DAY, downtime_buckets
+
+
+def synthetic(rows: int, lines: int = 150, seed: int = 0) -> tuple[np.ndarray, ...]:
+    rng = np.random.default_rng(seed)
+    line = 10_000 + rng.integers(0, lines, rows)
+    start = 1_735_689_600 + rng.integers(0, 365 * DAY, rows)  # 2025
+    end = start + rng.exponential(3600, rows).astype(np.int64)
+    return line, start, end
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the interval downtime engine")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 300_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        line, start, end = synthetic(rows)
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            shifts, weekly = downtime_buckets(line, start, end)
+            best = min(best, time.perf_counter() - t0)
+        print(f"{rows:>9} notifications: {best:6.3f} s  ({rows / best:>10,.0f} rows/s, "
+              f"{len(shifts)} shift buckets, {len(weekly)} line-weeks)")
+
+
+if __name__ == "__main__":
+    main()
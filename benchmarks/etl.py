@@ -0,0 +1,181 @@
+"""
+ETL benchmark suite: parse, coercion and load of the SAP exports, per
+stage, on synthetic exports (benchmarks/synthetic.py) at 10x/100x/1000x
+the sample size. A SQLite file built from sql_script.sql stands in for
+SQL Server.
+
+For every export and scale it reports rows in, wall time, rows/s and peak
+memory of
+    parse    - the raw CSV read (bazadanych.read_chunks reads the same way)
+    coerce   - bazadanych.prepare_frame: rename, typed conversion, dedup
+    load     - bazadanych.write_frame (upsert) into an empty table
+    pipeline - bazadanych.process_csv end to end, chunked as in production
+
+Results can be saved and compared with an earlier run:
+
+    python -m benchmarks.etl --scale 10 100 --save before.json
+    python -m benchmarks.etl --scale 10 100 --compare before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+from backends import SqliteBackend
+from bazadanych import CSV_ENCODING, CSV_SEP, FILE_PATTERNS, prepare_frame, process_csv, write_frame
+from benchmarks.synthetic import TEMPLATES, generate
+from bilans import read_bilans
+
+# FILE_PATTERNS entries measured, with the synthetic export each reads
+SUITE = {
+    "zawiadomienia": "zawiadomienia",
+    "zlecenia": "zlecenia",
+    "lokalizacja_funkcjonalna": "lokalizacja_funkcjonalna",
+    "linie": "lokalizacja_funkcjonalna",
+    "bilans_produkcji": "bilans_produkcji",
+}
+STAGES = ["parse", "coerce", "load", "pipeline"]
+
+
+def sqlite_standin(path: Path) -> sqlite3.Connection:
+    """An empty database with the tables and indexes of sql_script.sql (foreign keys left out)."""
+    path.unlink(missing_ok=True)
+    backend = SqliteBackend(path)
+    conn = backend.connect()
+    backend.create_schema(conn, calendar=False)
+    return conn
+
+
+class PeakMemory:
+    """
+    Peak resident memory of a block, in MiB. On Linux the kernel's
+    high-water mark is reset before the block (/proc/self/clear_refs), so the
+    figure includes pandas' C parser and numpy buffers; elsewhere it falls
+    back to tracemalloc, which sees Python allocations only.
+    """
+
+    def __enter__(self):
+        self.rss = self._reset_rss()
+        if self.rss:
+            self.base = self._status("VmRSS")
+        else:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.rss:
+            self.peak = max(self._status("VmHWM") - self.base, 0) / 1024
+        else:
+            self.peak = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+
+    @staticmethod
+    def _reset_rss() -> bool:
+        try:
+            Path("/proc/self/clear_refs").write_text("5")
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def _status(field: str) -> int:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+        return 0
+
+
+@contextlib.contextmanager
+def stage(results: list, key: str, scale: int, name: str, rows: int | None = None):
+    """Time and measure a block; `rows` going in, or set by the block as counted["rows"]."""
+    counted = {"rows": rows}
+    with PeakMemory() as mem:
+        start = time.perf_counter()
+        yield counted
+        elapsed = time.perf_counter() - start
+    rows = counted["rows"]
+    results.append({
+        "table": key, "scale": scale, "stage": name, "rows": rows,
+        "seconds": round(elapsed, 4), "rows_per_s": round(rows / elapsed) if elapsed else None,
+        "peak_mib": round(mem.peak, 1),
+    })
+
+
+def parse(path: Path, settings: dict) -> pd.DataFrame:
+    if settings["target_table"] == "BilansProdukcji":
+        return read_bilans(path)
+    source_columns = set(settings["column_map"])
+    return pd.read_csv(path, sep=CSV_SEP, encoding=CSV_ENCODING, dtype=str, usecols=lambda c: c in source_columns)
+
+
+def run_suite(paths: dict, scales: list[int], keys: list[str], db: Path) -> list[dict]:
+    results = []
+    for scale in scales:
+        for key in keys:
+            settings = FILE_PATTERNS[key]
+            path = paths[SUITE[key], scale]
+            with stage(results, key, scale, "parse") as counted:
+                raw = parse(path, settings)
+                counted["rows"] = source_rows = len(raw)
+            with stage(results, key, scale, "coerce", source_rows):
+                typed = prepare_frame(raw, settings)
+            del raw
+
+            conn = sqlite_standin(db)
+            with stage(results, key, scale, "load", len(typed)):
+                write_frame(typed, settings, conn)
+            conn.close()
+            del typed
+
+            conn = sqlite_standin(db)
+            with stage(results, key, scale, "pipeline", source_rows), contextlib.redirect_stdout(io.StringIO()):
+                process_csv(path, settings, conn)
+            conn.close()
+            report(results[-len(STAGES):])
+    return results
+
+
+def report(rows: list[dict], baseline: dict | None = None):
+    for r in rows:
+        line = (f"x{r['scale']:<5} {r['table']:<25} {r['stage']:<9} {r['rows']:>10,} rows "
+                f"{r['seconds']:>9.3f} s {r['rows_per_s'] or 0:>12,} rows/s {r['peak_mib']:>8.1f} MiB")
+        before = (baseline or {}).get((r["table"], r["scale"], r["stage"]))
+        if before and before["seconds"]:
+            line += f"   {100 * (r['seconds'] / before['seconds'] - 1):+6.1f}% time"
+            line += f" {r['peak_mib'] - before['peak_mib']:+8.1f} MiB"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ETL stages on synthetic SAP exports")
+    parser.add_argument("--scale", type=int, nargs="+", default=[10, 100],
+                        help="Multiples of the sample exports (1000 writes a few GB)")
+    parser.add_argument("--table", nargs="+", choices=list(SUITE), default=list(SUITE))
+    parser.add_argument("--data", help="Directory for the synthetic exports (kept between runs)")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Show changes against results saved with --save")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data = Path(args.data or tmp)
+        kinds = sorted({SUITE[key] for key in args.table})
+        paths = generate(data / "synthetic", args.scale, [k for k in TEMPLATES if k in kinds])
+        results = run_suite(paths, args.scale, args.table, Path(tmp) / "standin.sqlite")
+
+    if args.compare:
+        saved = json.loads(Path(args.compare).read_text())
+        print(f"\nCompared with {args.compare}:")
+        report(results, {(r["table"], r["scale"], r["stage"]): r for r in saved})
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Location parsing in the LokalizacjaFunkcjonalna / Linie loaders: the old
+per-row split("-") in .apply plus str.count filter and groupby().first()
+vs one locations.parse_locations pass, on the real exports from csv_files
+(repeated --scale times to get measurable sizes).
+
+    python -m benchmarks.locations --scale 100
+"""
+import argparse
+
+import pandas as pd
+
+from benchmarks.common import timed
+from locations import parse_locations
+
+EXPORTS = {
+    "lokalizacja_funkcjonalna.csv": "Lokaliz. funkc.",
+    "zawiadomienia.csv": "Lokalizacja funkc.",
+}
+
+
+def extract_linia_from_lokalizacja(lok: str) -> str | None:
+    parts = lok.split("-")
+    if len(parts) == 5:
+        return parts[-2]
+    return None
+
+
+def old_way(codes: pd.Series, names: pd.Series):
+    df = pd.DataFrame({"Id": codes, "Nazwa": names})
+    sections = df[df["Id"].str.count("-") >= 4].copy()
+    sections["LiniaId"] = sections["Id"].apply(extract_linia_from_lokalizacja)
+    df["LiniaId"] = df["Id"].apply(extract_linia_from_lokalizacja)
+    lines = df[df["LiniaId"].notna()].groupby("LiniaId", as_index=False)["Nazwa"].first()
+    return sections, lines
+
+
+def new_way(codes: pd.Series, names: pd.Series):
+    location = parse_locations(codes)
+    sections = location[location["Poziom"] >= 5]
+    lines = (
+        pd.DataFrame({"LiniaId": location["Linia"], "Nazwa": names, "Poziom": location["Poziom"]})
+        .dropna(subset=["LiniaId"])
+        .sort_values("Poziom", kind="stable")
+        .drop_duplicates(subset="LiniaId")
+    )
+    return sections, lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark functional location parsing")
+    parser.add_argument("--folder", default="csv_files")
+    parser.add_argument("--scale", type=int, default=100, help="Times each export is repeated")
+    args = parser.parse_args()
+
+    for name, column in EXPORTS.items():
+        df = pd.read_csv(f"{args.folder}/{name}", sep=";", encoding="utf-8-sig", dtype=str)
+        df = df.dropna(subset=[column])
+        codes = pd.concat([df[column]] * args.scale, ignore_index=True)
+        names = pd.Series(range(len(codes))).astype(str)
+        old = timed(old_way, codes, names)
+        new = timed(new_way, codes, names)
+        print(f"{name:>30} ({len(codes):>8} rows): old {old:7.3f} s   new {new:7.3f} s   x{old / new:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Pages/s of text_recognizer OCR as the number of worker processes grows.
+Needs Tesseract; the test sheets in the repo root are scans, so every page
+goes through OCR.
+
+    python -m benchmarks.ocr_scaling "POTWIERDZENIE SZKOLEŃ.pdf" --jobs 1 2 4 8
+"""
+import argparse
+import os
+import time
+from pathlib import Path
+
+import pypdfium2 as pdfium
+
+from text_recognizer import extract_text_ocr_parallel
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel OCR scaling")
+    parser.add_argument("pdf", help="PDF to OCR")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--lang", default="eng+pol")
+    parser.add_argument("--scale", type=float, default=2.0)
+    args = parser.parse_args()
+
+    pdf_path = Path(args.pdf)
+    pdf = pdfium.PdfDocument(pdf_path)
+    pages = len(pdf)
+    pdf.close()
+
+    baseline = None
+    for jobs in sorted(set(args.jobs)):
+        start = time.perf_counter()
+        extract_text_ocr_parallel(pdf_path, lang=args.lang, scale=args.scale, jobs=jobs)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"jobs {jobs:>3}: {elapsed:7.2f} s   {pages / elapsed:6.2f} pages/s   x{baseline / elapsed:5.2f}")
+
+
+if __name__ == "__main__":
+    main()
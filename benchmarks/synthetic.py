@@ -0,0 +1,150 @@
+"""
+Synthetic SAP exports for the ETL benchmarks: the sample exports in
+csv_files/ (and export_produkcja.csv) resampled to N times their size.
+
+Rows are drawn from the real files, so the quirks stay - semicolons, BOM
+and CRLF, decimal commas, dd.mm.yyyy dates, duplicated Polish headers,
+multi-line long texts. Keys are renumbered so every row is new, and each
+copy of the template is moved one template period later in time (or, for
+functional locations, into another plant).
+
+    python -m benchmarks.synthetic --scale 10 100 --out synthetic
+"""
+import argparse
+import csv
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+DATE = re.compile(r"\d{2}\.\d{2}\.\d{4}")
+
+# file_patterns key -> template, and the columns renumbered per row
+TEMPLATES = {
+    "zawiadomienia": (ROOT / "csv_files" / "zawiadomienia.csv", {"Zawiadomienie": 20_000_000, "Nr zlecenia": 60_000_000_000}),
+    "zlecenia": (ROOT / "csv_files" / "zlecenia.csv", {"Nr zlecenia": 60_000_000_000, "Zawiadomienie": 20_000_000}),
+    "lokalizacja_funkcjonalna": (ROOT / "csv_files" / "lokalizacja_funkcjonalna.csv", {}),
+    "bilans_produkcji": (ROOT / "export_produkcja.csv", {}),
+}
+# folder of each export, as in bazadanych.FILE_PATTERNS
+FOLDERS = {
+    "zawiadomienia": "zawiadomienia",
+    "zlecenia": "zlecenia",
+    "lokalizacja_funkcjonalna": "lokalizacja_funkcjonalna",
+    "bilans_produkcji": "bilans",
+}
+
+
+def read_template(path: Path) -> tuple[list[str], np.ndarray]:
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        header, *rows = csv.reader(f, delimiter=";")
+    return header, np.array(rows, dtype=object)
+
+
+def date_columns(rows: np.ndarray) -> list[int]:
+    """Columns whose filled cells are all dd.mm.yyyy dates."""
+    found = []
+    for i in range(rows.shape[1]):
+        cells = [c for c in rows[:, i] if c]
+        if cells and all(DATE.fullmatch(c) for c in cells):
+            found.append(i)
+    return found
+
+
+def shift_dates(cells: np.ndarray, days: np.ndarray) -> np.ndarray:
+    dates = pd.to_datetime(pd.Series(cells), format="%d.%m.%Y", errors="coerce")
+    shifted = (dates + pd.to_timedelta(days, unit="D")).dt.strftime("%d.%m.%Y")
+    return shifted.fillna("").to_numpy(dtype=object)
+
+
+def plant_code(copy: np.ndarray) -> np.ndarray:
+    """PLPA for the template itself, PL + two base-36 digits for the copies (up to 1296 plants)."""
+    digits = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    codes = np.array([f"PL{digits[k // 36 % 36]}{digits[k % 36]}" for k in range(copy.max() + 1)], dtype=object)
+    codes[0] = "PLPA"
+    return codes[copy]
+
+
+def synthesize(kind: str, scale: int, seed: int = 0) -> tuple[list[str], np.ndarray]:
+    """Header and rows of a `kind` export `scale` times the template's size."""
+    path, renumber = TEMPLATES[kind]
+    header, template = read_template(path)
+    n = len(template)
+    rng = np.random.default_rng(seed)
+
+    if kind in ("lokalizacja_funkcjonalna", "bilans_produkcji"):
+        # whole copies: the hierarchy / the week x line x family grid must stay complete
+        source = np.tile(np.arange(n), scale)
+    else:
+        source = rng.integers(0, n, n * scale)
+    copy = np.arange(n * scale) // n
+    rows = template[source].copy()
+
+    for col, base in renumber.items():
+        i = header.index(col)
+        filled = rows[:, i] != ""
+        rows[filled, i] = (base + np.flatnonzero(filled)).astype(str)
+
+    if kind == "lokalizacja_funkcjonalna":
+        codes = rows[:, 0].astype(str)
+        plant = plant_code(copy)
+        rows[:, 0] = [p + c[4:] for p, c in zip(plant, codes)]
+        rows[:, 2] = np.where(rows[:, 2] != "", plant, "")
+        return header, rows
+
+    dates = date_columns(template)
+    parsed = pd.to_datetime(pd.Series(template[:, dates[0]]), format="%d.%m.%Y", errors="coerce")
+    period = (parsed.max() - parsed.min()).days + 1
+    if kind == "bilans_produkcji":
+        period = -(-period // 7) * 7     # whole weeks, so Od stays a Monday
+    for i in dates:
+        rows[:, i] = shift_dates(rows[:, i], copy * period)
+
+    if kind == "bilans_produkcji":
+        od = pd.to_datetime(pd.Series(rows[:, header.index("Od")]), format="%d.%m.%Y")
+        iso = od.dt.isocalendar()
+        rows[:, 0] = ("W" + iso["week"].astype(str).str.zfill(2)).to_numpy(dtype=object)
+        rows[:, 1] = iso["week"].astype(str).to_numpy(dtype=object)
+        rows[:, 2] = iso["year"].astype(str).to_numpy(dtype=object)
+    return header, rows
+
+
+def write_export(path: Path, header: list[str], rows: np.ndarray):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=";", lineterminator="\r\n")
+        writer.writerow(header)
+        writer.writerows(rows.tolist())
+
+
+def generate(out_dir: Path, scales: list[int], kinds: list[str] | None = None, seed: int = 0) -> dict:
+    """
+    Write every export at every scale to out_dir/x<scale>/<folder>/<kind>.csv,
+    skipping files that already exist. Returns {(kind, scale): path}.
+    """
+    paths = {}
+    for scale in scales:
+        for kind in kinds or list(TEMPLATES):
+            path = Path(out_dir) / f"x{scale}" / FOLDERS[kind] / f"{kind}.csv"
+            if not path.exists():
+                write_export(path, *synthesize(kind, scale, seed))
+            paths[kind, scale] = path
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic SAP exports")
+    parser.add_argument("--scale", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--kind", nargs="+", choices=list(TEMPLATES))
+    parser.add_argument("--out", default="synthetic")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for (kind, scale), path in generate(Path(args.out), args.scale, args.kind, args.seed).items():
+        print(f"x{scale:<5} {kind:<25} {path.stat().st_size / 2**20:9.1f} MiB  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import csv
+import re
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+
+# The BilansProdukcji table (sql_script.sql); every export is mapped onto these names
+BILANS_COLUMNS = [
+    "Od", "Do", "Linia", "Rodzina", "QLTOTAkt", "QLTOTPln", "ProcentDvtProduk",
+    "ZmianaCzysty", "ZmianaPrg", "ZmianaStd", "QZmAkt", "QZmDocel", "QZmStd",
+    "QCPKAkt", "QCPKDocel", "QCPKStd", "OpeLNShAkt", "OpeLNShDocel", "OpeLNShStd",
+    "OpeELShAkt", "OpeELShDocel", "OpeELShStd", "GQLAkt", "GQLDocel", "GQLStd",
+    "ProcentSCEff", "ProcentSCStd", "ProcentSREff", "ProcentSRStd",
+    "ProcentSFSPEff", "ProcentSFSPStd", "GodzPracAkt", "GodzPracDocel", "GodzPracStd",
+    "ProcentELINIAEff", "ProcentELINIAObb", "ProcentELINIAStd",
+    "ProcentEPracEff", "ProcentEPracObb", "ProcentEPracStd",
+    "ProcentZyskuEff", "ProcentZyskuObb", "ProcentZyskuStd"
+]
+BILANS_DTYPES = {
+    "Od": "date",
+    "Do": "date",
+    "Linia": "int",
+    "Rodzina": "str",
+    **{col: "float" for col in BILANS_COLUMNS[4:]},
+}
+
+# Header spellings that differ from the table beyond punctuation and case.
+# Prefixes are rewritten for every header; fallbacks only fill a column no
+# header matched directly (the SAP report has both "Q/Zm. Standard" and
+# "Q/Zm. Std", the weekly export only the former).
+HEADER_PREFIXES = {
+    "PROCENTEFFLINIA": "PROCENTELINIA",   # % Eff LINIA Eff -> % E/LINIA Eff
+    "PROCENTEFFPRAC": "PROCENTEPRAC",     # % Eff Prac. Eff -> % E/Prac. Eff
+}
+HEADER_FALLBACKS = {
+    "QZMSTANDARD": "QZmStd",
+}
+
+PERIOD = re.compile(r"Od\s+(\d{2}\.\d{2}\.\d{4})\s+Do\s+(\d{2}\.\d{2}\.\d{4})")
+LINE_ID = re.compile(r"\d+")
+
+
+def header_key(label: str) -> str:
+    """'% E/LINIA Eff' and 'ProcentELINIAEff' both become 'PROCENTELINIAEFF'."""
+    key = re.sub(r"[^0-9A-Z]", "", label.upper().replace("%", "PROCENT"))
+    for prefix, replacement in HEADER_PREFIXES.items():
+        if key.startswith(prefix):
+            return replacement + key[len(prefix):]
+    return key
+
+
+CANONICAL = {header_key(col): col for col in BILANS_COLUMNS}
+
+
+def match_columns(labels: list[str]) -> dict[str, int]:
+    """Canonical column -> position of the first header naming it."""
+    positions = {}
+    fallbacks = {}
+    for i, label in enumerate(labels):
+        key = header_key(label)
+        if key in CANONICAL:
+            positions.setdefault(CANONICAL[key], i)
+        elif key in HEADER_FALLBACKS:
+            fallbacks.setdefault(HEADER_FALLBACKS[key], i)
+    return {**fallbacks, **positions}
+
+
+def _cells(row: list[str]) -> list[str]:
+    return [cell.strip() for cell in row]
+
+
+def iter_bilans(file_path: Path, chunksize: int = 10_000,
+                skip_rows: int = 0) -> Iterator[tuple[int, pd.DataFrame]]:
+    """
+    Read a production balance export in a single pass, in chunks of up to
+    `chunksize` data rows. Works for the SAP report (a title line with the
+    period, a two-row header band, blank separator rows) as well as for
+    flat multi-week exports with Od/Do on every row.
+
+    Yields (data rows consumed, frame of raw strings in BILANS_COLUMNS order);
+    the first `skip_rows` data rows are skipped, as in bazadanych.read_chunks.
+    """
+    period = (None, None)
+    header = None       # labels of the row naming Linia and Rodzina
+    columns = None      # canonical column -> position, fixed once the header band ends
+    rows = []
+    seen = 0
+
+    with open(file_path, encoding="utf-8-sig", newline="") as f:
+        for row in csv.reader(f, delimiter=";"):
+            cells = _cells(row)
+            if not any(cells):
+                continue
+
+            if header is None:
+                if "Linia" in cells and "Rodzina" in cells:
+                    header = cells
+                else:
+                    match = PERIOD.search(" ".join(cells))
+                    if match:
+                        period = match.groups()
+                continue
+
+            if columns is None:
+                line_pos = header.index("Linia")
+                if not LINE_ID.fullmatch(cells[line_pos] if line_pos < len(cells) else ""):
+                    # second header row: sub-labels under the group labels above
+                    header = [f"{top} {sub}".strip() for top, sub in
+                              zip(header, cells + [""] * (len(header) - len(cells)))]
+                    continue
+                columns = match_columns(header)
+                missing = [col for col in ("Linia", "Rodzina") if col not in columns]
+                if missing:
+                    raise ValueError(f"{Path(file_path).name}: no {', '.join(missing)} column in header")
+
+            if not LINE_ID.fullmatch(cells[columns["Linia"]] if columns["Linia"] < len(cells) else ""):
+                continue  # totals and footer rows
+            seen += 1
+            if seen <= skip_rows:
+                continue
+
+            rows.append([cells[i] if i < len(cells) else "" for i in columns.values()])
+            if len(rows) >= chunksize:
+                yield len(rows), _frame(rows, columns, period)
+                rows = []
+
+    if rows or seen == skip_rows:
+        yield len(rows), _frame(rows, columns or {}, period)
+
+
+def _frame(rows: list[list[str]], columns: dict[str, int], period: tuple) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=list(columns), dtype="string")
+    # per-row Od/Do (weekly exports) win over the period in the report title
+    for col, value in zip(("Od", "Do"), period):
+        if col not in df.columns:
+            df[col] = value
+    return df.reindex(columns=BILANS_COLUMNS)
+
+
+def read_bilans(file_path: Path) -> pd.DataFrame:
+    """The whole export as one frame of raw strings, see iter_bilans."""
+    frames = [df for _, df in iter_bilans(file_path, chunksize=1_000_000)]
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+
+from bazadanych import read_chunks
+from manifest import file_sha256
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # caching is an optimisation, parsing still works without it
+    pa = None
+
+CACHE_DIR = Path(".cache") / "parsed"
+# least recently used entries are removed once the cache grows past this
+CACHE_LIMIT_BYTES = 2 * 1024 ** 3
+
+
+def spec_hash(spec: dict) -> str:
+    """Stable hash of a FILE_PATTERNS entry (or any JSON-able parser description)."""
+    payload = json.dumps(spec, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_path(source_hash: str, spec: dict, cache_dir: Path = CACHE_DIR) -> Path:
+    return Path(cache_dir) / f"{source_hash[:20]}-{spec_hash(spec)[:12]}.arrow"
+
+
+def read_arrow(path: Path) -> pd.DataFrame:
+    with pa.memory_map(str(path), "r") as source:
+        return pa.ipc.open_file(source).read_all().to_pandas()
+
+
+def write_arrow(df: pd.DataFrame, path: Path):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp = path.with_suffix(".tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    # readers never see a half-written file
+    os.replace(tmp, path)
+
+
+def prune(cache_dir: Path = CACHE_DIR, limit_bytes: int = CACHE_LIMIT_BYTES):
+    entries = sorted(Path(cache_dir).glob("*.arrow"), key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in entries)
+    for path in entries:
+        if total <= limit_bytes:
+            break
+        total -= path.stat().st_size
+        path.unlink(missing_ok=True)
+
+
+def cached_frame(file_path: Path, spec: dict, parse: Callable[[Path], pd.DataFrame],
+                 cache_dir: Path = CACHE_DIR, limit_bytes: int = CACHE_LIMIT_BYTES) -> pd.DataFrame:
+    """
+    Return parse(file_path), reusing an Arrow IPC copy of an earlier result.
+
+    Entries are keyed on the content hash of the source and a hash of `spec`,
+    so editing either the export or its mapping produces a new entry; stale
+    ones age out through prune(). Hits are memory-mapped instead of
+    re-running read_csv and the type conversions.
+    """
+    if pa is None:
+        return parse(file_path)
+
+    path = cache_path(file_sha256(file_path), spec, cache_dir)
+    if path.exists():
+        os.utime(path)  # mtime doubles as last-used time for prune()
+        return read_arrow(path)
+
+    df = parse(file_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        write_arrow(df, path)
+        prune(cache_dir, limit_bytes)
+    except (pa.ArrowException, OSError) as e:
+        print(f"Could not cache {file_path}: {e}")
+    return df
+
+
+def cached_table(file_path: Path, settings: dict, **kwargs) -> pd.DataFrame:
+    """A whole export parsed and typed per its FILE_PATTERNS entry, served from the cache."""
+    def parse(path: Path) -> pd.DataFrame:
+        frames = [df for _, df in read_chunks(path, settings)]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=settings["columns"])
+
+    return cached_frame(file_path, settings, parse, **kwargs)
@@ -0,0 +1,98 @@
+import pandas as pd
+
+from metrics import stage
+
+# How SAP writes values in its CSV exports; a FILE_PATTERNS dtype given as a
+# plain string ("date", "float", ...) uses these, a dict overrides them, e.g.
+#   "Od": {"type": "date", "format": "%d.%m.%Y"}
+#   "QLTOTAkt": {"type": "float", "decimal": ",", "thousands": " "}
+SAP_DEFAULTS = {
+    "int": {"thousands": " "},
+    "float": {"decimal": ",", "thousands": " "},
+    "date": {"format": "%d.%m.%Y"},
+    "datetime": {"format": "%d.%m.%Y"},
+    "time": {"format": "%H:%M:%S"},
+    "str": {},
+}
+
+# SAP uses a non-breaking space as thousands separator in some reports
+NBSP = "\u00a0"
+
+
+def normalize_spec(spec: str | dict) -> dict:
+    if isinstance(spec, str):
+        spec = {"type": spec}
+    if spec["type"] not in SAP_DEFAULTS:
+        raise ValueError(f"Unknown dtype {spec['type']!r}")
+    return {**SAP_DEFAULTS[spec["type"]], **spec}
+
+
+def _numeric_text(s: pd.Series, decimal: str | None, thousands: str | None) -> pd.Series:
+    s = s.astype("string").str.strip()
+    if thousands:
+        s = s.str.replace(thousands, "", regex=False)
+        if thousands == " ":
+            s = s.str.replace(NBSP, "", regex=False)
+    if decimal and decimal != ".":
+        s = s.str.replace(decimal, ".", regex=False)
+    return s
+
+
+def _parse_datetime(s: pd.Series, fmt: str, part: str | None = None) -> pd.Series:
+    """Timestamps of `s`, or their "date" / "time" part."""
+    if pd.api.types.is_datetime64_any_dtype(s) or not pd.api.types.is_string_dtype(s):
+        # already date/datetime objects (e.g. Od/Do taken from a report header)
+        parsed = pd.to_datetime(s, errors="coerce")
+        return getattr(parsed.dt, part) if part else parsed
+
+    # an export repeats the same few hundred days and times; parse and split
+    # each distinct text once, then spread the results back to the rows
+    codes, uniques = pd.factorize(s)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object).str.strip(), format=fmt, errors="coerce")
+    if part:
+        parsed = getattr(parsed.dt, part)
+    # factorize marks missing values with -1, which reindex() turns into missing values
+    return parsed.reindex(codes).set_axis(s.index)
+
+
+def coerce_series(s: pd.Series, spec: str | dict) -> pd.Series:
+    """
+    Convert a whole column in one vectorized pass. The format is pinned, so
+    pandas never falls back to per-element inference, and day-first SAP
+    dates cannot be misread as month-first.
+    Unparseable values become missing.
+    """
+    spec = normalize_spec(spec)
+    kind = spec["type"]
+
+    if kind in ("int", "float"):
+        if not pd.api.types.is_numeric_dtype(s):
+            s = _numeric_text(s, spec.get("decimal"), spec.get("thousands"))
+        values = pd.to_numeric(s, errors="coerce")
+        if kind == "int":
+            return values.round().astype("Int64")
+        return values.astype("float64")
+
+    if kind == "date":
+        return _parse_datetime(s, spec["format"], "date")
+    if kind == "datetime":
+        return _parse_datetime(s, spec["format"])
+    if kind == "time":
+        return _parse_datetime(s, spec["format"], "time")
+
+    return s.astype("string")
+
+
+def coerce_frame(df: pd.DataFrame, dtypes: dict) -> pd.DataFrame:
+    """Apply coerce_series to every column named in a FILE_PATTERNS-style dtypes mapping."""
+    for col, spec in dtypes.items():
+        with stage(f"convert:{col}", len(df)) as counts:
+            try:
+                before = df[col].notna()
+                df[col] = coerce_series(df[col], spec)
+                # values present in the export that did not parse
+                counts["rejected"] = int((before & df[col].isna()).sum())
+            except Exception as e:
+                counts["rejected"] = len(df)
+                print(f"Failed to convert column {col} to {spec}: {e}")
+    return df
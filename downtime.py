@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+
+# Jedn. czasu przest. -> minutes
+UNIT_MINUTES = {"MIN": 1.0, "H": 60.0, "S": 1 / 60, "D": 1440.0}
+
+DAY = 86_400
+WEEK = 7 * DAY
+# bucket edges within a day, in seconds, and the shift each bucket belongs to:
+# 00-06 is the tail of the previous evening's night shift
+DAY_EDGES = np.array([0, 6, 14, 22]) * 3600
+EDGE_SHIFT = np.array([3, 1, 2, 3])
+# 1970-01-01 was a Thursday; shifting by three days puts week edges on Mondays
+MONDAY_OFFSET = 3 * DAY
+
+
+def timestamps(dates: pd.Series, times: pd.Series | None = None) -> pd.Series:
+    """
+    Date (+ time of day) columns - as strings, date/time objects or
+    datetimes - combined into one datetime column. A missing time is midnight.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        text = dates.astype("string").str.strip()
+        dayfirst = text.str.contains(".", regex=False).any()
+        dates = pd.to_datetime(text, format="%d.%m.%Y" if dayfirst else "%Y-%m-%d", errors="coerce")
+    if times is None:
+        return dates
+    if pd.api.types.is_datetime64_any_dtype(times):
+        times = times.dt.strftime("%H:%M:%S")
+    offset = pd.to_timedelta(times.astype("string").str.strip(), errors="coerce")
+    return dates + offset.fillna(pd.Timedelta(0))
+
+
+def to_seconds(ts: pd.Series) -> np.ndarray:
+    """Datetimes as int64 epoch seconds; missing values become INT64_MIN."""
+    return ts.to_numpy(dtype="datetime64[ns]").astype("datetime64[s]").astype(np.int64)
+
+
+def stoppage_bounds(start: pd.Series, end: pd.Series, duration: pd.Series | None = None,
+                    unit: pd.Series | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (start, end) epoch seconds of every stoppage. Where the end is missing it
+    is taken as start + Czas przestoju (in Jedn. czasu przest., hours by default).
+    """
+    start_s, end_s = to_seconds(start), to_seconds(end)
+    missing = end.isna().to_numpy()
+    if duration is not None and missing.any():
+        minutes = pd.to_numeric(duration, errors="coerce").to_numpy(dtype="float64")
+        if unit is not None:
+            per_unit = unit.astype("string").str.strip().str.upper().map(UNIT_MINUTES)
+            minutes = minutes * per_unit.fillna(60.0).to_numpy(dtype="float64")
+        else:
+            minutes = minutes * 60.0
+        fallback = start_s + np.nan_to_num(minutes * 60).astype(np.int64)
+        end_s = np.where(missing, fallback, end_s)
+    # without a start (or any end) there is no interval: make it empty
+    unknown = start.isna().to_numpy() | (end_s == np.iinfo(np.int64).min)
+    return start_s, np.where(unknown, start_s, end_s)
+
+
+def merge_intervals(line: np.ndarray, start: np.ndarray, end: np.ndarray) -> tuple[np.ndarray, ...]:
+    """
+    Union of the [start, end) intervals of each line: overlapping or touching
+    notifications become one stoppage. Returns (line, start, end) of the
+    merged stoppages, sorted by line and start.
+    """
+    valid = (end > start) & (line >= 0)
+    line, start, end = line[valid], start[valid], end[valid]
+    if len(line) == 0:
+        return line, start, end
+
+    # one sort on a (line, start) composite key; a single int64 argsort is
+    # several times faster than lexsort on two columns (LiniaIds are small
+    # enough that line * span stays far inside int64)
+    group = line - line.min()
+    base = start.min()
+    span = end.max() - base + 1
+    order = np.argsort(group * span + (start - base))
+    line, start, end, group = line[order], start[order], end[order], group[order]
+    first_of_line = np.r_[True, group[1:] != group[:-1]]
+
+    # running max of `end` per line in one pass: lift every line above all
+    # earlier ones, so the global cumulative max never leaks across lines
+    lift = group * span
+    reach = np.maximum.accumulate(end - base + lift) - lift + base
+
+    opens = first_of_line.copy()
+    opens[1:] |= start[1:] > reach[:-1]
+    idx = np.flatnonzero(opens)
+    return line[idx], start[idx], np.maximum.reduceat(end, idx)
+
+
+def split_intervals(line: np.ndarray, start: np.ndarray, end: np.ndarray) -> pd.DataFrame:
+    """
+    Cut intervals at midnight and at every shift change (06, 14, 22).
+    Returns one row per piece: Linia, Przestoj (index of the interval),
+    Data (the calendar day), Zmiana and Sekundy.
+    """
+    if len(line) == 0:
+        return pd.DataFrame({
+            "Linia": line, "Przestoj": np.array([], dtype=np.int64), "Data": np.array([], dtype="datetime64[D]"),
+            "Zmiana": np.array([], dtype=np.int64), "Sekundy": np.array([], dtype=np.int64),
+        })
+
+    first_day, last_day = start.min() // DAY, (end.max() - 1) // DAY
+    edges = ((np.arange(first_day, last_day + 2) * DAY)[:, None] + DAY_EDGES).ravel()
+
+    first = np.searchsorted(edges, start, side="right") - 1
+    last = np.searchsorted(edges, end, side="left") - 1
+    count = last - first + 1
+
+    # piece j of interval i sits in bucket first[i] + j
+    owner = np.repeat(np.arange(len(start)), count)
+    bucket = np.repeat(first, count) + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    seconds = np.minimum(end[owner], edges[bucket + 1]) - np.maximum(start[owner], edges[bucket])
+
+    return pd.DataFrame({
+        "Linia": line[owner],
+        "Przestoj": owner,
+        "Data": (edges[bucket] // DAY).astype("datetime64[D]"),
+        "Zmiana": EDGE_SHIFT[bucket % len(DAY_EDGES)],
+        "Sekundy": seconds,
+    })
+
+
+def clip_intervals(line: np.ndarray, start: np.ndarray, end: np.ndarray,
+                   lo: int | np.ndarray | None = None,
+                   hi: int | np.ndarray | None = None) -> tuple[np.ndarray, ...]:
+    """Intervals cut to [lo, hi) - one window for all, or one per interval; those left empty are dropped."""
+    if lo is not None:
+        start = np.maximum(start, lo)
+    if hi is not None:
+        end = np.minimum(end, hi)
+    keep = end > start
+    return line[keep], start[keep], end[keep]
+
+
+def week_of(seconds: np.ndarray) -> np.ndarray:
+    """Epoch second of the Monday 00:00 starting each timestamp's week."""
+    return (seconds + MONDAY_OFFSET) // WEEK * WEEK - MONDAY_OFFSET
+
+
+def touched_weeks(line: np.ndarray, start: np.ndarray, end: np.ndarray) -> pd.DataFrame:
+    """Every (Linia, week) an interval overlaps: Linia, Od (Monday, epoch seconds), Rok, Tydzien."""
+    keep = end > start
+    line, first, last = line[keep], week_of(start[keep]), week_of(end[keep] - 1)
+    count = (last - first) // WEEK + 1
+    owner = np.repeat(np.arange(len(line)), count)
+    step = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    weeks = pd.DataFrame({"Linia": line[owner], "Od": first[owner] + step * WEEK}).drop_duplicates()
+    iso = pd.to_datetime(weeks["Od"], unit="s").dt.isocalendar()
+    weeks["Rok"] = iso["year"].astype("int64")
+    weeks["Tydzien"] = iso["week"].astype("int64")
+    return weeks.reset_index(drop=True)
+
+
+def downtime_buckets(line: np.ndarray, start: np.ndarray, end: np.ndarray,
+                     lo: int | np.ndarray | None = None,
+                     hi: int | np.ndarray | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Merged downtime of raw notification intervals, optionally limited to
+    [lo, hi) (see clip_intervals): per (Linia, Data, Zmiana) and per
+    (Linia, Rok, Tydzien), in minutes, with the number of merged stoppages
+    touching each bucket.
+    """
+    # clipping first is the same as clipping the union, and lets every
+    # interval carry its own window
+    pieces = split_intervals(*merge_intervals(*clip_intervals(line, start, end, lo, hi)))
+    # ISO week of the few distinct days only, then spread to the pieces
+    days, day_idx = np.unique(pieces["Data"].to_numpy(), return_inverse=True)
+    iso = pd.DatetimeIndex(days).isocalendar()
+    pieces["Rok"] = iso["year"].to_numpy(dtype=np.int64)[day_idx]
+    pieces["Tydzien"] = iso["week"].to_numpy(dtype=np.int64)[day_idx]
+    pieces["Downtime_min"] = pieces["Sekundy"] / 60
+
+    # a stoppage has at most one piece per shift, so counting pieces counts stoppages
+    shifts = pieces.groupby(["Linia", "Rok", "Tydzien", "Data", "Zmiana"], as_index=False, sort=True).agg(
+        Downtime_min=("Downtime_min", "sum"),
+        Liczba=("Przestoj", "size"),
+    )
+    weekly = shifts.groupby(["Linia", "Rok", "Tydzien"], as_index=False, sort=True)["Downtime_min"].sum()
+    stoppages = pieces.drop_duplicates(subset=["Przestoj", "Rok", "Tydzien"])
+    weekly["Liczba"] = stoppages.groupby(["Linia", "Rok", "Tydzien"], sort=True).size().to_numpy()
+    return shifts, weekly
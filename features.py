@@ -0,0 +1,314 @@
+import argparse
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from downtime import DAY, downtime_buckets, stoppage_bounds, timestamps, to_seconds
+from hierarchy import STRUCTURE_FILE, HierarchyIndex, load_hierarchy
+from locations import parse_locations
+
+STORE_PATH = Path("cechy.sqlite")
+
+HORIZON = 2                      # days ahead to flag as 'soon awaria'
+TARGET_EVENTS = ("1P", "PM")     # only these are treated as true failures
+WINDOWS = (7, 30)                # rolling windows, in days
+LOOKBACK = max(WINDOWS)
+NO_FAILURE_YET = 9999            # since_prev before a line's first failure
+
+FEATURES = [
+    "since_prev", "month", "weekday",
+    "fails_1d", "fails_7d", "fails_30d",
+    "notes_1d", "notes_7d", "notes_30d",
+    "downtime_1d", "downtime_7d", "downtime_30d",
+]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS notifications (
+    ZawiadomienieId INTEGER PRIMARY KEY,
+    Linia INTEGER NOT NULL,
+    Rodzaj TEXT,
+    Dzien INTEGER NOT NULL,   -- day of creation, epoch days
+    Start INTEGER NOT NULL,   -- stoppage, epoch seconds (Start = Koniec: none)
+    Koniec INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_notifications_day ON notifications (Linia, Dzien);
+
+CREATE TABLE IF NOT EXISTS features (
+    Linia INTEGER NOT NULL,
+    Dzien INTEGER NOT NULL,
+    {", ".join(f"{name} REAL NOT NULL" for name in FEATURES)},
+    y INTEGER,                -- NULL until HORIZON later days are known
+    PRIMARY KEY (Linia, Dzien)
+);
+"""
+
+
+def prepare_notifications(df: pd.DataFrame, hierarchy: HierarchyIndex | None = None) -> pd.DataFrame:
+    """
+    Zawiadomienia rows with the database column names (as loaded by
+    bazadanych, or read back from the table) -> the rows the store keeps.
+    The line comes from the functional location code; with a `hierarchy`,
+    notifications whose code stops above the line level take the line of
+    their device instead of being dropped.
+    """
+    start_day = df["DataPoczatkuZaklocenia"].where(df["DataPoczatkuZaklocenia"].notna(), df["DataUtworzenia"])
+    start, end = stoppage_bounds(
+        timestamps(start_day, df["CzasPoczatkuZaklocenia"]),
+        timestamps(df["DataKoncaZaklocenia"], df["CzasKoncaZaklocenia"]),
+        df["CzasPrzestoju"],
+        df["JednostkaCzasu"],
+    )
+    line = parse_locations(df["LokalizacjaFunkcjonalnaId"])["Linia"]
+    if hierarchy is not None:
+        line = line.fillna(hierarchy.resolve(pd.to_numeric(df["UrzadzenieId"], errors="coerce").astype("Int64"))["Linia"])
+    rows = pd.DataFrame({
+        "ZawiadomienieId": pd.to_numeric(df["ZawiadomienieId"], errors="coerce").astype("Int64"),
+        "Linia": line,
+        "Rodzaj": df["ZawiadomienieRodzaj"].astype("string").str.strip(),
+        "Dzien": to_seconds(timestamps(df["DataUtworzenia"])) // DAY,
+        "Start": start,
+        "Koniec": np.maximum(start, end),
+    }, index=df.index)
+    created = timestamps(df["DataUtworzenia"]).notna()
+    return rows[created & rows["ZawiadomienieId"].notna() & rows["Linia"].notna()]
+
+
+def _rolling(values: np.ndarray, first_row: np.ndarray, days: int) -> np.ndarray:
+    """
+    Sum over the last `days` rows (this one included) of a series laid out
+    as consecutive daily rows per line; first_row[i] is the row index where
+    row i's line starts. One cumulative sum instead of a rolling() per line.
+    """
+    total = np.concatenate([[0.0], np.cumsum(values, dtype="float64")])
+    rows = np.arange(len(values))
+    return total[rows + 1] - total[np.maximum(rows + 1 - days, first_row)]
+
+
+def build_features(spans: pd.DataFrame, notes: pd.DataFrame, last_failure: pd.Series,
+                   until: int) -> pd.DataFrame:
+    """
+    Feature rows for every line and day in [spans.lo, until], all lines at once.
+
+    spans: Linia, lo (first day to produce; days are epoch days).
+    notes: notifications (Linia, Rodzaj, Dzien, Start, Koniec) from
+        LOOKBACK days before each line's lo on, plus stoppages overlapping
+        that window.
+    last_failure: day of each line's last target event before the window.
+    Labels for the last HORIZON days stay missing, as their future is not
+    known yet.
+    """
+    # line x day grid, LOOKBACK days of history in front of what is produced
+    first = spans["lo"].to_numpy(dtype=np.int64) - LOOKBACK
+    count = np.maximum(until - first + 1, 0)
+    line = np.repeat(spans["Linia"].to_numpy(dtype=np.int64), count)
+    start_of_line = np.repeat(np.cumsum(count) - count, count)
+    day = np.repeat(first, count) + np.arange(count.sum()) - start_of_line
+    grid = pd.DataFrame({"Linia": line, "Dzien": day})
+
+    def per_day(frame: pd.DataFrame, name: str, values=None) -> np.ndarray:
+        keyed = frame.assign(v=1.0 if values is None else values).groupby(["Linia", "Dzien"])["v"].sum()
+        return grid.join(keyed.rename(name), on=["Linia", "Dzien"])[name].fillna(0.0).to_numpy()
+
+    failures = notes[notes["Rodzaj"].isin(TARGET_EVENTS)]
+    fails = per_day(failures, "fails")
+    counts = per_day(notes, "notes")
+
+    # downtime per day from merged intervals, within the span of the grid
+    shifts, _ = downtime_buckets(
+        notes["Linia"].to_numpy(dtype=np.int64), notes["Start"].to_numpy(dtype=np.int64),
+        notes["Koniec"].to_numpy(dtype=np.int64), int(first.min()) * DAY, (until + 1) * DAY,
+    )
+    shifts["Dzien"] = shifts["Data"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+    minutes = per_day(shifts, "downtime", shifts["Downtime_min"])
+
+    out = grid.copy()
+    for name, values in (("fails", fails), ("notes", counts), ("downtime", minutes)):
+        out[f"{name}_1d"] = values
+        for days in WINDOWS:
+            out[f"{name}_{days}d"] = _rolling(values, start_of_line, days)
+
+    # days since the latest failure up to and including this day; the first
+    # row of a line starts from its last failure before the window
+    seen = np.where(fails > 0, day, np.nan)
+    opening = start_of_line == np.arange(len(day))
+    seen[opening & np.isnan(seen)] = pd.Series(line[opening & np.isnan(seen)]).map(last_failure).to_numpy(dtype="float64")
+    latest = pd.Series(seen).groupby(line).ffill().to_numpy()
+    out["since_prev"] = np.where(np.isnan(latest), NO_FAILURE_YET, day - latest)
+
+    dates = pd.to_datetime(day, unit="D")
+    out["month"] = dates.month.to_numpy()
+    out["weekday"] = dates.weekday.to_numpy()
+
+    # y: a failure on days d+1 .. d+HORIZON; the notebook also counted day d
+    # itself, whose failures are already in fails_1d
+    end_of_line = np.repeat(np.cumsum(count) - 1, count)
+    ahead = np.arange(len(day)) + HORIZON
+    total = np.concatenate([[0.0], np.cumsum(fails)])
+    future = total[np.minimum(ahead, end_of_line) + 1] - total[np.arange(len(day)) + 1]
+    out["y"] = pd.array(np.where(ahead <= end_of_line, future > 0, False), dtype="Int64")
+    out.loc[day + HORIZON > until, "y"] = pd.NA
+
+    keep = day >= np.repeat(spans["lo"].to_numpy(dtype=np.int64), count)
+    return out.loc[keep, ["Linia", "Dzien", *FEATURES, "y"]].reset_index(drop=True)
+
+
+class FeatureStore:
+    """
+    Daily failure-prediction features per line, kept in a local SQLite file.
+
+    Notifications are stored once; an update rebuilds only the days that can
+    have changed - from HORIZON days before the earliest new notification of
+    a line (their labels) up to `until` - reading LOOKBACK days of history
+    for the rolling windows. A daily run therefore adds one day per line.
+    """
+
+    def __init__(self, path: Path | str = STORE_PATH):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def update(self, notifications: pd.DataFrame, until: pd.Timestamp | None = None) -> int:
+        """
+        Merge prepared notifications (see prepare_notifications) and extend
+        every line's features to `until` (default: the latest day known).
+        Returns the number of feature rows written.
+        """
+        rows = notifications.drop_duplicates(subset="ZawiadomienieId", keep="last")
+        rows = rows[["ZawiadomienieId", "Linia", "Rodzaj", "Dzien", "Start", "Koniec"]].astype(object)
+        rows = rows.where(rows.notna(), None)
+
+        with self.lock, self.conn:
+            cur = self.conn.cursor()
+            cur.execute("DROP TABLE IF EXISTS temp.incoming")
+            cur.execute("CREATE TEMP TABLE incoming AS SELECT * FROM notifications WHERE 0")
+            cur.executemany("INSERT INTO incoming VALUES (?, ?, ?, ?, ?, ?)", rows.itertuples(index=False, name=None))
+            cur.execute("DELETE FROM incoming WHERE ZawiadomienieId IN "
+                        "(SELECT ZawiadomienieId FROM (SELECT * FROM notifications "
+                        "INTERSECT SELECT * FROM incoming))")
+
+            # first day each line has to be rebuilt from: the new rows, the
+            # rows they replace (by creation day and by stoppage start) ...
+            changed = pd.read_sql_query("""
+                SELECT Linia, MIN(Dzien) AS lo FROM (
+                    SELECT Linia, MIN(Dzien, Start / 86400) AS Dzien FROM incoming
+                    UNION ALL
+                    SELECT n.Linia, MIN(n.Dzien, n.Start / 86400)
+                    FROM notifications n JOIN incoming i ON i.ZawiadomienieId = n.ZawiadomienieId
+                ) GROUP BY Linia
+            """, self.conn)
+            cur.execute("INSERT OR REPLACE INTO notifications SELECT * FROM incoming")
+            cur.execute("DROP TABLE temp.incoming")
+
+            last_day = cur.execute("SELECT MAX(Dzien) FROM notifications").fetchone()[0]
+            if last_day is None:
+                return 0
+            until_day = last_day if until is None else int(pd.Timestamp(until).normalize().timestamp()) // DAY
+
+            # ... and the days after each line's last feature row
+            known = pd.read_sql_query("""
+                SELECT n.Linia, COALESCE(MAX(f.Dzien) + 1, MIN(n.Dzien)) AS lo
+                FROM notifications n LEFT JOIN features f ON f.Linia = n.Linia
+                GROUP BY n.Linia
+            """, self.conn)
+            spans = pd.concat([changed, known]).groupby("Linia", as_index=False)["lo"].min()
+            # labels of the last HORIZON days before that change too
+            spans["lo"] -= HORIZON
+            first_day = pd.read_sql_query(
+                "SELECT Linia, MIN(Dzien) AS first FROM notifications GROUP BY Linia", self.conn
+            ).set_index("Linia")["first"]
+            spans["lo"] = np.maximum(spans["lo"], spans["Linia"].map(first_day))
+            spans = spans[spans["lo"] <= until_day]
+            if spans.empty:
+                return 0
+
+            notes, last_failure = self._history(spans, until_day)
+            features = build_features(spans, notes, last_failure, until_day)
+
+            cur.executemany(
+                f"INSERT OR REPLACE INTO features VALUES ({', '.join(['?'] * (len(FEATURES) + 3))})",
+                features.astype(object).where(features.notna(), None).itertuples(index=False, name=None),
+            )
+        return len(features)
+
+    def _history(self, spans: pd.DataFrame, until_day: int) -> tuple[pd.DataFrame, pd.Series]:
+        """Notifications feeding the rebuilt days, and each line's last failure before them."""
+        cur = self.conn.cursor()
+        cur.execute("DROP TABLE IF EXISTS temp.spans")
+        cur.execute("CREATE TEMP TABLE spans (Linia INTEGER PRIMARY KEY, lo INTEGER)")
+        cur.executemany("INSERT INTO spans VALUES (?, ?)",
+                        ((int(linia), int(lo) - LOOKBACK) for linia, lo in spans[["Linia", "lo"]].itertuples(index=False)))
+        notes = pd.read_sql_query("""
+            SELECT n.Linia, n.Rodzaj, n.Dzien, n.Start, n.Koniec
+            FROM notifications n JOIN spans s ON s.Linia = n.Linia
+            WHERE (n.Dzien >= s.lo OR n.Koniec > s.lo * 86400) AND n.Dzien <= ?
+        """, self.conn, params=[until_day])
+        placeholders = ", ".join(["?"] * len(TARGET_EVENTS))
+        last_failure = pd.read_sql_query(f"""
+            SELECT n.Linia, MAX(n.Dzien) AS last
+            FROM notifications n JOIN spans s ON s.Linia = n.Linia
+            WHERE n.Dzien < s.lo AND n.Rodzaj IN ({placeholders})
+            GROUP BY n.Linia
+        """, self.conn, params=list(TARGET_EVENTS)).set_index("Linia")["last"]
+        cur.execute("DROP TABLE temp.spans")
+        return notes, last_failure
+
+    def training_frame(self, lines: list[int] | None = None) -> pd.DataFrame:
+        """Every labelled row, with Data as a date, for fitting the model."""
+        return self._read("y IS NOT NULL", lines)
+
+    def latest(self, lines: list[int] | None = None) -> pd.DataFrame:
+        """The most recent feature row of every line - what the model scores."""
+        return self._read("Dzien = (SELECT MAX(Dzien) FROM features f WHERE f.Linia = features.Linia)", lines)
+
+    def _read(self, where: str, lines: list[int] | None) -> pd.DataFrame:
+        sql = f"SELECT * FROM features WHERE {where}"
+        params: list = []
+        if lines:
+            sql += f" AND Linia IN ({', '.join(['?'] * len(lines))})"
+            params = [int(line) for line in lines]
+        with self.lock:
+            df = pd.read_sql_query(sql + " ORDER BY Linia, Dzien", self.conn, params=params)
+        df.insert(1, "Data", pd.to_datetime(df.pop("Dzien"), unit="D"))
+        return df
+
+
+def main():
+    from bazadanych import FILE_PATTERNS
+    from cache import cached_table
+
+    parser = argparse.ArgumentParser(description="Update the failure-prediction feature store")
+    parser.add_argument("exports", nargs="+", help="SAP Zawiadomienia CSV exports")
+    parser.add_argument("--store", default=str(STORE_PATH))
+    parser.add_argument("--until", help="Last day to produce features for (default: latest notification)")
+    parser.add_argument("--structure", default=str(STRUCTURE_FILE),
+                        help="Device tree used to find the line of notifications without one")
+    args = parser.parse_args()
+
+    hierarchy = None
+    if Path(args.structure).exists():
+        hierarchy = load_hierarchy(Path(args.structure))
+    else:
+        print(f"{args.structure} not found; notifications without a line code are skipped.")
+
+    with FeatureStore(args.store) as store:
+        for path in args.exports:
+            notes = prepare_notifications(cached_table(Path(path), FILE_PATTERNS["zawiadomienia"]), hierarchy)
+            written = store.update(notes, until=args.until)
+            print(f"{Path(path).name}: {len(notes)} notifications, {written} feature rows written")
+
+
+if __name__ == "__main__":
+    main()
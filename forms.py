@@ -0,0 +1,200 @@
+import argparse
+import json
+import re
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+
+from backends import get_backend
+from bazadanych import CONN_STR, write_frame
+from coercion import coerce_frame
+
+# dd.mm.yyyy, also written with dashes or slashes on the handwritten forms
+DATE = r"(\d{2})\s*[.\-/]\s*(\d{2})\s*[.\-/]\s*(\d{4})"
+DOCUMENT_CODE = r"Kod\s+dokumentu:\s*(PRB)\s*[-–]\s*(F)\s*[-–]\s*(\d+)"
+
+# One entry per form type, in the shape of bazadanych.FILE_PATTERNS.
+# "detect" picks the form type from the recognized text. A field rule takes
+# the value from `pattern` (its groups joined with `sep`, or only `group`),
+# searched in the whole text or, with `above`, in the line above the first
+# line matching that label (the forms print the label under the field).
+# Without a pattern, `part` picks one of the dotted-leader separated parts
+# of that line. "rows" turns a repeating table into one row per match, with
+# the header fields copied into each.
+FORM_PATTERNS = {
+    "test_kwalifikacyjny": {
+        "detect": re.compile(r"Formularz\s+weryfikacyjny|Test\s+wst[eę]pny", re.IGNORECASE),
+        "fields": {
+            "KodDokumentu": {"pattern": re.compile(DOCUMENT_CODE), "sep": "-"},
+            "Pracownik": {"above": re.compile(r"\(Imi[eę]\s+i\s+nazwisko\)"), "part": 0},
+            "DataTestu": {"above": re.compile(r"\(Data\)"), "pattern": re.compile(DATE), "sep": "."},
+            "Dzial": {"above": re.compile(r"\(Dzia[lł]\)"), "part": 0},
+            "Stanowisko": {"above": re.compile(r"\(Stanowisko\)"), "part": -1},
+            "Wynik": {"pattern": re.compile(r"(\d{1,2})\s*/\s*(\d{1,2})\s*p"), "group": 1},
+            "WynikMax": {"pattern": re.compile(r"(\d{1,2})\s*/\s*(\d{1,2})\s*p"), "group": 2},
+        },
+        "target_table": "TestyKwalifikacyjne",
+        "columns": [
+            "DokumentId", "Plik", "KodDokumentu", "Pracownik", "Dzial", "Stanowisko",
+            "DataTestu", "Wynik", "WynikMax"
+        ],
+        "dtypes": {
+            "DataTestu": "date",
+            "Wynik": "int",
+            "WynikMax": "int"
+        },
+        "primary_key": "DokumentId"
+    },
+    "potwierdzenie_szkolen": {
+        "detect": re.compile(r"Szkolenie\s+wst[eę]pne\s+i\s+stanowiskowe", re.IGNORECASE),
+        "fields": {
+            "KodDokumentu": {"pattern": re.compile(DOCUMENT_CODE), "sep": "-"},
+            "Pracownik": {"pattern": re.compile(r"Nazwisko\s+i\s+imi[eę]\s+pracownika[\s.…]*(.+)")},
+            "Stanowisko": {"pattern": re.compile(r"^\s*(\S.*?)[\s.…]*przeprowadzono", re.MULTILINE)},
+            "DataSzkolenia": {"pattern": re.compile(r"przeprowadzono\s+w\s+dniu\.?\s*" + DATE), "sep": "."},
+            "Prowadzacy": {"pattern": re.compile(r"Szkolenie\s+przeprowadzi[lł]\s+(.+)")},
+        },
+        "rows": {
+            "pattern": re.compile(r"(PRB)\s*[-–]\s*(I)\s*[-–]\s*(?:(BHP)\s*[-–]\s*)?(\d+)\s+" + DATE),
+            "columns": {"NrInstrukcji": ([1, 2, 3, 4], "-"), "DataSzkolenia": ([5, 6, 7], ".")},
+        },
+        "target_table": "SzkoleniaStanowiskowe",
+        "columns": [
+            "DokumentId", "NrInstrukcji", "Plik", "KodDokumentu", "Pracownik", "Stanowisko",
+            "Prowadzacy", "DataSzkolenia"
+        ],
+        "dtypes": {
+            "DataSzkolenia": "date"
+        },
+        "primary_key": ["DokumentId", "NrInstrukcji"]
+    },
+}
+
+
+def _clean(value: str) -> str:
+    """Drop the dotted leaders and stray punctuation OCR keeps around hand-filled values."""
+    return re.sub(r"\s+", " ", value).strip(" .…:_-–")
+
+
+def _join(match: re.Match, groups: list[int], sep: str) -> str:
+    return sep.join(_clean(match.group(g)) for g in groups if match.group(g))
+
+
+def _line_above(lines: list[str], label: re.Pattern) -> str | None:
+    for i, line in enumerate(lines):
+        if label.search(line):
+            for above in reversed(lines[:i]):
+                if above.strip():
+                    return above
+            return None
+    return None
+
+
+def extract_field(text: str, lines: list[str], rule: dict) -> str | None:
+    haystack = text
+    if "above" in rule:
+        haystack = _line_above(lines, rule["above"])
+        if haystack is None:
+            return None
+
+    if "pattern" in rule:
+        match = rule["pattern"].search(haystack)
+        if not match:
+            return None
+        groups = [rule["group"]] if "group" in rule else list(range(1, match.re.groups + 1)) or [0]
+        return _join(match, groups, rule.get("sep", " ")) or None
+
+    parts = [p for p in (_clean(p) for p in re.split(r"[.…_]{2,}|\s{3,}", haystack)) if p]
+    try:
+        return parts[rule.get("part", 0)]
+    except IndexError:
+        return None
+
+
+def detect_form(text: str) -> str | None:
+    return next((key for key, settings in FORM_PATTERNS.items() if settings["detect"].search(text)), None)
+
+
+def extract_form(text: str, settings: dict) -> list[dict]:
+    """Rows (column -> raw string) of one recognized document, per its FORM_PATTERNS entry."""
+    lines = text.splitlines()
+    header = {col: extract_field(text, lines, rule) for col, rule in settings["fields"].items()}
+    if "rows" not in settings:
+        return [header]
+
+    rows = []
+    for match in settings["rows"]["pattern"].finditer(text):
+        row = dict(header)
+        for col, (groups, sep) in settings["rows"]["columns"].items():
+            row[col] = _join(match, groups, sep)
+        rows.append(row)
+    return rows
+
+
+def forms_to_frames(records: list[dict]) -> dict[str, pd.DataFrame]:
+    """
+    Typed frames per form type from text_recognizer batch records
+    (path, sha256, text). Documents that match no template are reported and
+    skipped.
+    """
+    rows = {key: [] for key in FORM_PATTERNS}
+    for record in records:
+        if not record.get("text"):
+            continue
+        key = detect_form(record["text"])
+        if key is None:
+            print(f"No form template matches {record['path']}")
+            continue
+        for row in extract_form(record["text"], FORM_PATTERNS[key]):
+            rows[key].append({"DokumentId": record["sha256"], "Plik": Path(record["path"]).name, **row})
+
+    frames = {}
+    for key, settings in FORM_PATTERNS.items():
+        df = pd.DataFrame(rows[key], columns=settings["columns"])
+        df = coerce_frame(df, settings["dtypes"])
+        frames[key] = df.drop_duplicates(subset=settings["primary_key"], keep="last")
+    return frames
+
+
+def load_forms(jsonl_path: Path, conn) -> dict[str, Counter]:
+    """Extract every document of a text_recognizer JSON-lines file and upsert the rows."""
+    with open(jsonl_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    totals = {}
+    for key, df in forms_to_frames(records).items():
+        settings = FORM_PATTERNS[key]
+        totals[key] = write_frame(df, settings, conn) if len(df) else Counter()
+        print(
+            f"{Path(jsonl_path).name} -> {settings['target_table']}: "
+            f"{totals[key]['inserted']} inserted, {totals[key]['updated']} updated, "
+            f"{totals[key]['unchanged']} unchanged, {totals[key]['rejected']} rejected"
+        )
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load fields of recognized PRB-F forms into the ferrero database")
+    parser.add_argument("jsonl", help="Output of text_recognizer batch mode")
+    parser.add_argument("--dry-run", action="store_true", help="Print the extracted rows instead of loading them")
+    parser.add_argument("--db", help="mssql, sqlite:<path> or duckdb:<path> (default: $FERRERO_DB, else mssql)")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        with open(args.jsonl, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        for key, df in forms_to_frames(records).items():
+            print(f"--- {key} ({len(df)} rows) ---")
+            print(df.to_string(index=False))
+        return
+
+    conn = get_backend(args.db, CONN_STR).open()
+    try:
+        load_forms(Path(args.jsonl), conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
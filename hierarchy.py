@@ -0,0 +1,192 @@
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from manifest import file_sha256
+
+STRUCTURE_FILE = Path("urządzenia_struktura.json")
+CACHE_DIR = Path(".cache") / "hierarchy"
+# bump when the arrays below change, so cached indexes are rebuilt
+INDEX_VERSION = 1
+
+# node kinds, told apart by the shape of the id:
+# PLPA-PR-U11 / PLPA-PR-U11-010703 / PLPA-PR-U11-010703-003 / 10079542
+UNIT, LINE, SECTION, DEVICE = 1, 2, 3, 4
+KIND_BY_PARTS = {3: UNIT, 4: LINE, 5: SECTION}
+
+
+def node_kind(node_id: str) -> int:
+    if node_id.isdigit():
+        return DEVICE
+    return KIND_BY_PARTS.get(node_id.count("-") + 1, 0)
+
+
+def line_number(line_id: str) -> int | None:
+    """
+    PLPA-PR-U11-010703 -> 10703, the LiniaId used in the database; None when
+    the code has no numeric line part, as in locations.parse_locations.
+    """
+    parts = line_id.split("-")
+    if len(parts) < 4 or not re.fullmatch(r"\d{1,9}", parts[3]):
+        return None
+    return int(parts[3])
+
+
+class HierarchyIndex:
+    """
+    The plant -> line -> functional location -> device tree of
+    urządzenia_struktura.json flattened into arrays in pre-order.
+
+    Node i's subtree is the slice i:end[i], so subtree enumeration is a
+    slice and an ancestor test is two comparisons. parent, and the nearest
+    unit / line / section above every node, are precomputed arrays, so each
+    of those lookups is a single index operation.
+    """
+
+    ARRAYS = ("ids", "descs", "parent", "depth", "end", "kind", "unit", "line", "section", "line_no")
+
+    def __init__(self, ids, descs, parent, depth, end, kind, unit, line, section, line_no):
+        self.ids = ids
+        self.descs = descs
+        self.parent = parent
+        self.depth = depth
+        self.end = end
+        self.kind = kind
+        self.unit = unit
+        self.line = line
+        self.section = section
+        self.line_no = line_no  # LiniaId of the line above each node, -1 if none
+        self.index = {node_id: i for i, node_id in enumerate(ids.tolist())}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_tree(cls, tree: dict) -> "HierarchyIndex":
+        ids, descs, parent, depth, end = [], [], [], [], []
+        # iterative pre-order walk; the tree is too deep-and-wide for comfortable recursion
+        stack = [(node_id, node, -1, 0) for node_id, node in reversed(list(tree.items()))]
+        open_nodes = []
+        while stack:
+            node_id, node, parent_idx, level = stack.pop()
+            while open_nodes and depth[open_nodes[-1]] >= level:
+                end[open_nodes.pop()] = len(ids)
+            i = len(ids)
+            ids.append(node_id)
+            descs.append(node.get("_desc") or "")
+            parent.append(parent_idx)
+            depth.append(level)
+            end.append(-1)
+            open_nodes.append(i)
+            children = node.get("children") or {}
+            stack.extend((child_id, child, i, level + 1) for child_id, child in reversed(list(children.items())))
+        for i in open_nodes:
+            end[i] = len(ids)
+
+        kind = np.array([node_kind(node_id) for node_id in ids], dtype=np.int8)
+        parent = np.array(parent, dtype=np.int32)
+        # nearest ancestor-or-self of each kind; parents come before children in pre-order
+        nearest = {k: np.full(len(ids), -1, dtype=np.int32) for k in (UNIT, LINE, SECTION)}
+        for i in range(len(ids)):
+            for k, arr in nearest.items():
+                arr[i] = i if kind[i] == k else (arr[parent[i]] if parent[i] >= 0 else -1)
+
+        numbers = [line_number(ids[j]) if j >= 0 else None for j in nearest[LINE]]
+        line_no = np.array([-1 if n is None else n for n in numbers], dtype=np.int32)
+
+        return cls(
+            np.array(ids, dtype=str), np.array(descs, dtype=str), parent,
+            np.array(depth, dtype=np.int16), np.array(end, dtype=np.int32), kind,
+            nearest[UNIT], nearest[LINE], nearest[SECTION], line_no,
+        )
+
+    @classmethod
+    def from_json(cls, path: Path = STRUCTURE_FILE) -> "HierarchyIndex":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_tree(json.load(f))
+
+    def save(self, path: Path):
+        tmp = path.with_suffix(".tmp.npz")
+        np.savez(tmp, **{name: getattr(self, name) for name in self.ARRAYS})
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "HierarchyIndex":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(**{name: data[name] for name in cls.ARRAYS})
+
+    # -------- single-node lookups --------
+    def parent_of(self, node_id: str) -> str | None:
+        p = self.parent[self.index[node_id]]
+        return self.ids[p] if p >= 0 else None
+
+    def ancestors(self, node_id: str) -> list[str]:
+        """From the parent up to the root."""
+        out = []
+        p = self.parent[self.index[node_id]]
+        while p >= 0:
+            out.append(str(self.ids[p]))
+            p = self.parent[p]
+        return out
+
+    def is_ancestor(self, ancestor_id: str, node_id: str) -> bool:
+        a, n = self.index[ancestor_id], self.index[node_id]
+        return a < n < self.end[a]
+
+    def subtree(self, node_id: str, kind: int | None = None) -> list[str]:
+        """The node and everything below it, optionally only nodes of one kind (e.g. DEVICE)."""
+        i = self.index[node_id]
+        ids = self.ids[i:self.end[i]]
+        if kind is not None:
+            ids = ids[self.kind[i:self.end[i]] == kind]
+        return ids.tolist()
+
+    def line_of(self, node_id: str) -> str | None:
+        i = self.line[self.index[node_id]]
+        return str(self.ids[i]) if i >= 0 else None
+
+    # -------- vectorized lookups --------
+    def positions(self, node_ids: pd.Series) -> np.ndarray:
+        """Pre-order position of every id, -1 for ids not in the tree."""
+        keys = node_ids.astype("string").str.strip()
+        return keys.map(self.index).fillna(-1).astype(np.int32).to_numpy()
+
+    def resolve(self, node_ids: pd.Series) -> pd.DataFrame:
+        """
+        Unit, line (code and LiniaId), section and description for a column
+        of device ids or functional location codes, aligned to its index.
+        """
+        pos = self.positions(node_ids)
+        found = pos >= 0
+        safe = np.where(found, pos, 0)
+
+        def codes(level: np.ndarray) -> np.ndarray:
+            idx = np.where(found, level[safe], -1)
+            return np.where(idx >= 0, self.ids[np.maximum(idx, 0)], None)
+
+        line_no = np.where(found, self.line_no[safe], -1)
+        return pd.DataFrame({
+            "Jednostka": codes(self.unit),
+            "LokalizacjaLinii": codes(self.line),
+            "Linia": pd.Series(line_no, dtype="Int64").where(line_no >= 0).array,
+            "Sekcja": codes(self.section),
+            "Opis": np.where(found, self.descs[safe], None),
+        }, index=node_ids.index)
+
+
+def load_hierarchy(path: Path = STRUCTURE_FILE, cache_dir: Path = CACHE_DIR) -> HierarchyIndex:
+    """The index for `path`, built once per content hash and then loaded from a binary .npz copy."""
+    cache = Path(cache_dir) / f"{file_sha256(path)[:20]}-v{INDEX_VERSION}.npz"
+    if cache.exists():
+        return HierarchyIndex.load(cache)
+
+    index = HierarchyIndex.from_json(path)
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        index.save(cache)
+    except OSError as e:
+        print(f"Could not cache {path}: {e}")
+    return index
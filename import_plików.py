@@ -1,211 +1,73 @@
-import pyodbc
-import pandas as pd
-from sqlalchemy import create_engine
 import os
+from pathlib import Path
+
+from backends import get_backend
+from bazadanych import FILE_PATTERNS, process_csv
+from manifest import Manifest
 
 server = 'JASNACZERN'        
 database = 'ferrero'
 username = 'sa'
 password = '1234'
 driver = 'ODBC Driver 17 for SQL Server'  
-conn_str = f"mssql+pyodbc://{username}:{password}@{server}/{database}?driver={driver.replace(' ', '+')}"
-engine = create_engine(conn_str)
-
-# =============== ZLECENIA ===============
-
-csv_folder_zlecenia = 'zlecenia'
-try:
-    csv_file_zlecenia = next(f for f in os.listdir(csv_folder_zlecenia) if f.lower().endswith('.csv'))
-    file_path_zlecenia = os.path.join(csv_folder_zlecenia, csv_file_zlecenia)
-
-    zlecenia = pd.read_csv(file_path_zlecenia, encoding='utf-8-sig', sep=';')
-    zlecenia = zlecenia[["Nr zlecenia", "Rodzaj zlecenia", "Data wprowadzenia", "Godzina utworzenia"]]
-    zlecenia.columns = ["ZlecenieId", "ZlecenieRodzaj", "DataUtworzenia", "CzasUtworzenia"]
-
-    zlecenia["ZlecenieId"] = pd.to_numeric(zlecenia["ZlecenieId"], errors="coerce")
-    zlecenia["DataUtworzenia"] = pd.to_datetime(zlecenia["DataUtworzenia"], format="%d.%m.%Y", errors="coerce").dt.date
-    zlecenia["CzasUtworzenia"] = pd.to_datetime(zlecenia["CzasUtworzenia"], format="%H:%M:%S", errors="coerce").dt.time
-
-    with engine.connect() as conn:
-        existing_ids = pd.read_sql("SELECT ZlecenieId FROM Zlecenia", conn)["ZlecenieId"].tolist()
-
-    zlecenia = zlecenia[~zlecenia["ZlecenieId"].isin(existing_ids)]
-
-    if not zlecenia.empty:
-        zlecenia.to_sql('Zlecenia', con=engine, if_exists='append', index=False)
-        print(f"Inserted {len(zlecenia)} new records from {csv_file_zlecenia} into the Zlecenia table.")
-    else:
-        print(f"No new records to insert from {csv_file_zlecenia} into the Zlecenia table.")
-
-    os.remove(file_path_zlecenia)
-except StopIteration:
-    print("No .csv files found in the folder:", csv_folder_zlecenia)
-
-# =============== ZAWIADOMIENIA =================
-
-csv_folder_zawiadomienia = 'zawiadomienia'
-try:
-    csv_file_zawiadomienia = next(f for f in os.listdir(csv_folder_zawiadomienia) if f.endswith('.csv'))
-    file_path_zawiadomienia = os.path.join(csv_folder_zawiadomienia, csv_file_zawiadomienia)
-
-    zawiadomienia = pd.read_csv(file_path_zawiadomienia, encoding='utf-8-sig', sep=';')
-
-    zawiadomienia = zawiadomienia[["Zawiadomienie", "Rodzaj zawiadomienia", "Nr zlecenia", "Lokalizacja", "Lokalizacja funkc.", "Urządzenie", "Utworzono dnia", "Kod uszkodzenia", "Kod przyczyny", "Początek zakłócenia", "Koniec zakłócenia", "Pocz. zakłóc. (godz.)", "Koniec zakłóc.(godz.)", "Przestój", "Czas przestoju", "Jedn. czasu przest."]]
-    zawiadomienia.columns = ["ZawiadomienieId", "ZawiadomienieRodzaj", "ZlecenieId", "Lokalizacja", "LokalizacjaFunkcjonalnaId", "UrzadzenieId", "DataUtworzenia", "UszkodzenieId", "PrzyczynaId", "DataPoczatkuZaklocenia", "DataKoncaZaklocenia", "CzasPoczatkuZaklocenia", "CzasKoncaZaklocenia", "Przestoj", "CzasPrzestoju", "JednostkaCzasu"]
-
-    zawiadomienia["ZawiadomienieId"] = pd.to_numeric(zawiadomienia["ZawiadomienieId"], errors="coerce", downcast="integer")
-    zawiadomienia["ZlecenieId"] = pd.to_numeric(zawiadomienia["ZlecenieId"], errors="coerce")
-    zawiadomienia["UrzadzenieId"] = pd.to_numeric(zawiadomienia["UrzadzenieId"], errors="coerce", downcast="integer")
-    zawiadomienia["UszkodzenieId"] = pd.to_numeric(zawiadomienia["UszkodzenieId"], errors="coerce", downcast="integer")
-    zawiadomienia["PrzyczynaId"] = pd.to_numeric(zawiadomienia["PrzyczynaId"], errors="coerce", downcast="integer")
-
-    date_cols = ["DataUtworzenia", "DataPoczatkuZaklocenia", "DataKoncaZaklocenia"]
-    for col in date_cols:
-        zawiadomienia[col] = pd.to_datetime(zawiadomienia[col], format="%d.%m.%Y", errors="coerce").dt.date
-
-    time_cols = ["CzasPoczatkuZaklocenia", "CzasKoncaZaklocenia"]
-    for col in time_cols:
-        zawiadomienia[col] = pd.to_datetime(zawiadomienia[col], format="%H:%M:%S", errors="coerce").dt.time
-
-    zawiadomienia["CzasPrzestoju"] = zawiadomienia["CzasPrzestoju"].str.replace(",", ".", regex=False)
-    zawiadomienia["CzasPrzestoju"] = pd.to_numeric(zawiadomienia["CzasPrzestoju"], errors="coerce")
-
-    with engine.connect() as conn:
-        existing_ids = pd.read_sql("SELECT ZawiadomienieId FROM Zawiadomienia", conn)["ZawiadomienieId"].tolist()
-
-    zawiadomienia = zawiadomienia[~zawiadomienia["ZawiadomienieId"].isin(existing_ids)]
-
-    if not zawiadomienia.empty:
-        zawiadomienia.to_sql('Zawiadomienia', con=engine, if_exists='append', index=False)
-        print(f"Inserted {len(zawiadomienia)} new records from {csv_file_zawiadomienia} into the Zawiadomienia table.")
-    else:
-        print(f"No new records to insert from {csv_file_zawiadomienia} into the Zawiadomienia table.")
-
-    os.remove(file_path_zawiadomienia)
-except StopIteration:
-    print("No .csv files found in the folder:", csv_folder_zawiadomienia)
-
-# =============== BILANS PRODUKCJI ===============
-
-csv_folder_bilansprodukcji = 'bilansprodukcji'
-try:
-    csv_file_bilansprodukcji = next(f for f in os.listdir(csv_folder_bilansprodukcji) if f.endswith('.csv'))
-    file_path_bilansprodukcji = os.path.join(csv_folder_bilansprodukcji, csv_file_bilansprodukcji)
-
-    bilansprodukcji = pd.read_csv(file_path_bilansprodukcji, encoding='utf-8-sig', sep=';')
-
-    with open(file_path_bilansprodukcji, encoding="utf-8") as f:
-        first_line = f.readline()
-
-    import re
-    od_match = re.search(r"Od\s+(\d{2}\.\d{2}\.\d{4})", first_line)
-    do_match = re.search(r"Do\s+(\d{2}\.\d{2}\.\d{4})", first_line)
-
-    od_date = pd.to_datetime(od_match.group(1), dayfirst=True).date() if od_match else None
-    do_date = pd.to_datetime(do_match.group(1), dayfirst=True).date() if do_match else None
-
-    header_row_1 = bilansprodukcji.iloc[2].fillna("").astype(str).str.strip()
-    header_row_2 = bilansprodukcji.iloc[3].fillna("").astype(str).str.strip()
-    combined_headers = [
-        (a + " " + b).strip().replace(".", "").replace("/", "").replace(" ", "")
-        for a, b in zip(header_row_1, header_row_2)
-    ]
-
-    bilansprodukcji = bilansprodukcji.iloc[5:].copy()
-    bilansprodukcji.columns = combined_headers
-    bilansprodukcji.dropna(how="all", inplace=True)
-    bilansprodukcji.reset_index(drop=True, inplace=True)
-
-    bilansprodukcji["Od"] = od_date
-    bilansprodukcji["Do"] = do_date
-    bilansprodukcji.columns = [col.replace('%', 'Procent') for col in bilansprodukcji.columns]
-
-    float_columns = [
-        "QLTOTAkt", "QLTOTPln", "ProcentDvtProduk", "ZmianaCzysty", "ZmianaPrg", "ZmianaStd",
-        "QZmAkt", "QZmDocel", "QZmStd", "QCPKAkt", "QCPKDocel", "QCPKStd",
-        "OpeLNShAkt", "OpeLNShDocel", "OpeLNShStd", "OpeELShAkt", "OpeELShDocel", "OpeELShStd",
-        "GQLAkt", "GQLDocel", "GQLStd", "ProcentSCEff", "ProcentSCStd", "ProcentSREff", "ProcentSRStd",
-        "ProcentSFSPEff", "ProcentSFSPStd", "GodzPracAkt", "GodzPracDocel", "GodzPracStd",
-        "ProcentELINIAEff", "ProcentELINIAObb", "ProcentELINIAStd",
-        "ProcentEPracEff", "ProcentEPracObb", "ProcentEPracStd",
-        "ProcentZyskuEff", "ProcentZyskuObb", "ProcentZyskuStd"
-    ]
-
-    bilansprodukcji = bilansprodukcji.loc[:, ~bilansprodukcji.columns.duplicated()]
-    bilansprodukcji.drop(columns=["QZmStandard"], inplace=True)
-    for col in float_columns:
-        bilansprodukcji.loc[:, col] = bilansprodukcji[col].apply(lambda x: str(x).replace(' ', '').replace(',', '.'))
-        bilansprodukcji.loc[:, col] = pd.to_numeric(bilansprodukcji[col], errors='coerce')
-
-    bilansprodukcji = bilansprodukcji.astype({
-        "Od": "datetime64[ns]",
-        "Do": "datetime64[ns]",
-        "Linia": "int",
-        "Rodzina": "string",
-        "QLTOTAkt": "float",
-        "QLTOTPln": "float",
-        "ProcentDvtProduk": "float",
-        "ZmianaCzysty": "float",
-        "ZmianaPrg": "float",
-        "ZmianaStd": "float",
-        "QZmAkt": "float",
-        "QZmDocel": "float",
-        "QZmStd": "float",
-        "QCPKAkt": "float",
-        "QCPKDocel": "float",
-        "QCPKStd": "float",
-        "OpeLNShAkt": "float",
-        "OpeLNShDocel": "float",
-        "OpeLNShStd": "float",
-        "OpeELShAkt": "float",
-        "OpeELShDocel": "float",
-        "OpeELShStd": "float",
-        "GQLAkt": "float",
-        "GQLDocel": "float",
-        "GQLStd": "float",
-        "ProcentSCEff": "float",
-        "ProcentSCStd": "float",
-        "ProcentSREff": "float",
-        "ProcentSRStd": "float",
-        "ProcentSFSPEff": "float",
-        "ProcentSFSPStd": "float",
-        "GodzPracAkt": "float",
-        "GodzPracDocel": "float",
-        "GodzPracStd": "float",
-        "ProcentELINIAEff": "float",
-        "ProcentELINIAObb": "float",
-        "ProcentELINIAStd": "float",
-        "ProcentEPracEff": "float",
-        "ProcentEPracObb": "float",
-        "ProcentEPracStd": "float",
-        "ProcentZyskuEff": "float",
-        "ProcentZyskuObb": "float",
-        "ProcentZyskuStd": "float"
-    })
-
-    existing_keys = pd.read_sql("""
-        SELECT Od, Linia, Rodzina FROM BilansProdukcji
-    """, con=engine)
-
-    existing_keys["Od"] = pd.to_datetime(existing_keys["Od"])
-    existing_keys["Linia"] = existing_keys["Linia"].astype(int)
-    existing_keys["Rodzina"] = existing_keys["Rodzina"].astype(str)
-
-    merged = bilansprodukcji.merge(
-        existing_keys,
-        on=["Od", "Linia", "Rodzina"],
-        how="left",
-        indicator=True
+conn_str = f"DRIVER={{{driver}}};SERVER={server};DATABASE={database};UID={username};PWD={password}"
+# FERRERO_DB=sqlite:<path> / duckdb:<path> loads into a local database instead (backends.py)
+backend = get_backend(default_conn_str=conn_str)
+
+# loaded exports are recorded here and moved to <folder>/zaladowane
+manifest = Manifest("manifest.sqlite")
+
+
+# local export folder -> FILE_PATTERNS entry loaded from it
+FOLDERS = {
+    "zlecenia": "zlecenia",
+    "zawiadomienia": "zawiadomienia",
+    "bilansprodukcji": "bilans_produkcji",
+}
+
+
+def archive(file_path, subfolder="zaladowane"):
+    target = os.path.join(os.path.dirname(file_path), subfolder)
+    os.makedirs(target, exist_ok=True)
+    os.replace(file_path, os.path.join(target, os.path.basename(file_path)))
+
+
+def load_folder(folder, key, conn):
+    """
+    Stream every export in `folder` into its table, oldest first so newer
+    exports win, in chunks and reading only the mapped columns
+    (bazadanych.read_chunks). Loaded files move to <folder>/zaladowane.
+    A file with rejected rows moves to <folder>/odrzucone instead and stays
+    "rejected" in the manifest; put it back once its parent rows exist and
+    it is loaded again.
+    """
+    settings = FILE_PATTERNS[key]
+    table = settings["target_table"]
+    csv_files = sorted(
+        (Path(folder) / f for f in os.listdir(folder) if f.lower().endswith('.csv')),
+        key=lambda path: (path.stat().st_mtime_ns, path.name),
     )
-
-    new_rows = merged[merged["_merge"] == "left_only"].drop(columns=["_merge"])
-
-    if not new_rows.empty:
-        new_rows.to_sql("BilansProdukcji", con=engine, if_exists="append", index=False)
-        print(f"Inserted {len(new_rows)} new records from {csv_file_bilansprodukcji} into the BilansProdukcji table.")
-    else:
-        print("No new rows to insert.")
-
-    os.remove(file_path_bilansprodukcji)
-except StopIteration:
-    print("No .csv files found in the folder:", csv_folder_bilansprodukcji)
\ No newline at end of file
+    if not csv_files:
+        print("No .csv files found in the folder:", folder)
+        return
+
+    for file_path in csv_files:
+        fp = manifest.fingerprint(file_path)
+        if manifest.is_loaded(fp, table):
+            print(f"{file_path.name} was already loaded into {table}, skipping.")
+        else:
+            stats = process_csv(file_path, settings, conn, manifest=manifest)
+            if stats["rejected"]:
+                print(f"{file_path.name}: {stats['rejected']} rows rejected, moved to {folder}/odrzucone.")
+                archive(file_path, "odrzucone")
+                continue
+        archive(file_path)
+
+
+conn = backend.connect()
+try:
+    # Zlecenia before Zawiadomienia, which reference them
+    for folder, key in FOLDERS.items():
+        load_folder(folder, key, conn)
+finally:
+    conn.close()
@@ -0,0 +1,61 @@
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pandas' str.split does the same, only slower
+    pa = None
+
+# PLPA - PR - U11 - 010703 - 003
+#  plant  area  unit  line   section
+LEVELS = ["Zaklad", "Obszar", "Jednostka", "Linia", "Sekcja"]
+
+
+def _split_levels(codes: pd.Series) -> tuple[list[pd.Series], pd.Series]:
+    """One string column per level, plus the number of dash-separated parts of each code."""
+    n = len(LEVELS)
+    if pa is not None:
+        arr = pa.array(codes, type=pa.string())
+        # pad every code to at least n parts so each level can be taken by position,
+        # then strip the padding off the last level again
+        lists = pc.split_pattern(pc.binary_join_element_wise(arr, "-" * (n - 1), ""), "-", max_splits=n - 1)
+        columns = [pc.list_element(lists, i) for i in range(n)]
+        columns[-1] = pc.utf8_rtrim(columns[-1], characters="-")
+        parts = [pd.Series(col.to_pandas(), dtype="string") for col in columns]
+        depth = pd.Series(pc.add(pc.count_substring(arr, "-"), 1).to_pandas(), dtype="Int64")
+    else:
+        # anything below the section level stays in Sekcja
+        split = codes.str.split("-", n=n - 1, expand=True).reindex(columns=range(n)).astype("string")
+        parts = [split[i] for i in range(n)]
+        depth = codes.str.count("-").add(1).astype("Int64")
+    return [p.replace("", pd.NA) for p in parts], depth
+
+
+def parse_locations(codes: pd.Series) -> pd.DataFrame:
+    """
+    Split SAP functional location codes into their levels in one vectorized
+    pass, aligned to the index of `codes`:
+    Zaklad, Obszar, Jednostka and Sekcja as strings, Linia as the integer
+    LiniaId (010703 -> 10703), LokalizacjaLinii as the line-level code
+    (PLPA-PR-U11-010703) and Poziom as the number of dash-separated parts.
+    Levels a code does not reach are missing; so is Linia when that part is
+    not numeric.
+    """
+    # exports repeat the same few hundred codes; parse each distinct one once
+    positions, uniques = pd.factorize(codes.astype("string").str.strip())
+    uniques = pd.Series(uniques, dtype="string")
+
+    (plant, area, unit, line, section), depth = _split_levels(uniques)
+    line_id = line.where(line.str.fullmatch(r"\d{1,9}").fillna(False)).astype("Int64")
+
+    parsed = pd.DataFrame({
+        "Zaklad": plant,
+        "Obszar": area,
+        "Jednostka": unit,
+        "Linia": line_id,
+        "Sekcja": section,
+        "LokalizacjaLinii": plant + "-" + area + "-" + unit + "-" + line,
+        "Poziom": depth,
+    })
+    # factorize marks missing codes with -1, which reindex() turns into missing values
+    return parsed.reindex(positions).set_axis(codes.index)
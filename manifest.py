@@ -0,0 +1,151 @@
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple
+
+
+class Fingerprint(NamedTuple):
+    sha256: str
+    size: int
+    mtime_ns: int
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS loads (
+    sha256 TEXT NOT NULL,
+    target_table TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    rows_committed INTEGER NOT NULL DEFAULT 0,
+    rows_total INTEGER,
+    status TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    loaded_at TEXT,
+    PRIMARY KEY (sha256, target_table)
+);
+"""
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Manifest:
+    """
+    Local record of which export was loaded into which table.
+
+    A load is keyed on (content hash, target table), so the same file dropped
+    again under another name is still recognised, and one export feeding
+    several tables (zawiadomienia -> Zawiadomienia, Przyczyny, Uszkodzenia)
+    is tracked per table. A load is "partial" while it runs, then "loaded",
+    or "rejected" if some rows could not be written. rows_committed is advanced after every committed
+    batch, which lets an interrupted load resume where it stopped.
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # shared by the per-table loader threads
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def fingerprint(self, path: Path) -> Fingerprint:
+        """Content hash of `path`; unchanged files (same size and mtime) are not re-read."""
+        path = Path(path)
+        stat = path.stat()
+        key = str(path.resolve())
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT sha256 FROM files WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (key, stat.st_size, stat.st_mtime_ns),
+            ).fetchone()
+        if row:
+            return Fingerprint(row[0], stat.st_size, stat.st_mtime_ns)
+
+        sha = file_sha256(path)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                (key, stat.st_size, stat.st_mtime_ns, sha),
+            )
+        return Fingerprint(sha, stat.st_size, stat.st_mtime_ns)
+
+    def is_loaded(self, fp: Fingerprint, target_table: str) -> bool:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT status FROM loads WHERE sha256 = ? AND target_table = ?",
+                (fp.sha256, target_table),
+            ).fetchone()
+        return bool(row) and row[0] == "loaded"
+
+    def committed_rows(self, fp: Fingerprint, target_table: str) -> int:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT rows_committed FROM loads WHERE sha256 = ? AND target_table = ? AND status = 'partial'",
+                (fp.sha256, target_table),
+            ).fetchone()
+        return row[0] if row else 0
+
+    def start(self, fp: Fingerprint, target_table: str, path: Path, rows_total: int | None = None,
+              full_reload: bool = False):
+        """Open (or reopen) a load; a full reload resets the committed-row watermark."""
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO loads (sha256, target_table, path, size, rows_total, status, started_at)
+                VALUES (?, ?, ?, ?, ?, 'partial', ?)
+                ON CONFLICT (sha256, target_table) DO UPDATE SET
+                    path = excluded.path,
+                    rows_total = excluded.rows_total,
+                    status = 'partial',
+                    started_at = excluded.started_at,
+                    loaded_at = NULL,
+                    rows_committed = CASE WHEN ? OR loads.status = 'loaded' THEN 0 ELSE loads.rows_committed END
+                """,
+                (fp.sha256, target_table, str(path), fp.size, rows_total, now, full_reload),
+            )
+
+    def commit_batch(self, fp: Fingerprint, target_table: str, rows_committed: int):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE loads SET rows_committed = ? WHERE sha256 = ? AND target_table = ?",
+                (rows_committed, fp.sha256, target_table),
+            )
+
+    def finish(self, fp: Fingerprint, target_table: str, rows: int, status: str = "loaded"):
+        """
+        Close a load. A file read to the end with rejected rows is finished as
+        "rejected": it is not is_loaded, so the next run reads it again whole.
+        """
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                UPDATE loads SET status = ?, rows_committed = ?, rows_total = ?, loaded_at = ?
+                WHERE sha256 = ? AND target_table = ?
+                """,
+                (status, rows, rows, now, fp.sha256, target_table),
+            )
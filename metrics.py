@@ -0,0 +1,226 @@
+import contextlib
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+METRIC_PREFIX = "ferrero_ingest"
+# seconds between stack samples of the sampling profiler
+SAMPLE_INTERVAL = 0.005
+
+# record field -> (Prometheus metric, help); one gauge per table and stage
+PROMETHEUS_GAUGES = {
+    "seconds": ("stage_seconds", "Wall time spent in the stage, summed over files."),
+    "rows_in": ("stage_rows_in", "Rows entering the stage."),
+    "rows_out": ("stage_rows_out", "Rows leaving the stage."),
+    "rejected": ("stage_rows_rejected", "Rows or values the stage could not use."),
+    "bytes": ("stage_bytes_read", "Bytes of source files read."),
+}
+
+
+def peak_rss_mib() -> float | None:
+    """High-water mark of the process' resident memory so far."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+class FileRun:
+    """Stage counters of one export loaded into one table; stages are summed over chunks."""
+
+    def __init__(self, file: Path | str, table: str):
+        self.file = str(file)
+        self.table = table
+        self.started = time.perf_counter()
+        self.stages: dict[str, Counter] = {}
+
+    def add(self, stage: str, **counts):
+        self.stages.setdefault(stage, Counter()).update({k: v for k, v in counts.items() if v})
+
+    def records(self, status: str) -> list[dict]:
+        base = {"time": datetime.now().isoformat(timespec="seconds"), "file": self.file, "table": self.table}
+        rss = peak_rss_mib()
+        records = [
+            {**base, "stage": stage, "seconds": round(c["seconds"], 4), "calls": c["calls"],
+             "rows_in": c["rows_in"], "rows_out": c["rows_out"], "rejected": c["rejected"], "bytes": c["bytes"]}
+            for stage, c in self.stages.items()
+        ]
+        read = self.stages.get("read", Counter())
+        records.append({
+            **base, "stage": "total", "status": status,
+            "seconds": round(time.perf_counter() - self.started, 4),
+            "rows_in": read["rows_out"], "bytes": read["bytes"],
+            "rows_out": self.stages.get("write", Counter())["rows_out"],
+            "rejected": sum(c["rejected"] for c in self.stages.values()),
+            "peak_rss_mib": rss,
+        })
+        return records
+
+
+class Metrics:
+    """
+    Collects stage timings of the ingest. Each thread works on one FileRun at
+    a time, so the stage() calls deep in the pipeline (coerce_frame, ...)
+    need no extra arguments; outside a file_run they cost a thread-local
+    lookup and record nothing.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.jsonl: Path | None = None
+        self.totals: dict[tuple[str, str], Counter] = {}
+
+    def configure(self, jsonl: Path | str | None = None):
+        """Append every finished file's records to `jsonl` (JSON lines)."""
+        self.jsonl = Path(jsonl) if jsonl else None
+
+    @contextlib.contextmanager
+    def file_run(self, file: Path | str, table: str):
+        run = FileRun(file, table)
+        previous, self.local.run = getattr(self.local, "run", None), run
+        status = "done"
+        try:
+            yield run
+        except BaseException:
+            status = "failed"
+            raise
+        finally:
+            self.local.run = previous
+            self._emit(run.records(status))
+
+    @contextlib.contextmanager
+    def stage(self, name: str, rows_in: int | None = None):
+        """
+        Time a block as stage `name` of the current file. The block may fill
+        in rows_out, rejected and bytes of the yielded dict; rows_out
+        defaults to rows_in.
+        """
+        run = getattr(self.local, "run", None)
+        counts = {"rows_out": None, "rejected": 0, "bytes": 0}
+        if run is None:
+            yield counts
+            return
+        start = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            rows_out = counts["rows_out"] if counts["rows_out"] is not None else rows_in
+            run.add(name, seconds=time.perf_counter() - start, calls=1, rows_in=rows_in or 0,
+                    rows_out=rows_out or 0, rejected=counts["rejected"], bytes=counts["bytes"])
+
+    def _emit(self, records: list[dict]):
+        with self.lock:
+            for r in records:
+                if r["stage"] != "total":
+                    self.totals.setdefault((r["table"], r["stage"]), Counter()).update(
+                        {k: r[k] for k in PROMETHEUS_GAUGES}
+                    )
+            if self.jsonl is not None:
+                with open(self.jsonl, "a", encoding="utf-8") as f:
+                    for r in records:
+                        f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+    def write_prometheus(self, path: Path | str):
+        """
+        Stage totals of this process per table, in the Prometheus text format,
+        for node_exporter's textfile collector. Written to a temporary file
+        and renamed, so a scrape never sees half a file.
+        """
+        lines = []
+        with self.lock:
+            for key, (metric, help_text) in PROMETHEUS_GAUGES.items():
+                name = f"{METRIC_PREFIX}_{metric}"
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+                for (table, stage), counts in sorted(self.totals.items()):
+                    lines.append(f'{name}{{table="{table}",stage="{stage}"}} {counts[key]}')
+        rss = peak_rss_mib()
+        if rss is not None:
+            name = f"{METRIC_PREFIX}_peak_rss_bytes"
+            lines += [f"# HELP {name} Peak resident memory of the load.", f"# TYPE {name} gauge",
+                      f"{name} {int(rss * 2**20)}"]
+        name = f"{METRIC_PREFIX}_last_run_timestamp_seconds"
+        lines += [f"# HELP {name} When the load finished.", f"# TYPE {name} gauge", f"{name} {int(time.time())}"]
+
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp, path)
+
+
+metrics = Metrics()
+stage = metrics.stage
+file_run = metrics.file_run
+
+
+def _collapse(frame) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+@contextlib.contextmanager
+def profiled(name: str, mode: str | None, out_dir: Path | str = "profile"):
+    """
+    Profile the calling thread while the block runs.
+      "cprofile" - deterministic, written to <out_dir>/<name>.prof (pstats / snakeviz);
+                   only one can run at a time in a process, so never around
+                   blocks running concurrently on other threads
+      "sample"   - the thread's stack every SAMPLE_INTERVAL seconds, written as
+                   folded stacks to <out_dir>/<name>.folded (flamegraph.pl / speedscope);
+                   costs next to nothing, so it can stay on for a real nightly load
+    None profiles nothing.
+    """
+    if mode is None:
+        yield
+        return
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(out_dir / f"{name}.prof")
+        return
+
+    if mode != "sample":
+        raise ValueError(f"Unknown profiler {mode!r}")
+    target = threading.get_ident()
+    stacks = Counter()
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(target)
+            if frame is not None:
+                stacks[_collapse(frame)] += 1
+
+    sampler = threading.Thread(target=sample, daemon=True, name=f"sampler-{name}")
+    sampler.start()
+    try:
+        yield
+    finally:
+        done.set()
+        sampler.join()
+        with open(out_dir / f"{name}.folded", "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
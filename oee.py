@@ -0,0 +1,266 @@
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from downtime import downtime_buckets, stoppage_bounds, timestamps
+from locations import parse_locations
+from upsert import upsert_frame
+
+TARGET_TABLE = "WskaznikiOEE"
+KEYS = ["Od", "Linia"]
+
+SHIFT_MINUTES = 480
+# three shifts a day, seven days a week: the calendar time OAE is measured against
+SHIFTS_PER_WEEK = 21
+# latest materialized weeks recomputed on every run, so edits to notifications
+# created earlier (a stoppage end filled in later) still reach them
+TRAILING_WEEKS = 2
+
+COLUMNS = [
+    "Od", "Linia", "Rok", "Tydzien", "Kampania",
+    "CzasKalendarzowy_min", "CzasPlanowany_min", "Przestoj_min",
+    "PrzestojZmiana1_min", "PrzestojZmiana2_min", "PrzestojZmiana3_min",
+    "ZmianyEfektywne", "QLTOTAkt", "QLTOTPln",
+    "Dostepnosc", "Wydajnosc", "Jakosc", "OEE", "OAE"
+]
+
+
+def _query(conn, sql: str, params: list | tuple = ()) -> pd.DataFrame:
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    columns = [d[0] for d in cursor.description]
+    return pd.DataFrame([tuple(row) for row in cursor.fetchall()], columns=columns)
+
+
+def _placeholders(values: list) -> str:
+    return ", ".join(["?"] * len(values))
+
+
+def week_start(dates: pd.Series) -> pd.Series:
+    """Monday of the week of every date - the Od of the BilansProdukcji week."""
+    dates = pd.to_datetime(dates)
+    return dates - pd.to_timedelta(dates.dt.weekday, unit="D")
+
+
+def campaign_of(dates: pd.Series) -> pd.Series:
+    """Kampania as in the Data table: September starts the next season (2024/2025)."""
+    dates = pd.to_datetime(dates)
+    first = dates.dt.year - (dates.dt.month < 9)
+    return first.astype("string") + "/" + (first + 1).astype("string")
+
+
+def _dates(values: pd.Series) -> pd.Series:
+    return pd.to_datetime(values.astype("string").str[:10], format="%Y-%m-%d", errors="coerce")
+
+
+def _weeks(conn, table: str) -> set[date]:
+    od = _query(conn, f"SELECT DISTINCT Od FROM {table}")["Od"]
+    return set(_dates(od).dt.date)
+
+
+def stoppage_weeks(conn, created_since: date) -> set[date]:
+    """Every week overlapped by the stoppage of a notification created on or after `created_since`."""
+    df = _query(conn, """
+        SELECT COALESCE(DataPoczatkuZaklocenia, DataUtworzenia) AS DataPoczatku, DataKoncaZaklocenia
+        FROM Zawiadomienia
+        WHERE DataUtworzenia >= ?
+    """, [created_since.isoformat()])
+    first = week_start(_dates(df["DataPoczatku"])).dropna()
+    if first.empty:
+        return set()
+    last = week_start(_dates(df["DataKoncaZaklocenia"])).reindex(first.index)
+    last = last.where(last > first, first)
+
+    # one row per (notification, week) between the first and the last week
+    count = ((last - first).dt.days // 7 + 1).to_numpy()
+    offset = np.arange(count.sum()) - np.repeat(count.cumsum() - count, count)
+    weeks = np.repeat(first.to_numpy(), count) + pd.to_timedelta(offset * 7, unit="D")
+    return set(pd.Series(weeks).dt.date)
+
+
+def pending_weeks(conn) -> list[date]:
+    """
+    Weeks of BilansProdukcji without OEE figures yet, plus the materialized
+    weeks late notifications fall into: every week overlapped by a stoppage
+    reported since the latest materialized week began, and the last
+    TRAILING_WEEKS weeks.
+    """
+    loaded, done = _weeks(conn, "BilansProdukcji"), _weeks(conn, TARGET_TABLE)
+    weeks = loaded - done
+    if done:
+        weeks.update(sorted(done)[-TRAILING_WEEKS:])
+        weeks |= stoppage_weeks(conn, max(done))
+    return sorted(weeks & loaded)
+
+
+def read_production(conn, weeks: list[date]) -> pd.DataFrame:
+    """BilansProdukcji rows of the given weeks, with the campaign from the Data calendar."""
+    days = [week.isoformat() for week in weeks]
+    df = _query(conn, f"""
+        SELECT b.Od, b.Linia, b.Rodzina, b.QLTOTAkt, b.QLTOTPln, b.ZmianaPrg, b.QZmStd,
+               b.ProcentSCEff, d.Kampania
+        FROM BilansProdukcji b
+        LEFT JOIN Data d ON d.Data = b.Od
+        WHERE b.Od IN ({_placeholders(days)})
+    """, days)
+    df["Od"] = pd.to_datetime(df["Od"].astype("string"), format="%Y-%m-%d")
+    for col in ["QLTOTAkt", "QLTOTPln", "ZmianaPrg", "QZmStd", "ProcentSCEff"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def read_downtime(conn, weeks: list[date]) -> pd.DataFrame:
+    """Notifications whose stoppage overlaps the given weeks."""
+    first, last = min(weeks), max(weeks) + timedelta(days=7)
+    return _query(conn, """
+        SELECT LokalizacjaFunkcjonalnaId,
+               COALESCE(DataPoczatkuZaklocenia, DataUtworzenia) AS DataPoczatku, CzasPoczatkuZaklocenia,
+               DataKoncaZaklocenia, CzasKoncaZaklocenia, CzasPrzestoju, JednostkaCzasu
+        FROM Zawiadomienia
+        WHERE COALESCE(DataPoczatkuZaklocenia, DataUtworzenia) < ?
+          AND (DataKoncaZaklocenia >= ?
+               OR DataKoncaZaklocenia IS NULL AND COALESCE(DataPoczatkuZaklocenia, DataUtworzenia) >= ?)
+    """, [last.isoformat(), first.isoformat(), first.isoformat()])
+
+
+def downtime_by_week(notifications: pd.DataFrame, weeks: list[date]) -> pd.DataFrame:
+    """
+    Downtime minutes per (Od, Linia) of the given weeks, in total and per
+    shift. Overlapping notifications of a line count once and stoppages
+    running over midnight or a week end are split (downtime.py).
+    """
+    columns = KEYS + ["Przestoj_min", "PrzestojZmiana1_min", "PrzestojZmiana2_min", "PrzestojZmiana3_min"]
+    start, end = stoppage_bounds(
+        timestamps(notifications["DataPoczatku"], notifications["CzasPoczatkuZaklocenia"]),
+        timestamps(notifications["DataKoncaZaklocenia"], notifications["CzasKoncaZaklocenia"]),
+        notifications["CzasPrzestoju"],
+        notifications["JednostkaCzasu"],
+    )
+    line = parse_locations(notifications["LokalizacjaFunkcjonalnaId"])["Linia"].fillna(-1).to_numpy(dtype="int64")
+    lo = int(pd.Timestamp(min(weeks)).timestamp())
+    hi = int(pd.Timestamp(max(weeks) + timedelta(days=7)).timestamp())
+    shifts, _ = downtime_buckets(line, start, end, lo, hi)
+    if shifts.empty:
+        return pd.DataFrame(columns=columns)
+
+    shifts["Od"] = week_start(shifts["Data"])
+    per_shift = shifts.pivot_table(index=KEYS, columns="Zmiana", values="Downtime_min", aggfunc="sum", fill_value=0.0)
+    per_shift = per_shift.reindex(columns=[1, 2, 3], fill_value=0.0)
+    per_shift.columns = [f"PrzestojZmiana{shift}_min" for shift in per_shift.columns]
+    per_shift.insert(0, "Przestoj_min", per_shift.sum(axis=1))
+    return per_shift.reset_index()[columns]
+
+
+def compute_oee(production: pd.DataFrame, downtime: pd.DataFrame) -> pd.DataFrame:
+    """
+    OEE and OAE per line and week, all lines at once.
+
+    A week's planned time is its programmed shifts (ZmianaPrg), its calendar
+    time 21 shifts. Effective time is the output at standard rate
+    (QLTOTAkt / QZmStd shifts), quality the share of output that is not
+    scrap (% SC). Then
+        Dostepnosc = (planned - downtime) / planned
+        Wydajnosc  = effective / (planned - downtime)
+        OEE = Dostepnosc * Wydajnosc * Jakosc
+        OAE = effective * Jakosc / calendar
+    Families of a line are summed before the ratios are taken.
+    """
+    prod = production.assign(
+        ZmianyEfektywne=production["QLTOTAkt"] / production["QZmStd"].where(production["QZmStd"] > 0),
+        Odpad=production["QLTOTAkt"] * production["ProcentSCEff"].fillna(0.0) / 100,
+    )
+    weekly = prod.groupby(KEYS, as_index=False).agg(
+        QLTOTAkt=("QLTOTAkt", "sum"),
+        QLTOTPln=("QLTOTPln", "sum"),
+        ZmianaPrg=("ZmianaPrg", "sum"),
+        ZmianyEfektywne=("ZmianyEfektywne", "sum"),
+        Odpad=("Odpad", "sum"),
+        Kampania=("Kampania", "first"),
+    )
+
+    downtime = downtime.astype({"Linia": "int64"}) if len(downtime) else downtime
+    df = weekly.astype({"Linia": "int64"}).merge(downtime, on=KEYS, how="left")
+    loss_columns = ["Przestoj_min", "PrzestojZmiana1_min", "PrzestojZmiana2_min", "PrzestojZmiana3_min"]
+    df[loss_columns] = df[loss_columns].astype("float64").fillna(0.0)
+
+    planned = df["ZmianaPrg"] * SHIFT_MINUTES
+    running = (planned - df["Przestoj_min"]).clip(lower=0)
+    effective = df["ZmianyEfektywne"] * SHIFT_MINUTES
+    calendar = float(SHIFTS_PER_WEEK * SHIFT_MINUTES)
+
+    iso = df["Od"].dt.isocalendar()
+    df["Rok"] = iso["year"].astype("int64")
+    df["Tydzien"] = iso["week"].astype("int64")
+    df["Kampania"] = df["Kampania"].astype("string").fillna(campaign_of(df["Od"]))
+    df["CzasKalendarzowy_min"] = calendar
+    df["CzasPlanowany_min"] = planned
+    df["Dostepnosc"] = running / planned.where(planned > 0)
+    df["Wydajnosc"] = effective / running.where(running > 0)
+    df["Jakosc"] = 1 - df["Odpad"] / df["QLTOTAkt"].where(df["QLTOTAkt"] > 0)
+    df["OEE"] = effective * df["Jakosc"] / planned.where(planned > 0)
+    df["OAE"] = effective * df["Jakosc"] / calendar
+    df["Od"] = df["Od"].dt.date
+    return df[COLUMNS]
+
+
+def summarize(oee: pd.DataFrame, by: list[str]) -> pd.DataFrame:
+    """
+    Roll weekly figures up (e.g. by ["Linia", "Kampania"]) as ratios of
+    summed times, so long weeks weigh more than short ones.
+    """
+    df = oee.assign(
+        effective=oee["ZmianyEfektywne"] * SHIFT_MINUTES,
+        good=oee["ZmianyEfektywne"] * SHIFT_MINUTES * oee["Jakosc"],
+        running=(oee["CzasPlanowany_min"] - oee["Przestoj_min"]).clip(lower=0),
+    )
+    sums = df.groupby(by, as_index=False)[
+        ["CzasKalendarzowy_min", "CzasPlanowany_min", "Przestoj_min", "running", "effective", "good"]
+    ].sum()
+    sums["Dostepnosc"] = sums["running"] / sums["CzasPlanowany_min"].where(sums["CzasPlanowany_min"] > 0)
+    sums["Wydajnosc"] = sums["effective"] / sums["running"].where(sums["running"] > 0)
+    sums["Jakosc"] = sums["good"] / sums["effective"].where(sums["effective"] > 0)
+    sums["OEE"] = sums["good"] / sums["CzasPlanowany_min"].where(sums["CzasPlanowany_min"] > 0)
+    sums["OAE"] = sums["good"] / sums["CzasKalendarzowy_min"]
+    return sums.drop(columns=["running", "effective", "good"])
+
+
+def refresh_oee(conn, weeks: list[date] | None = None, full: bool = False) -> dict:
+    """
+    Recompute and upsert WskaznikiOEE. By default only pending_weeks are
+    computed, so a load of one new week costs about one week of work.
+    """
+    if full:
+        weeks = sorted(_weeks(conn, "BilansProdukcji"))
+    elif weeks is None:
+        weeks = pending_weeks(conn)
+    if not weeks:
+        return {"inserted": 0, "updated": 0, "unchanged": 0, "rejected": 0}
+
+    oee = compute_oee(read_production(conn, weeks), downtime_by_week(read_downtime(conn, weeks), weeks))
+    return upsert_frame(oee, conn, TARGET_TABLE, KEYS, COLUMNS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Materialize OEE/OAE per line and week in WskaznikiOEE")
+    parser.add_argument("--full", action="store_true", help="Recompute every week, not only new and late-reported ones")
+    parser.add_argument("--db", help="mssql, sqlite:<path> or duckdb:<path> (default: $FERRERO_DB, else mssql)")
+    args = parser.parse_args()
+
+    from backends import get_backend
+    from bazadanych import CONN_STR
+
+    conn = get_backend(args.db, CONN_STR).open()
+    try:
+        stats = refresh_oee(conn, full=args.full)
+    finally:
+        conn.close()
+    print(
+        f"{TARGET_TABLE}: {stats['inserted']} inserted, {stats['updated']} updated, "
+        f"{stats['unchanged']} unchanged, {stats['rejected']} rejected"
+    )
+
+
+if __name__ == "__main__":
+    main()
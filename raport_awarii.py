@@ -1,82 +1,181 @@
+import functools
+import os
 import pathlib
+import threading
+from typing import NamedTuple
 import pandas as pd
 import numpy as np
 from sklearn.linear_model import LinearRegression
 
 import dash
 from dash import dcc, html, dash_table
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 import plotly.express as px
 
+from aggregates import AggregateStore
+from cache import cached_frame
+from coercion import coerce_series
+from downtime import stoppage_bounds, timestamps
+from features import HORIZON
+from locations import parse_locations
+from manifest import Manifest
+from scoring import read_scores
+
+try:
+    from flask_caching import Cache
+except ImportError:  # payloads are then memoized per process only
+    Cache = None
+
 # ------------------------------------------------------------------
 # 1 – Load & preprocess data
 # ------------------------------------------------------------------
 FAILURE_FILE = "raport_awarii.csv"
 PROD_FILE    = "test.csv"
+# weekly aggregates plus the record of which exports they already contain
+STORE_FILE   = "agregaty.sqlite"
+# failure-risk scores written by scoring.py
+RISK_FILE    = "cechy.sqlite"
 
+# rendered per-line payloads; workers pointed at the same directory share them
+FIGURE_CACHE_DIR  = ".cache/dash"
+FIGURE_CACHE_SIZE = 128
 
-def load_and_prepare() -> pd.DataFrame:
-    # -------- Failure / downtime ----------
-    fail = pd.read_csv(FAILURE_FILE, sep=None, engine="python")
+# seconds between checks of the input files for new exports; 0 turns live refresh off
+REFRESH_SECONDS = int(os.environ.get("RAPORT_REFRESH_SECONDS", "60"))
 
-    # robust 5-digit line code extractor: …-010703 or …-010703-003 → 10703
-    pattern = r"(\d{5})(?:-\d{3})?$"
-    fail["Linia"] = (
-        fail["Lokalizacja funkc."]
-        .astype(str)
-        .str.extract(pattern)[0]
-        .astype(float)
-        .astype("Int64")
-    )
+# bump when the parsing below changes, so cached results are rebuilt
+PARSER_VERSION = 5
 
-    fail["Data"] = pd.to_datetime(
-        fail["Utworzono dnia"], format="%d.%m.%Y", errors="coerce"
-    )
-    fail["Tydzień"] = "W" + fail["Data"].dt.isocalendar().week.astype(str).str.zfill(2)
-
-    fail["Downtime_min"] = (
-        fail["Czas przestoju"]
-        .astype(str)
-        .str.replace(",", ".", regex=False)
-        .str.replace(" ", "", regex=False)
-        .astype(float)
-        .fillna(0.0)
-    )
 
-    downtime = (
-        fail.groupby(["Tydzień", "Linia"], as_index=False)["Downtime_min"]
-        .sum()
-        .rename(columns={"Downtime_min": "Total_downtime_min"})
+def parse_failures(path) -> pd.DataFrame:
+    fail = pd.read_csv(path, sep=None, engine="python", encoding="utf-8-sig", dtype=str)
+    fail["ZawiadomienieId"] = coerce_series(fail["Zawiadomienie"], "int")
+
+    # …-010703 or …-010703-003 → 10703
+    fail["Linia"] = parse_locations(fail["Lokalizacja funkc."])["Linia"]
+
+    # the stoppage itself, not the day the notification was written; exports
+    # without the start/end dates fall back to the creation day and Czas przestoju
+    start_day = fail.get("Początek zakłócenia", fail["Utworzono dnia"])
+    start = timestamps(start_day, fail["Pocz. zakłóc. (godz.)"])
+    if "Koniec zakłócenia" in fail:
+        end = timestamps(fail["Koniec zakłócenia"], fail["Koniec zakłóc.(godz.)"])
+    else:
+        end = pd.Series(pd.NaT, index=fail.index, dtype="datetime64[ns]")
+    start_s, end_s = stoppage_bounds(
+        start, end, coerce_series(fail["Czas przestoju"], "float"), fail["Jedn. czasu przest."]
     )
+    fail["Start"] = pd.to_datetime(start_s, unit="s")
+    fail["Koniec"] = pd.to_datetime(end_s, unit="s")
+
+    return fail[["ZawiadomienieId", "Linia", "Start", "Koniec"]]
+
 
-    # -------- Production ----------
-    prod = pd.read_csv(PROD_FILE, sep=None, engine="python")
+def parse_production(path) -> pd.DataFrame:
+    prod = pd.read_csv(path, sep=None, engine="python")
     prod["Linia"] = pd.to_numeric(prod["Linia"], errors="coerce").astype("Int64")
-    prod["Tydzień"] = prod["﻿Tydzień"].astype(str).str.strip()
+    prod["Tydzień"] = prod["\ufeffTydzień"].astype(str).str.strip()
+    # ISO year of the week: W01 2025 starts on 30.12.2024
+    prod["Rok"] = pd.to_numeric(prod["Rok"], errors="coerce").astype("Int64")
 
     # find the “Eff LINIA …” column automatically
     eff_col = next(c for c in prod.columns if "Eff LINIA" in c)
 
     for col in ["QL (TOT) Akt", "QL (TOT) Pln", eff_col]:
-        prod[col] = (
-            prod[col]
-            .astype(str)
-            .str.replace(",", ".", regex=False)
-            .str.replace(" ", "", regex=False)
-            .astype(float)
-        )
+        prod[col] = coerce_series(prod[col], "float")
 
     prod["QL_diff"]            = prod["QL (TOT) Akt"] - prod["QL (TOT) Pln"]
     prod["Line_efficiency_pct"] = prod[eff_col]
 
-    prod_clean = prod[["Tydzień", "Linia", "Line_efficiency_pct", "QL_diff"]]
+    return prod[["Rok", "Tydzień", "Linia", "Line_efficiency_pct", "QL_diff"]]
 
-    # -------- Merge ----------
-    merged = pd.merge(
-        downtime, prod_clean, on=["Tydzień", "Linia"], how="left"
-    ).dropna()
 
-    return merged
+class Snapshot(NamedTuple):
+    """
+    What the callbacks read; replaced as a whole, never modified in place.
+    A snapshot compares, hashes and prints as its key, so it can be a cache
+    key itself: the key and the partitions read come from one object.
+    """
+    store_id: int
+    version: int
+    partitions: dict[int, pd.DataFrame]
+    lines: list[int]
+
+    @property
+    def key(self) -> str:
+        # the version restarts when the store file is recreated, the store id does not repeat
+        return f"{self.store_id}-{self.version}"
+
+    def __eq__(self, other):
+        return isinstance(other, Snapshot) and self.key == other.key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f"Snapshot(key={self.key})"
+
+
+def refresh_store(store: AggregateStore, manifest: Manifest) -> set[int]:
+    """
+    Feed exports not seen before into the aggregate store; only the weeks they
+    touch are recomputed. Returns the lines whose weekly rows changed.
+    """
+    sources = [
+        (FAILURE_FILE, "agregaty.failures", parse_failures, store.update_downtime),
+        (PROD_FILE, "agregaty.production", parse_production, store.update_production),
+    ]
+    lines = set()
+    for path, target, parse, update in sources:
+        fp = manifest.fingerprint(path)
+        if manifest.is_loaded(fp, target) and not store.rebuilt:
+            continue
+        manifest.start(fp, target, path, full_reload=store.rebuilt)
+        df = cached_frame(path, {"parser": f"raport_awarii.{parse.__name__}", "version": PARSER_VERSION}, parse)
+        lines |= {key[0] for key in update(df)}
+        manifest.finish(fp, target, len(df))
+    store.rebuilt = False
+    return lines
+
+
+def build_snapshot(store: AggregateStore, previous: Snapshot | None = None) -> Snapshot:
+    """
+    Bring the store up to date and return the matching snapshot. When only
+    this process changed the store since `previous`, just the touched lines
+    are re-read; otherwise (first start, another worker loaded an export)
+    all partitions are.
+    """
+    before = store.version
+    with Manifest(STORE_FILE) as manifest:
+        lines = refresh_store(store, manifest)
+    version = store.version
+
+    if previous is None or previous.version != before:
+        partitions = store.partitions()
+    elif version == previous.version:
+        return previous
+    else:
+        partitions = dict(previous.partitions)
+        for line in lines:
+            partitions.pop(line, None)
+        partitions.update(store.partitions(sorted(lines)))
+
+    return Snapshot(store.store_id, version, partitions, sorted(partitions))
+
+
+def refresh_loop(stop: threading.Event):
+    """Rebuild the snapshot off the request threads; callbacks keep serving the old one meanwhile."""
+    global snapshot, risk
+    while not stop.wait(REFRESH_SECONDS):
+        try:
+            snapshot = build_snapshot(store, snapshot)
+            risk = read_scores(RISK_FILE)
+        except Exception as e:
+            print(f"Refresh failed: {e}")
 
 
 def scatter_with_trend(df, x, y, title):
@@ -88,8 +187,13 @@ def scatter_with_trend(df, x, y, title):
     return fig
 
 
-df_all   = load_and_prepare()
-all_lines = sorted(df_all["Linia"].unique())
+store    = AggregateStore(STORE_FILE)
+snapshot = build_snapshot(store)
+risk     = read_scores(RISK_FILE)
+
+stop_refresh = threading.Event()
+if REFRESH_SECONDS > 0:
+    threading.Thread(target=refresh_loop, args=(stop_refresh,), daemon=True, name="refresh").start()
 
 # ------------------------------------------------------------------
 # 2 – Dash layout
@@ -104,13 +208,16 @@ app.layout = html.Div(
                 html.Label("Select production line:", className="mr-2"),
                 dcc.Dropdown(
                     id="line-dropdown",
-                    options=[{"label": str(l), "value": l} for l in all_lines],
-                    value=all_lines[0],
+                    options=[{"label": str(l), "value": l} for l in snapshot.lines],
+                    value=snapshot.lines[0],
                     clearable=False,
                     style={"width": "200px"},
                 ),
             ]
         ),
+        dcc.Store(id="data-version", data=snapshot.key),
+        dcc.Interval(id="refresh-interval", interval=max(REFRESH_SECONDS, 1) * 1000,
+                     disabled=REFRESH_SECONDS <= 0),
         html.Div(id="kpi-cards", className="flex flex-wrap gap-4"),
         dcc.Graph(id="eff-scatter"),
         dcc.Graph(id="ql-scatter"),
@@ -120,43 +227,90 @@ app.layout = html.Div(
             style_table={"overflowX": "auto"},
             style_cell={"padding": "6px"},
         ),
+        html.H2(f"Failure risk – next {HORIZON} days", className="text-2xl font-bold"),
+        dash_table.DataTable(
+            id="risk-table",
+            columns=[
+                {"name": "Line", "id": "Linia"},
+                {"name": "Features of", "id": "Data"},
+                {"name": "Risk %", "id": "Ryzyko_pct"},
+                {"name": "Scored", "id": "Oceniono"},
+            ],
+            page_size=20,
+            sort_action="native",
+            style_table={"overflowX": "auto"},
+            style_cell={"padding": "6px"},
+        ),
     ],
 )
 
 # ------------------------------------------------------------------
 # 3 – Callbacks
 # ------------------------------------------------------------------
-@app.callback(
-    [
-        Output("eff-scatter", "figure"),
-        Output("ql-scatter", "figure"),
-        Output("weekly-table", "data"),
-        Output("weekly-table", "columns"),
-        Output("kpi-cards", "children"),
-    ],
-    [Input("line-dropdown", "value")],
-)
-def update(line):
-    dfl = df_all[df_all["Linia"] == line]
+if Cache is not None:
+    memoize = Cache(app.server, config={
+        "CACHE_TYPE": "FileSystemCache",
+        "CACHE_DIR": FIGURE_CACHE_DIR,
+        "CACHE_THRESHOLD": FIGURE_CACHE_SIZE,
+        "CACHE_DEFAULT_TIMEOUT": 0,
+    }).memoize()
+else:
+    memoize = functools.lru_cache(maxsize=FIGURE_CACHE_SIZE)
+
+TABLE_COLUMNS = [
+    {"name": "Week", "id": "Tydzień"},
+    {"name": "Downtime (min)", "id": "Total_downtime_min"},
+    {"name": "Efficiency %", "id": "Line_efficiency_pct"},
+    {"name": "QL Diff", "id": "QL_diff"},
+]
+
+
+@memoize
+def line_payload(current: Snapshot, line: int) -> tuple:
+    """
+    Figures (as dicts), table records and KPI values for one line of
+    `current`. Cached per snapshot key (store id and version), so entries
+    built from older data, or from a store that was since recreated, are
+    never served.
+    """
+    dfl = current.partitions[line]
 
     fig_eff = scatter_with_trend(
         dfl, "Total_downtime_min", "Line_efficiency_pct",
         "Downtime vs Line Efficiency (%)"
-    )
+    ).to_dict()
     fig_ql = scatter_with_trend(
         dfl, "Total_downtime_min", "QL_diff",
         "Downtime vs QL Difference (Akt − Pln)"
-    )
+    ).to_dict()
+
+    data = dfl[["Tydzień", "Total_downtime_min",
+                "Line_efficiency_pct", "QL_diff"]].to_dict("records")
 
-    # table
-    cols = [
-        {"name": "Week", "id": "Tydzień"},
-        {"name": "Downtime (min)", "id": "Total_downtime_min"},
-        {"name": "Efficiency %", "id": "Line_efficiency_pct"},
-        {"name": "QL Diff", "id": "QL_diff"},
+    kpis = [
+        ("Avg Efficiency", f"{dfl['Line_efficiency_pct'].mean():.1f}%"),
+        ("Avg Downtime",   f"{dfl['Total_downtime_min'].mean():.0f} min"),
+        ("Avg QL Diff",    f"{dfl['QL_diff'].mean():.0f}"),
     ]
-    data = dfl.sort_values("Tydzień")[["Tydzień", "Total_downtime_min",
-                                       "Line_efficiency_pct", "QL_diff"]].to_dict("records")
+
+    return fig_eff, fig_ql, data, kpis
+
+
+@app.callback(
+    [
+        Output("eff-scatter", "figure"),
+        Output("ql-scatter", "figure"),
+        Output("weekly-table", "data"),
+        Output("weekly-table", "columns"),
+        Output("kpi-cards", "children"),
+    ],
+    [Input("line-dropdown", "value"), Input("data-version", "data")],
+)
+def update(line, version):
+    current = snapshot
+    if line not in current.partitions:
+        raise PreventUpdate
+    fig_eff, fig_ql, data, kpis = line_payload(current, line)
 
     # KPI cards
     card = lambda title, value: html.Div(
@@ -164,13 +318,43 @@ def update(line):
         children=[html.Div(title, className="text-sm text-gray-500"),
                   html.Div(value, className="text-xl font-semibold")],
     )
-    kpis = [
-        card("Avg Efficiency", f"{dfl['Line_efficiency_pct'].mean():.1f}%"),
-        card("Avg Downtime",   f"{dfl['Total_downtime_min'].mean():.0f} min"),
-        card("Avg QL Diff",    f"{dfl['QL_diff'].mean():.0f}"),
-    ]
+    cards = [card(title, value) for title, value in kpis]
+    line_risk = risk.loc[risk["Linia"] == line, "Ryzyko"]
+    if len(line_risk):
+        cards.append(card(f"Failure risk ({HORIZON}d)", f"{line_risk.iloc[0]:.0%}"))
+
+    return fig_eff, fig_ql, data, TABLE_COLUMNS, cards
+
 
-    return fig_eff, fig_ql, data, cols, kpis
+@app.callback(
+    [
+        Output("data-version", "data"),
+        Output("line-dropdown", "options"),
+        Output("line-dropdown", "value"),
+    ],
+    [Input("refresh-interval", "n_intervals")],
+    [State("data-version", "data"), State("line-dropdown", "value")],
+)
+def poll_snapshot(_, shown_version, line):
+    """Push a newer snapshot to the page; the line selection survives unless the line disappeared."""
+    current = snapshot
+    if current.key == shown_version:
+        raise PreventUpdate
+    options = [{"label": str(l), "value": l} for l in current.lines]
+    if line not in current.partitions:
+        line = current.lines[0] if current.lines else None
+    return current.key, options, line
+
+
+@app.callback(
+    Output("risk-table", "data"),
+    [Input("refresh-interval", "n_intervals")],
+)
+def update_risk(_):
+    current = risk
+    return current.assign(Ryzyko_pct=(current["Ryzyko"] * 100).round(1))[
+        ["Linia", "Data", "Ryzyko_pct", "Oceniono"]
+    ].to_dict("records")
 
 
 # ------------------------------------------------------------------
@@ -0,0 +1,113 @@
+import queue
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable
+
+SQL_SCRIPT = Path(__file__).with_name("sql_script.sql")
+
+FOREIGN_KEY = re.compile(
+    r"ALTER\s+TABLE\s+\[?(\w+)\]?\s+ADD\s+FOREIGN\s+KEY\s*\([^)]*\)\s*REFERENCES\s+\[?(\w+)\]?",
+    re.IGNORECASE,
+)
+
+
+def read_foreign_keys(sql_path: Path = SQL_SCRIPT) -> dict[str, set[str]]:
+    """table -> tables it references, taken from the ALTER TABLE ... FOREIGN KEY statements."""
+    parents: dict[str, set[str]] = {}
+    for child, parent in FOREIGN_KEY.findall(Path(sql_path).read_text(encoding="utf-8")):
+        if child != parent:
+            parents.setdefault(child, set()).add(parent)
+    return parents
+
+
+def load_order(file_patterns: dict, sql_path: Path = SQL_SCRIPT) -> dict[str, set[str]]:
+    """
+    FILE_PATTERNS key -> keys that must be committed before it starts.
+    Parents come from the foreign keys in sql_script.sql plus an optional
+    "depends_on" list (of target tables) in the FILE_PATTERNS entry.
+    Tables nobody loads from a file (e.g. the Data calendar) are ignored.
+    """
+    foreign_keys = read_foreign_keys(sql_path)
+    keys_by_table: dict[str, list[str]] = {}
+    for key, settings in file_patterns.items():
+        keys_by_table.setdefault(settings["target_table"], []).append(key)
+
+    order = {}
+    for key, settings in file_patterns.items():
+        table = settings["target_table"]
+        parent_tables = foreign_keys.get(table, set()) | set(settings.get("depends_on", []))
+        order[key] = {
+            parent_key
+            for parent in parent_tables if parent != table
+            for parent_key in keys_by_table.get(parent, [])
+        }
+    return order
+
+
+def run_scheduled(file_patterns: dict, load: Callable[[str, dict, object], None],
+                  connect: Callable[[], object], workers: int = 4,
+                  sql_path: Path = SQL_SCRIPT) -> dict[str, str]:
+    """
+    Run load(key, settings, conn) for every FILE_PATTERNS entry on at most
+    `workers` threads, each borrowing a connection from a pool of the same size.
+    A table is started as soon as all of its parents have finished, so wall
+    time approaches the longest dependency chain instead of the sum of all
+    tables. If a load fails, everything that depends on it is skipped.
+    Returns key -> "done" / "failed" / "skipped".
+    """
+    order = load_order(file_patterns, sql_path)
+    pool: queue.Queue = queue.Queue()
+    opened = []
+
+    def borrow():
+        try:
+            return pool.get_nowait()
+        except queue.Empty:
+            conn = connect()
+            opened.append(conn)
+            return conn
+
+    def run(key):
+        conn = borrow()
+        try:
+            load(key, file_patterns[key], conn)
+        finally:
+            pool.put(conn)
+
+    status: dict[str, str] = {}
+    pending = dict(order)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            for key, parents in list(pending.items()):
+                if any(status.get(p) in ("failed", "skipped") for p in parents):
+                    status[key] = "skipped"
+                    del pending[key]
+                    print(f"Skipping {key}: a parent table failed to load")
+                elif all(status.get(p) == "done" for p in parents):
+                    running[executor.submit(run, key)] = key
+                    del pending[key]
+
+            if not running:
+                # whatever is left waits on a parent that can never finish
+                for key in pending:
+                    status[key] = "skipped"
+                    print(f"Skipping {key}: unresolved dependencies {sorted(pending[key])}")
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                key = running.pop(future)
+                try:
+                    future.result()
+                    status[key] = "done"
+                except Exception as e:
+                    status[key] = "failed"
+                    print(f"Error loading {key}: {e}")
+
+    for conn in opened:
+        conn.close()
+
+    return status
@@ -0,0 +1,253 @@
+import argparse
+import json
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURES, HORIZON, STORE_PATH, FeatureStore
+
+try:
+    import lightgbm as lgb
+except ImportError:
+    lgb = None
+
+# saved by zawiadomienia.ipynb (bst.save_model)
+MODEL_FILE = Path("model_awarii.txt")
+RISK_TABLE = "ryzyko_awarii"
+
+# requests arriving within this many seconds of each other are scored together
+BATCH_WINDOW = 0.005
+BATCH_SIZE = 256
+
+RISK_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {RISK_TABLE} (
+    Linia INTEGER PRIMARY KEY,
+    Data TEXT NOT NULL,          -- day of the features scored
+    Ryzyko REAL NOT NULL,        -- P(1P/PM on one of the Horyzont days after Data)
+    Horyzont INTEGER NOT NULL,
+    Model TEXT NOT NULL,
+    Oceniono TEXT NOT NULL       -- when the score was computed
+);
+"""
+
+
+class Scorer:
+    """
+    The failure-risk model, loaded once, scoring feature rows in batches.
+
+    Features come from the feature store (features.py); its latest row of
+    every line is kept in memory and re-read only when the store file
+    changes, so a scoring pass is one matrix predict.
+    """
+
+    def __init__(self, model_path: Path | str = MODEL_FILE, store_path: Path | str = STORE_PATH):
+        if lgb is None:
+            raise ImportError("lightgbm is required for scoring")
+        self.model_path = Path(model_path)
+        self.model = lgb.Booster(model_file=str(self.model_path))
+        self.store = FeatureStore(store_path)
+        self.lock = threading.Lock()
+        self._latest = None
+        self._stamp = None
+
+    def close(self):
+        self.store.close()
+
+    def latest(self) -> pd.DataFrame:
+        """Latest feature row per line, indexed by Linia."""
+        stamp = self.store.path.stat().st_mtime_ns
+        with self.lock:
+            if stamp != self._stamp:
+                self._latest = self.store.latest().set_index("Linia")
+                self._stamp = stamp
+            return self._latest
+
+    def predict(self, features: pd.DataFrame) -> np.ndarray:
+        if features.empty:
+            return np.empty(0)
+        return self.model.predict(features[FEATURES].to_numpy(dtype="float32"))
+
+    def score(self, lines: list[int] | None = None) -> pd.DataFrame:
+        """Linia, Data, Ryzyko for the given lines (default: all), in one predict call."""
+        features = self.latest()
+        if lines is not None:
+            features = features[features.index.isin(lines)]
+        return pd.DataFrame({
+            "Linia": features.index.to_numpy(),
+            "Data": features["Data"].to_numpy(),
+            "Ryzyko": self.predict(features),
+        })
+
+
+def write_scores(scores: pd.DataFrame, store_path: Path | str = STORE_PATH, model: str = MODEL_FILE.name):
+    """Replace the risk table with a scoring pass; the Dash report reads it from there."""
+    now = pd.Timestamp.now().isoformat(timespec="seconds")
+    rows = [
+        (int(line), pd.Timestamp(day).date().isoformat(), float(risk), HORIZON, model, now)
+        for line, day, risk in scores[["Linia", "Data", "Ryzyko"]].itertuples(index=False)
+    ]
+    with sqlite3.connect(store_path) as conn:
+        conn.executescript(RISK_SCHEMA)
+        conn.execute(f"DELETE FROM {RISK_TABLE}")
+        conn.executemany(f"INSERT INTO {RISK_TABLE} VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.close()
+
+
+def read_scores(store_path: Path | str = STORE_PATH) -> pd.DataFrame:
+    """The last scoring pass, riskiest lines first; empty when nothing was scored yet."""
+    columns = ["Linia", "Data", "Ryzyko", "Horyzont", "Model", "Oceniono"]
+    if not Path(store_path).exists():
+        return pd.DataFrame(columns=columns)
+    conn = sqlite3.connect(store_path)
+    try:
+        conn.executescript(RISK_SCHEMA)
+        return pd.read_sql_query(f"SELECT {', '.join(columns)} FROM {RISK_TABLE} ORDER BY Ryzyko DESC", conn)
+    finally:
+        conn.close()
+
+
+class MicroBatcher:
+    """
+    Collects concurrent score requests for up to BATCH_WINDOW seconds (or
+    BATCH_SIZE requests) and answers them all from one Scorer.score call.
+    """
+
+    def __init__(self, scorer: Scorer, window: float = BATCH_WINDOW, size: int = BATCH_SIZE):
+        self.scorer = scorer
+        self.window = window
+        self.size = size
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="scoring")
+        self.thread.start()
+
+    def submit(self, lines: list[int] | None) -> Future:
+        """Scores of `lines`, or of every line when None."""
+        future = Future()
+        self.requests.put((lines, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            wanted = None if any(lines is None for lines, _ in batch) else sorted(
+                {line for lines, _ in batch for line in lines}
+            )
+            try:
+                scores = self.scorer.score(wanted).set_index("Linia")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for lines, future in batch:
+                future.set_result(scores if lines is None else scores[scores.index.isin(lines)])
+
+
+class ScoringServer(ThreadingHTTPServer):
+    # the default backlog of 5 drops connections of a burst of concurrent clients
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def make_handler(batcher: MicroBatcher) -> type[BaseHTTPRequestHandler]:
+    class ScoreHandler(BaseHTTPRequestHandler):
+        """
+        GET /score                      -> every line
+        GET /score?linia=10121&linia=…  -> the given lines
+        POST /score {"linie": [10121]}  -> the given lines
+        POST /score {"linie": []}       -> no lines; {} scores every line
+        """
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/score":
+                return self._send(404, {"error": "not found"})
+            try:
+                lines = [int(v) for v in parse_qs(url.query).get("linia", [])] or None
+            except ValueError:
+                return self._send(400, {"error": "linia must be an integer LiniaId"})
+            self._score(lines)
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/score":
+                return self._send(404, {"error": "not found"})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                lines = None if body.get("linie") is None else [int(v) for v in body["linie"]]
+            except (ValueError, TypeError, AttributeError):
+                return self._send(400, {"error": "expected {\"linie\": [LiniaId, ...]}"})
+            self._score(lines)
+
+        def _score(self, lines: list[int] | None):
+            if lines == []:
+                return self._send(200, {"horyzont": HORIZON, "wyniki": []})
+            try:
+                scores = batcher.submit(lines).result(timeout=30)
+            except Exception as e:
+                return self._send(500, {"error": str(e)})
+            self._send(200, {
+                "horyzont": HORIZON,
+                "wyniki": [
+                    {"linia": int(line), "data": pd.Timestamp(day).date().isoformat(), "ryzyko": float(risk)}
+                    for line, day, risk in zip(scores.index, scores["Data"], scores["Ryzyko"])
+                ],
+            })
+
+        def _send(self, status: int, payload: dict):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ScoreHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score failure risk for every line")
+    parser.add_argument("--model", default=str(MODEL_FILE))
+    parser.add_argument("--store", default=str(STORE_PATH))
+    parser.add_argument("--serve", action="store_true", help="Answer /score requests over HTTP instead")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8051)
+    args = parser.parse_args()
+
+    scorer = Scorer(args.model, args.store)
+    try:
+        if args.serve:
+            server = ScoringServer((args.host, args.port), make_handler(MicroBatcher(scorer)))
+            print(f"Scoring on http://{args.host}:{args.port}/score")
+            server.serve_forever()
+        else:
+            t0 = time.perf_counter()
+            scores = scorer.score()
+            elapsed = time.perf_counter() - t0
+            write_scores(scores, args.store, Path(args.model).name)
+            print(f"{RISK_TABLE}: {len(scores)} lines scored in {elapsed * 1000:.1f} ms")
+    finally:
+        scorer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -128,6 +128,59 @@ CREATE TABLE [BilansProdukcji] (
 )
 GO
 
+CREATE TABLE [TestyKwalifikacyjne] (
+  [DokumentId] char(64) PRIMARY KEY,
+  [Plik] varchar(255),
+  [KodDokumentu] varchar(20),
+  [Pracownik] varchar(100),
+  [Dzial] varchar(20),
+  [Stanowisko] varchar(50),
+  [DataTestu] date,
+  [Wynik] int,
+  [WynikMax] int
+)
+GO
+
+CREATE TABLE [SzkoleniaStanowiskowe] (
+  [DokumentId] char(64),
+  [NrInstrukcji] varchar(30),
+  [Plik] varchar(255),
+  [KodDokumentu] varchar(20),
+  [Pracownik] varchar(100),
+  [Stanowisko] varchar(50),
+  [Prowadzacy] varchar(100),
+  [DataSzkolenia] date,
+  PRIMARY KEY ([DokumentId], [NrInstrukcji])
+)
+GO
+
+CREATE TABLE [WskaznikiOEE] (
+  [Od] date,
+  [Linia] int,
+  [Rok] int,
+  [Tydzien] int,
+  [Kampania] varchar(9),
+  [CzasKalendarzowy_min] float,
+  [CzasPlanowany_min] float,
+  [Przestoj_min] float,
+  [PrzestojZmiana1_min] float,
+  [PrzestojZmiana2_min] float,
+  [PrzestojZmiana3_min] float,
+  [ZmianyEfektywne] float,
+  [QLTOTAkt] float,
+  [QLTOTPln] float,
+  [Dostepnosc] float,
+  [Wydajnosc] float,
+  [Jakosc] float,
+  [OEE] float,
+  [OAE] float,
+  PRIMARY KEY ([Od], [Linia])
+)
+GO
+
+CREATE UNIQUE INDEX [UX_BilansProdukcji_Od_Linia_Rodzina] ON [BilansProdukcji] ([Od], [Linia], [Rodzina])
+GO
+
 ALTER TABLE [Zawiadomienia] ADD FOREIGN KEY ([ZlecenieId]) REFERENCES [Zlecenia] ([ZlecenieId])
 GO
 
@@ -164,6 +217,12 @@ GO
 ALTER TABLE [BilansProdukcji] ADD FOREIGN KEY ([Do]) REFERENCES [Data] ([Data])
 GO
 
+ALTER TABLE [WskaznikiOEE] ADD FOREIGN KEY ([Linia]) REFERENCES [Linie] ([LiniaId])
+GO
+
+ALTER TABLE [WskaznikiOEE] ADD FOREIGN KEY ([Od]) REFERENCES [Data] ([Data])
+GO
+
 ALTER TABLE [Zawiadomienia] ADD FOREIGN KEY ([DataPoczatkuZaklocenia]) REFERENCES [Data] ([Data])
 GO
 
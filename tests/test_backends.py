@@ -0,0 +1,85 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+duckdb = pytest.importorskip("duckdb")
+
+from backends import CALENDAR_END, CALENDAR_START, DuckdbBackend, SqliteBackend  # noqa: E402
+from upsert import detect_dialect, upsert_frame  # noqa: E402
+
+BILANS_KEYS = ["Od", "Linia", "Rodzina"]
+
+
+def bilans_rows(efficiency: list[float]) -> pd.DataFrame:
+    # Do is a reserved word in DuckDB
+    return pd.DataFrame({
+        "Od": [date(2025, 1, 6)] * len(efficiency),
+        "Do": [date(2025, 1, 12)] * len(efficiency),
+        "Linia": [10703 + i for i in range(len(efficiency))],
+        "Rodzina": ["1503"] * len(efficiency),
+        "QLTOTAkt": efficiency,
+    })
+
+
+@pytest.fixture(params=["duckdb", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "duckdb":
+        return DuckdbBackend(tmp_path / "ferrero.duckdb")
+    return SqliteBackend(tmp_path / "ferrero.sqlite")
+
+
+def test_create_schema_builds_tables_and_calendar(backend):
+    conn = backend.connect()
+    created = backend.create_schema(conn)
+    assert {"Zawiadomienia", "BilansProdukcji", "Data"} <= set(created)
+    assert detect_dialect(conn) == backend.dialect
+
+    days = (CALENDAR_END - CALENDAR_START).days + 1
+    assert conn.execute("SELECT COUNT(*) FROM Data").fetchone()[0] == days
+    row = conn.execute("SELECT Tydzien, DzienTygodnia FROM Data WHERE Data = ?", [date(2024, 12, 31)]).fetchone()
+    assert tuple(row) == (53, 2)
+
+    assert backend.create_schema(conn) == []
+    conn.close()
+
+
+def test_upsert_inserts_updates_and_skips(backend):
+    conn = backend.open()
+
+    stats = upsert_frame(bilans_rows([80.0, 90.0]), conn, "BilansProdukcji", BILANS_KEYS)
+    assert (stats["inserted"], stats["updated"], stats["unchanged"], stats["rejected"]) == (2, 0, 0, 0)
+
+    stats = upsert_frame(bilans_rows([80.0, 95.0, 70.0]), conn, "BilansProdukcji", BILANS_KEYS)
+    assert (stats["inserted"], stats["updated"], stats["unchanged"], stats["rejected"]) == (1, 1, 1, 0)
+
+    rows = conn.execute('SELECT Linia, QLTOTAkt FROM BilansProdukcji ORDER BY Linia').fetchall()
+    assert [tuple(r) for r in rows] == [(10703, 80.0), (10704, 95.0), (10705, 70.0)]
+    conn.close()
+
+
+def test_upsert_rejects_only_bad_rows(backend):
+    conn = backend.open()
+    df = pd.DataFrame({"LiniaId": [1, 2, 3], "LiniaNazwa": ["a", "b", "c"]}).astype(object)
+    df.loc[1, "LiniaId"] = "not a number"
+
+    stats = upsert_frame(df, conn, "Linie", ["LiniaId"])
+    if backend.dialect == "sqlite":
+        # SQLite stores the text as is
+        assert stats["inserted"] == 3
+    else:
+        assert (stats["inserted"], stats["rejected"]) == (2, 1)
+    conn.close()
+
+
+def test_upsert_rejects_orphans_on_duckdb(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "fk.duckdb"))
+    conn.execute("CREATE TABLE Linie (LiniaId INTEGER PRIMARY KEY)")
+    conn.execute("CREATE TABLE Pomiary (Id INTEGER PRIMARY KEY, Linia INTEGER REFERENCES Linie (LiniaId))")
+    conn.execute("INSERT INTO Linie VALUES (1)")
+
+    df = pd.DataFrame({"Id": [1, 2, 3], "Linia": [1, 9, None]})
+    stats = upsert_frame(df, conn, "Pomiary", ["Id"])
+    assert (stats["inserted"], stats["rejected"]) == (2, 1)
+    assert [r[0] for r in conn.execute("SELECT Id FROM Pomiary ORDER BY Id").fetchall()] == [1, 3]
+    conn.close()
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from downtime import DAY
+from features import HORIZON, build_features
+
+
+def notifications(rows: list[tuple[int, str, int]]) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=["Linia", "Rodzaj", "Dzien"])
+    # no stoppage: Start = Koniec
+    df["Start"] = df["Koniec"] = df["Dzien"] * DAY
+    return df
+
+
+def test_label_is_a_failure_on_the_next_horizon_days():
+    assert HORIZON == 2
+    spans = pd.DataFrame({"Linia": [1, 2], "lo": [10, 10]})
+    notes = notifications([
+        (1, "1P", 15),
+        (1, "ZZ", 12),  # not a target event
+        (2, "PM", 11),
+    ])
+
+    out = build_features(spans, notes, pd.Series(dtype="float64"), until=20)
+    y = out.set_index(["Linia", "Dzien"])["y"]
+
+    line1 = y.loc[1]
+    assert line1.loc[10:18].tolist() == [0, 0, 0, 1, 1, 0, 0, 0, 0]
+    # the last HORIZON days are not labelled yet
+    assert line1.loc[19:20].isna().all()
+    assert y.loc[2].loc[10:12].tolist() == [1, 0, 0]
@@ -0,0 +1,51 @@
+import pandas as pd
+
+from hierarchy import DEVICE, HierarchyIndex, line_number
+
+TREE = {
+    "PLPA-PR-U11": {"_desc": "Unit 11", "children": {
+        "PLPA-PR-U11-010703": {"_desc": "Line 10703", "children": {
+            "PLPA-PR-U11-010703-003": {"_desc": "Section 3", "children": {
+                "10079542": {"_desc": "Pump"},
+                "10079543": {"_desc": "Valve"},
+            }},
+            "10079544": {"_desc": "Conveyor"},
+        }},
+        "PLPA-PR-U11-010709": {"_desc": "Line 10709", "children": {
+            "10079550": {"_desc": "Mixer"},
+        }},
+        "PLPA-PR-U11-XX": {"_desc": "Not a line", "children": {
+            "10079560": {"_desc": "Spare"},
+        }},
+    }},
+}
+
+
+def test_line_number_rejects_short_and_non_numeric_codes():
+    assert line_number("PLPA-PR-U11-010703") == 10703
+    assert line_number("PLPA-PR-U11") is None
+    assert line_number("PLPA-PR-U11-XX") is None
+
+
+def test_ancestors_and_subtree():
+    index = HierarchyIndex.from_tree(TREE)
+    assert index.ancestors("10079542") == ["PLPA-PR-U11-010703-003", "PLPA-PR-U11-010703", "PLPA-PR-U11"]
+    assert index.is_ancestor("PLPA-PR-U11-010703", "10079543")
+    assert not index.is_ancestor("PLPA-PR-U11-010709", "10079543")
+
+    assert index.subtree("PLPA-PR-U11-010703") == [
+        "PLPA-PR-U11-010703", "PLPA-PR-U11-010703-003", "10079542", "10079543", "10079544",
+    ]
+    assert index.subtree("PLPA-PR-U11", kind=DEVICE) == ["10079542", "10079543", "10079544", "10079550", "10079560"]
+
+
+def test_device_to_line():
+    index = HierarchyIndex.from_tree(TREE)
+    assert index.line_of("10079543") == "PLPA-PR-U11-010703"
+    assert index.line_of("PLPA-PR-U11") is None
+
+    devices = pd.Series([10079550, 10079544, 99999999, None, 10079560], dtype="Int64", index=[3, 4, 5, 6, 7])
+    resolved = index.resolve(devices)
+    assert resolved.index.tolist() == [3, 4, 5, 6, 7]
+    assert resolved["Linia"].tolist() == [10709, 10703, pd.NA, pd.NA, pd.NA]
+    assert resolved["Opis"].dropna().tolist() == ["Mixer", "Conveyor", "Spare"]
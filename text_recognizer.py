@@ -1,11 +1,34 @@
 import argparse
+import contextlib
+import hashlib
+import json
+import os
+import re
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from importlib.metadata import version
+from itertools import repeat
 from pathlib import Path
+from typing import Iterator, NamedTuple
 
 import pdfplumber
 import pytesseract
 import pypdfium2 as pdfium
 from PIL import Image
 
+from manifest import file_sha256
+
+OCR_CACHE_DIR = Path(".cache") / "ocr"
+# bump when the extraction below changes, so cached results are redone
+PIPELINE_VERSION = 2
+
+
+class PageText(NamedTuple):
+    page_number: int  # 1-based
+    text: str
+    source: str  # "text" (embedded text layer) or "ocr"
+    confidence: float | None  # mean Tesseract word confidence 0-1; None for embedded text
+
 
 def extract_text_pdfplumber(pdf_path: Path) -> str:
     """Try to read embedded text from the PDF."""
@@ -14,22 +37,147 @@ def extract_text_pdfplumber(pdf_path: Path) -> str:
     return "\n".join(texts).strip()
 
 
-def extract_text_ocr_pdfium(pdf_path: Path, lang: str = "eng+pol", scale: float = 2.0) -> str:
+def ocr_image(img: Image.Image, lang: str = "eng+pol") -> tuple[str, float | None]:
+    """OCR text of an image, with lines rebuilt from Tesseract's word boxes, and the mean word confidence."""
+    data = pytesseract.image_to_data(img, lang=lang, output_type=pytesseract.Output.DICT)
+    lines: dict[tuple, list[str]] = {}
+    confidences = []
+    for word, conf, *key in zip(data["text"], data["conf"], data["block_num"], data["par_num"], data["line_num"]):
+        if float(conf) < 0 or not word.strip():
+            continue
+        lines.setdefault(tuple(key), []).append(word)
+        confidences.append(float(conf))
+    text = "\n".join(" ".join(words) for words in lines.values())
+    return text, (sum(confidences) / len(confidences) / 100 if confidences else None)
+
+
+def ocr_page(pdf: pdfium.PdfDocument, index: int, lang: str = "eng+pol", scale: float = 2.0) -> tuple[str, float | None]:
     """
-    Render each page with pypdfium2 -> PIL Image -> run Tesseract OCR.
+    Render one 0-based page and OCR it; the only place pages are OCR'd.
     scale ~ zoom factor (1.0 = 72dpi). 2.0–3.0 often gives better OCR.
     """
-    pdf = pdfium.PdfDocument(pdf_path)
-    all_text = []
+    page = pdf[index]
+    bitmap = page.render(scale=scale, rotation=0)
+    img = bitmap.to_pil()
+    try:
+        text, confidence = ocr_image(img, lang=lang)
+        return text.strip(), confidence
+    finally:
+        # a page at scale 2.0 is tens of MB; do not wait for the garbage collector
+        img.close()
+        bitmap.close()
+        page.close()
+
+
+# the document each OCR worker process opened in _init_ocr_worker
+_worker_pdf = None
+
+
+def _init_ocr_worker(pdf_path: str, tesseract_cmd: str):
+    global _worker_pdf
+    # one Tesseract thread per process, the pool provides the parallelism
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    _worker_pdf = pdfium.PdfDocument(pdf_path)
+
+
+def _ocr_worker_page(index: int, lang: str, scale: float) -> tuple[str, float | None]:
+    return ocr_page(_worker_pdf, index, lang, scale)
+
+
+def page_text_score(text: str) -> int:
+    """
+    Letters and digits in a page's embedded text. Glyphs pdfplumber cannot
+    map come out as "(cid:NN)" and are not counted, so a page whose text
+    layer is garbage scores like a scanned one.
+    """
+    return sum(ch.isalnum() for ch in re.sub(r"\(cid:\d+\)", "", text))
+
+
+def iter_pages(
+    pdf_path: Path,
+    force_ocr: bool = False,
+    lang: str = "eng+pol",
+    scale: float = 2.0,
+    min_page_chars: int = 20,
+    jobs: int = 1
+) -> Iterator[PageText]:
+    """
+    Yield the pages of a PDF one at a time, in order, as PageText.
+    Pages with enough embedded text are yielded as is, the rest are OCR'd
+    (every page with force_ocr=True). With jobs > 1 at most 2 * jobs pages
+    are in flight in the worker pool, so memory stays flat however long the
+    document is, and the first pages come out before the last are read.
+    """
+    if not pdf_path.exists():
+        raise FileNotFoundError(f"File not found: {pdf_path}")
+
+    pool = None
+    if jobs > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_ocr_worker,
+            initargs=(str(pdf_path), pytesseract.pytesseract.tesseract_cmd),
+        )
+    rendered = pdfium.PdfDocument(pdf_path) if pool is None else None
+    pending: deque[tuple[int, PageText | Future]] = deque()
+
+    def ready(item: tuple[int, PageText | Future]) -> PageText:
+        number, result = item
+        if isinstance(result, PageText):
+            return result
+        text, confidence = result.result()
+        return PageText(number, text, "ocr", confidence)
+
+    try:
+        with pdfplumber.open(pdf_path) as pdf:
+            for number, page in enumerate(pdf.pages, start=1):
+                text = "" if force_ocr else (page.extract_text() or "").strip()
+                page.close()
+
+                if not force_ocr and page_text_score(text) >= min_page_chars:
+                    pending.append((number, PageText(number, text, "text", None)))
+                elif pool is not None:
+                    pending.append((number, pool.submit(_ocr_worker_page, number - 1, lang, scale)))
+                else:
+                    text, confidence = ocr_page(rendered, number - 1, lang, scale)
+                    pending.append((number, PageText(number, text, "ocr", confidence)))
+
+                while len(pending) > 2 * max(jobs, 1) or (pending and isinstance(pending[0][1], PageText)):
+                    yield ready(pending.popleft())
+
+        while pending:
+            yield ready(pending.popleft())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if rendered is not None:
+            rendered.close()
+
 
-    for i in range(len(pdf)):
-        page = pdf[i]
-        bitmap = page.render(scale=scale, rotation=0)
-        pil_img = bitmap.to_pil()
-        txt = pytesseract.image_to_string(pil_img, lang=lang)
-        all_text.append(txt.strip())
+def join_pages(pages: Iterator[PageText]) -> str:
+    """One document text from its pages, the same for every entry point."""
+    return "\n".join(page.text for page in pages).strip()
 
-    return "\n".join(all_text).strip()
+
+def extract_text_ocr_parallel(pdf_path: Path, lang: str = "eng+pol", scale: float = 2.0, jobs: int = 1) -> str:
+    """OCR of every page, in `jobs` worker processes."""
+    return join_pages(iter_pages(pdf_path, force_ocr=True, lang=lang, scale=scale, jobs=jobs))
+
+
+def read_pdf_text_per_page(
+    pdf_path: Path,
+    lang: str = "eng+pol",
+    scale: float = 2.0,
+    min_page_chars: int = 20,
+    jobs: int = 1
+) -> str:
+    """
+    Keep the embedded text of pages that have enough of it and OCR only the
+    others, so mixed scanned/digital documents are complete without paying
+    for OCR of the digital pages.
+    """
+    return join_pages(iter_pages(pdf_path, lang=lang, scale=scale, min_page_chars=min_page_chars, jobs=jobs))
 
 
 def read_pdf_text(
@@ -37,33 +185,156 @@ def read_pdf_text(
     force_ocr: bool = False,
     lang: str = "eng+pol",
     scale: float = 2.0,
-    min_text_len: int = 50
+    min_text_len: int = 50,
+    jobs: int = 1,
+    per_page: bool = True,
+    min_page_chars: int = 20
 ) -> str:
     """
     Returns extracted text from a PDF:
-    - Try pdfplumber first (unless force_ocr=True).
-    - If text is too short, fall back to OCR with pypdfium2.
+    - By default page by page: embedded text where a page has enough of it,
+      OCR for the rest (see read_pdf_text_per_page), so scanned pages inside
+      a digital document are not lost.
+    - per_page=False decides for the whole document: pdfplumber text, or OCR
+      of every page (in `jobs` processes) if it is shorter than min_text_len.
+    - force_ocr=True OCRs every page.
     """
     if not pdf_path.exists():
         raise FileNotFoundError(f"File not found: {pdf_path}")
 
+    if per_page and not force_ocr:
+        return read_pdf_text_per_page(pdf_path, lang=lang, scale=scale, min_page_chars=min_page_chars, jobs=jobs)
+
     if not force_ocr:
         text = extract_text_pdfplumber(pdf_path)
         if len(text) >= min_text_len:
             return text
 
     # OCR fallback
-    return extract_text_ocr_pdfium(pdf_path, lang=lang, scale=scale)
+    return extract_text_ocr_parallel(pdf_path, lang=lang, scale=scale, jobs=jobs)
+
+
+def engine_version() -> str:
+    """Versions that influence the extracted text; part of every cache key."""
+    return (
+        f"pipeline {PIPELINE_VERSION}; tesseract {pytesseract.get_tesseract_version()}; "
+        f"pdfplumber {version('pdfplumber')}; pypdfium2 {version('pypdfium2')}"
+    )
+
+
+def ocr_cache_path(sha256: str, settings: dict, cache_dir: Path = OCR_CACHE_DIR) -> Path:
+    key = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+    return Path(cache_dir) / f"{sha256[:20]}-{key[:12]}.json"
+
+
+def _init_batch_worker(tesseract_cmd: str):
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+
+def _recognize_document(pdf_path: Path, settings: dict) -> dict:
+    try:
+        text = read_pdf_text(
+            pdf_path,
+            force_ocr=settings["force_ocr"],
+            lang=settings["lang"],
+            scale=settings["scale"],
+            min_text_len=settings["min_text_len"],
+            per_page=settings["per_page"],
+            min_page_chars=settings["min_page_chars"],
+        )
+        return {"text": text, "error": None}
+    except Exception as e:
+        return {"text": None, "error": f"{type(e).__name__}: {e}"}
+
+
+def process_directory(
+    folder: Path,
+    outfile: Path,
+    force_ocr: bool = False,
+    lang: str = "eng+pol",
+    scale: float = 2.0,
+    min_text_len: int = 50,
+    jobs: int = 1,
+    recursive: bool = False,
+    per_page: bool = True,
+    min_page_chars: int = 20,
+    cache_dir: Path = OCR_CACHE_DIR,
+) -> dict:
+    """
+    Extract text from every PDF in `folder` into one JSON-lines file, one
+    record per document.
+    Documents whose content hash, settings and engine versions match a
+    cached result are not read again; the rest run `jobs` at a time, one
+    process per document (in this process when jobs is 1).
+    """
+    pdfs = sorted(folder.rglob("*.pdf") if recursive else folder.glob("*.pdf"))
+    settings = {
+        "force_ocr": force_ocr,
+        "lang": lang,
+        "scale": scale,
+        "min_text_len": min_text_len,
+        "per_page": per_page,
+        "min_page_chars": min_page_chars,
+        "engine": engine_version(),
+    }
+
+    records = {}
+    todo = []
+    for pdf_path in pdfs:
+        sha = file_sha256(pdf_path)
+        cached = ocr_cache_path(sha, settings, cache_dir)
+        if cached.exists():
+            records[pdf_path] = {**json.loads(cached.read_text(encoding="utf-8")), "cached": True}
+        else:
+            todo.append((pdf_path, sha, cached))
+
+    with contextlib.ExitStack() as stack:
+        if jobs > 1 and len(todo) > 1:
+            pool = stack.enter_context(ProcessPoolExecutor(
+                max_workers=min(jobs, len(todo)),
+                initializer=_init_batch_worker,
+                initargs=(pytesseract.pytesseract.tesseract_cmd,),
+            ))
+            results = pool.map(_recognize_document, [p for p, _, _ in todo], repeat(settings))
+        else:
+            results = map(_recognize_document, [p for p, _, _ in todo], repeat(settings))
+        for (pdf_path, sha, cached), result in zip(todo, results):
+            record = {"sha256": sha, **settings, **result}
+            if result["error"] is None:
+                cached.parent.mkdir(parents=True, exist_ok=True)
+                cached.write_text(json.dumps(record, ensure_ascii=False), encoding="utf-8")
+            else:
+                print(f"Failed to read {pdf_path}: {result['error']}")
+            records[pdf_path] = {**record, "cached": False}
+
+    with open(outfile, "w", encoding="utf-8") as out:
+        for pdf_path in pdfs:
+            out.write(json.dumps({"path": str(pdf_path), **records[pdf_path]}, ensure_ascii=False) + "\n")
+
+    failed = sum(r["error"] is not None for r in records.values())
+    return {"documents": len(pdfs), "cached": len(pdfs) - len(todo), "failed": failed}
 
 
 def main():
     parser = argparse.ArgumentParser(description="PDF text recognizer using pdfplumber + pypdfium2 OCR fallback")
-    parser.add_argument("pdf", help="Path to PDF file")
+    parser.add_argument("pdf", help="Path to PDF file, or a folder of PDFs (batch mode, JSON-lines output)")
     parser.add_argument("--force-ocr", action="store_true", help="Force OCR even if text is found")
     parser.add_argument("--lang", default="eng+pol", help="Tesseract language codes (e.g. 'eng', 'pol', 'eng+pol')")
     parser.add_argument("--scale", type=float, default=2.0, help="Rendering scale for OCR (1.0-3.0 typical)")
-    parser.add_argument("--min-text-len", type=int, default=50, help="Threshold length to skip OCR")
-    parser.add_argument("--outfile", default="", help="Save extracted text to this file")
+    parser.add_argument("--whole-document", dest="per_page", action="store_false",
+                        help="Decide text vs OCR once for the whole document instead of for every page")
+    # per-page is the default now; the flag is still accepted
+    parser.add_argument("--per-page", dest="per_page", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--min-text-len", type=int, default=50,
+                        help="Whole-document mode: threshold length to skip OCR")
+    parser.add_argument("--min-page-chars", type=int, default=20,
+                        help="Pages with fewer letters/digits of embedded text are OCR'd")
+    parser.add_argument("--stream", action="store_true",
+                        help="Print every page as soon as it is read, with its source and OCR confidence")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="OCR worker processes; 1 (default) OCRs pages one after another without a pool")
+    parser.add_argument("--recursive", action="store_true", help="Batch mode: include PDFs in subfolders")
+    parser.add_argument("--outfile", default="", help="Save extracted text to this file (batch mode: ocr_results.jsonl)")
     parser.add_argument("--tesseract-path", default="", help="Absolute path to tesseract.exe (Windows)")
 
     args = parser.parse_args()
@@ -72,12 +343,42 @@ def main():
         pytesseract.pytesseract.tesseract_cmd = args.tesseract_path
 
     pdf_path = Path(args.pdf)
+    if pdf_path.is_dir():
+        out = Path(args.outfile or "ocr_results.jsonl")
+        summary = process_directory(
+            pdf_path,
+            out,
+            force_ocr=args.force_ocr,
+            lang=args.lang,
+            scale=args.scale,
+            min_text_len=args.min_text_len,
+            jobs=args.jobs,
+            recursive=args.recursive,
+            per_page=args.per_page,
+            min_page_chars=args.min_page_chars,
+        )
+        print(f"[OK] {summary['documents']} documents ({summary['cached']} cached, "
+              f"{summary['failed']} failed) saved to: {out.resolve()}")
+        return
+
+    if args.stream:
+        pages = iter_pages(pdf_path, force_ocr=args.force_ocr, lang=args.lang, scale=args.scale,
+                           min_page_chars=args.min_page_chars, jobs=args.jobs)
+        for page in pages:
+            confidence = "" if page.confidence is None else f", {page.confidence:.0%}"
+            print(f"--- page {page.page_number} ({page.source}{confidence}) ---")
+            print(page.text, flush=True)
+        return
+
     text = read_pdf_text(
         pdf_path=pdf_path,
         force_ocr=args.force_ocr,
         lang=args.lang,
         scale=args.scale,
-        min_text_len=args.min_text_len
+        min_text_len=args.min_text_len,
+        jobs=args.jobs,
+        per_page=args.per_page,
+        min_page_chars=args.min_page_chars
     )
 
     if args.outfile:
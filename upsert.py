@@ -0,0 +1,322 @@
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# rows per executemany call / commit
+BATCH_SIZE = 5000
+
+
+def is_duckdb(conn) -> bool:
+    return duckdb is not None and isinstance(conn, duckdb.DuckDBPyConnection)
+
+
+def connection_cursor(conn):
+    """
+    A cursor on `conn` itself. DuckDB's cursor() opens a second connection,
+    which does not see this one's temp tables, so there the connection is
+    its own cursor.
+    """
+    return conn if is_duckdb(conn) else conn.cursor()
+
+
+def begin(conn):
+    """Open a transaction for the next commit()/rollback(); DuckDB is in autocommit mode otherwise."""
+    if is_duckdb(conn):
+        conn.begin()
+
+
+def rollback(conn):
+    """Roll back the open transaction; under DuckDB's autocommit there may be none, which is fine."""
+    try:
+        conn.rollback()
+    except Exception as e:
+        if not (is_duckdb(conn) and isinstance(e, duckdb.TransactionException)):
+            raise
+
+
+def frame_to_rows(df: pd.DataFrame, columns: list[str]) -> list[tuple]:
+    values = df[columns].astype(object)
+    values = values.where(values.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+def insert_batch(conn, sql: str, rows: list[tuple], offset: int = 0) -> list[tuple[int, Exception]]:
+    """
+    Insert one batch with executemany and commit it.
+    If the batch fails it is rolled back and split in half until the bad rows
+    are isolated, so one broken row costs O(log n) extra round trips instead
+    of a row-by-row reload of the whole file.
+    Returns (row index, error) for every row that could not be inserted.
+    """
+    cursor = connection_cursor(conn)
+    if hasattr(cursor, "fast_executemany"):
+        cursor.fast_executemany = True
+
+    try:
+        begin(conn)
+        cursor.executemany(sql, rows)
+        conn.commit()
+        return []
+    except Exception as e:
+        rollback(conn)
+        if len(rows) == 1:
+            return [(offset, e)]
+
+    mid = len(rows) // 2
+    return (
+        insert_batch(conn, sql, rows[:mid], offset)
+        + insert_batch(conn, sql, rows[mid:], offset + mid)
+    )
+
+
+def stage_rows(conn, dialect: str, staging: str, df: pd.DataFrame, columns: list[str],
+               batch_size: int = BATCH_SIZE) -> list[tuple[int, Exception]]:
+    """
+    Bulk-load a frame into a staging table by the fastest path of the
+    database: DuckDB reads the frame itself (through Arrow) in one statement,
+    the others take executemany batches (fast_executemany on pyodbc).
+    Returns (row index, error) for rows that could not be loaded.
+    """
+    col_names = ", ".join(quote_name(c, dialect) for c in columns)
+    if dialect == "duckdb":
+        try:
+            conn.register("incoming_frame", df[columns])
+            conn.execute(f"INSERT INTO {staging} ({col_names}) SELECT * FROM incoming_frame")
+            return []
+        except Exception:
+            pass  # isolate the bad rows below
+        finally:
+            conn.unregister("incoming_frame")
+
+    insert_sql = f"INSERT INTO {staging} ({col_names}) VALUES ({', '.join(['?'] * len(columns))})"
+    rows = frame_to_rows(df, columns)
+    rejected = []
+    for start in range(0, len(rows), batch_size):
+        rejected += insert_batch(conn, insert_sql, rows[start:start + batch_size], start)
+    return rejected
+
+
+def _affected(cursor, dialect: str) -> int:
+    """Rows changed by the last UPDATE / INSERT; DuckDB returns them as a result row."""
+    if dialect == "duckdb":
+        return cursor.fetchone()[0]
+    return max(cursor.rowcount, 0)
+
+
+def detect_dialect(conn) -> str:
+    if is_duckdb(conn):
+        return "duckdb"
+    if type(conn).__module__.startswith("sqlite3"):
+        return "sqlite"
+    return "mssql"
+
+
+def quote_name(name: str, dialect: str) -> str:
+    """A column name as an identifier: BilansProdukcji.Do is a reserved word in DuckDB."""
+    return f"[{name}]" if dialect == "mssql" else f'"{name}"'
+
+
+def key_columns(settings: dict) -> list[str]:
+    """primary_key in FILE_PATTERNS is either one column name or a list (composite key)."""
+    primary_key = settings.get("primary_key", settings["columns"][0])
+    return [primary_key] if isinstance(primary_key, str) else list(primary_key)
+
+
+def foreign_keys(conn, dialect: str, table: str) -> list[tuple[list[str], str, list[str]]]:
+    """(columns, parent table, parent columns) of every foreign key the database enforces on `table`."""
+    cursor = connection_cursor(conn)
+    if dialect == "sqlite":
+        if not cursor.execute("PRAGMA foreign_keys").fetchone()[0]:
+            return []
+        found = {}
+        for fk_id, _, parent, column, parent_column, *_ in cursor.execute(f"PRAGMA foreign_key_list({table})").fetchall():
+            found.setdefault(fk_id, ([], parent, []))
+            found[fk_id][0].append(column)
+            found[fk_id][2].append(parent_column)
+        for fk_columns, parent, parent_columns in found.values():
+            if None in parent_columns:  # REFERENCES parent without columns: its primary key
+                info = cursor.execute(f"PRAGMA table_info({parent})").fetchall()
+                parent_columns[:] = [name for _, name, *_, pk in sorted(info, key=lambda r: r[-1]) if pk]
+        return list(found.values())
+    if dialect == "duckdb":
+        cursor.execute(
+            "SELECT constraint_column_names, referenced_table, referenced_column_names "
+            "FROM duckdb_constraints() WHERE constraint_type = 'FOREIGN KEY' AND table_name = ?",
+            [table],
+        )
+        return [(list(c), parent, list(pc)) for c, parent, pc in cursor.fetchall()]
+
+    cursor.execute(
+        "SELECT fk.name, c.name, OBJECT_NAME(fkc.referenced_object_id), rc.name "
+        "FROM sys.foreign_keys fk "
+        "JOIN sys.foreign_key_columns fkc ON fkc.constraint_object_id = fk.object_id "
+        "JOIN sys.columns c ON c.object_id = fkc.parent_object_id AND c.column_id = fkc.parent_column_id "
+        "JOIN sys.columns rc ON rc.object_id = fkc.referenced_object_id AND rc.column_id = fkc.referenced_column_id "
+        "WHERE fk.parent_object_id = OBJECT_ID(?) AND fk.is_disabled = 0 "
+        "ORDER BY fk.name, fkc.constraint_column_id",
+        table,
+    )
+    found = {}
+    for name, column, parent, parent_column in cursor.fetchall():
+        found.setdefault(name, ([], parent, []))
+        found[name][0].append(column)
+        found[name][2].append(parent_column)
+    return list(found.values())
+
+
+def reject_orphans(cursor, dialect: str, staging: str, keys: list[str], columns: list[str],
+                   fks: list[tuple[list[str], str, list[str]]]) -> list[tuple[tuple, str]]:
+    """
+    Delete staged rows whose foreign key has no parent row, before the
+    merge: the staging table carries no constraints, so otherwise one
+    orphan would fail the whole merge statement.
+    Returns (key values, reason) of every deleted row.
+    """
+    rejected = []
+    for fk_columns, parent, parent_columns in fks:
+        if not set(fk_columns) <= set(columns):
+            continue
+        names = [quote_name(c, dialect) for c in fk_columns]
+        parent_names = [quote_name(c, dialect) for c in parent_columns]
+        # a NULL foreign key references nothing and is allowed
+        orphan = (
+            " AND ".join(f"{staging}.{c} IS NOT NULL" for c in names)
+            + f" AND NOT EXISTS (SELECT 1 FROM {parent} AS p WHERE "
+            + " AND ".join(f"p.{pc} = {staging}.{c}" for c, pc in zip(names, parent_names))
+            + ")"
+        )
+        key_names = [quote_name(k, dialect) for k in keys]
+        cursor.execute(f"SELECT {', '.join(key_names + names)} FROM {staging} WHERE {orphan}")
+        rows = cursor.fetchall()
+        for row in rows:
+            values = ", ".join(f"{c}={v}" for c, v in zip(fk_columns, row[len(keys):]))
+            rejected.append((tuple(row[:len(keys)]), f"no {parent} row for {values}"))
+        if rows:
+            cursor.execute(f"DELETE FROM {staging} WHERE {orphan}")
+    return rejected
+
+
+def _staging_sql(dialect: str, table: str, staging: str, columns: list[str]) -> tuple[str, str]:
+    col_names = ", ".join(columns)
+    if dialect == "mssql":
+        create = f"SELECT TOP 0 {col_names} INTO {staging} FROM {table}"
+    else:
+        create = f"CREATE TEMP TABLE {staging} AS SELECT {col_names} FROM {table} WHERE 1 = 0"
+    return create, f"DROP TABLE {staging}"
+
+
+def _merge_mssql(cursor, table: str, staging: str, keys: list[str], columns: list[str]) -> tuple[int, int]:
+    values = [c for c in columns if c not in keys]
+    on = " AND ".join(f"t.{k} = s.{k}" for k in keys)
+    col_names = ", ".join(columns)
+
+    when_matched = ""
+    if values:
+        # EXCEPT compares NULLs as equal, so unchanged rows are skipped
+        changed = (
+            f"EXISTS (SELECT {', '.join('s.' + c for c in values)} "
+            f"EXCEPT SELECT {', '.join('t.' + c for c in values)})"
+        )
+        assignments = ", ".join(f"{c} = s.{c}" for c in values)
+        when_matched = f"WHEN MATCHED AND {changed} THEN UPDATE SET {assignments} "
+
+    cursor.execute(
+        f"MERGE {table} WITH (HOLDLOCK) AS t "
+        f"USING {staging} AS s ON {on} "
+        f"{when_matched}"
+        f"WHEN NOT MATCHED BY TARGET THEN INSERT ({col_names}) "
+        f"VALUES ({', '.join('s.' + c for c in columns)}) "
+        f"OUTPUT $action;"
+    )
+    actions = [row[0] for row in cursor.fetchall()]
+    return actions.count("INSERT"), actions.count("UPDATE")
+
+
+def _merge_ansi(cursor, dialect: str, table: str, staging: str, keys: list[str], columns: list[str]) -> tuple[int, int]:
+    values = [c for c in columns if c not in keys]
+    on = " AND ".join(f"t.{k} = s.{k}" for k in keys)
+    distinct = "IS NOT" if dialect == "sqlite" else "IS DISTINCT FROM"
+
+    updated = 0
+    if values:
+        assignments = ", ".join(f"{c} = s.{c}" for c in values)
+        changed = " OR ".join(f"t.{c} {distinct} s.{c}" for c in values)
+        cursor.execute(
+            f"UPDATE {table} AS t SET {assignments} FROM {staging} AS s "
+            f"WHERE {on} AND ({changed})"
+        )
+        updated = _affected(cursor, dialect)
+
+    col_names = ", ".join(columns)
+    cursor.execute(
+        f"INSERT INTO {table} ({col_names}) "
+        f"SELECT {', '.join('s.' + c for c in columns)} FROM {staging} AS s "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {table} AS t WHERE {on})"
+    )
+    inserted = _affected(cursor, dialect)
+    return inserted, updated
+
+
+def upsert_frame(df: pd.DataFrame, conn, table: str, keys: list[str],
+                 columns: list[str] | None = None, dialect: str | None = None,
+                 batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Insert new rows, update changed rows and skip unchanged rows of `table`
+    in one set-based pass.
+
+    The incoming frame is bulk-loaded into a session temp table and merged
+    on `keys`, so the database only probes the key index for the incoming
+    rows - nothing is read back from the target table into Python.
+    Returns counts of inserted / updated / unchanged / rejected rows.
+    """
+    columns = columns or list(df.columns)
+    dialect = dialect or detect_dialect(conn)
+
+    df = df.dropna(subset=keys).drop_duplicates(subset=keys, keep="last").reset_index(drop=True)
+
+    staging = f"#stg_{table}" if dialect == "mssql" else f"stg_{table}"
+    # the SQL below uses quoted names, the frame the plain ones
+    sql_keys = [quote_name(k, dialect) for k in keys]
+    sql_columns = [quote_name(c, dialect) for c in columns]
+    create_sql, drop_sql = _staging_sql(dialect, table, staging, sql_columns)
+
+    fks = foreign_keys(conn, dialect, table)
+    # the staging table lives in this connection's session; every statement
+    # touching it goes through the same cursor
+    cursor = connection_cursor(conn)
+    cursor.execute(create_sql)
+    conn.commit()
+
+    try:
+        rejected = stage_rows(conn, dialect, staging, df, columns, batch_size)
+        for i, e in rejected:
+            key = ", ".join(f"{k}={df.at[i, k]}" for k in keys)
+            print(f"Row rejected for {table} (row {i}, {key}): {e}")
+
+        orphans = reject_orphans(cursor, dialect, staging, keys, columns, fks)
+        for values, reason in orphans:
+            key = ", ".join(f"{k}={v}" for k, v in zip(keys, values))
+            print(f"Row rejected for {table} ({key}): {reason}")
+
+        begin(conn)
+        if dialect == "mssql":
+            inserted, updated = _merge_mssql(cursor, table, staging, sql_keys, sql_columns)
+        else:
+            inserted, updated = _merge_ansi(cursor, dialect, table, staging, sql_keys, sql_columns)
+        conn.commit()
+    except Exception:
+        rollback(conn)
+        raise
+    finally:
+        cursor.execute(drop_sql)
+        conn.commit()
+
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": len(df) - len(rejected) - len(orphans) - inserted - updated,
+        "rejected": len(rejected) + len(orphans),
+    }